@@ -0,0 +1,235 @@
+# Асинхронный слой доступа к данным: функции mysql_connector и mongodb_connector,
+# вынесенные в пул потоков, и сервер, обслуживающий много пользовательских сессий в одном процессе
+
+import argparse
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql_connector
+import mongodb_connector
+import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Возвращает пул потоков для блокирующих драйверов pymysql/pymongo, создавая его при первом обращении:
+    пока они выполняются в пуле, цикл событий обслуживает другие запросы и сессии.
+    Размер пула (ASYNC_SETTINGS['workers']) читается из настроек только при первом вызове, а не при импорте.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_SETTINGS['workers'], thread_name_prefix="db")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию в пуле потоков и ждёт результат, не блокируя цикл событий.
+
+    :param func: Блокирующая функция (например, из mysql_connector).
+    :return: Результат func(*args, **kwargs).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def get_all_genres():
+    """Асинхронный вариант mysql_connector.get_all_genres()."""
+    return await run_blocking(mysql_connector.get_all_genres)
+
+
+async def get_year_range_for_genre(category_id):
+    """Асинхронный вариант mysql_connector.get_year_range_for_genre()."""
+    return await run_blocking(mysql_connector.get_year_range_for_genre, category_id)
+
+
+async def search_by_keyword_page(keyword, after=None, page_size=mysql_connector.PAGE_SIZE):
+    """Асинхронный вариант mysql_connector.search_by_keyword_page()."""
+    return await run_blocking(mysql_connector.search_by_keyword_page, keyword, after, page_size)
+
+
+async def search_by_genre_and_years_page(category_id, year_from, year_to, after=None,
+                                         page_size=mysql_connector.PAGE_SIZE):
+    """Асинхронный вариант mysql_connector.search_by_genre_and_years_page()."""
+    return await run_blocking(mysql_connector.search_by_genre_and_years_page,
+                              category_id, year_from, year_to, after, page_size)
+
+
+async def _count_and_log(count_func, count_args, search_type, params):
+    """Считает результаты и ставит запись в журнал MongoDB, как только количество известно."""
+    total = await run_blocking(count_func, *count_args)
+    await run_blocking(mongodb_connector.log_search_to_mongo, search_type, params, total)
+    return total
+
+
+async def keyword_search(keyword, page_size=mysql_connector.PAGE_SIZE):
+    """
+    Выполняет поиск по ключевому слову: первая страница, подсчёт результатов
+    и запись в журнал MongoDB выполняются параллельно.
+
+    :param keyword: Ключевое слово.
+    :param page_size: Размер первой страницы.
+    :return: Кортеж (total, rows, next_cursor).
+    """
+    params = {"keyword": keyword, "year_from": None, "year_to": None, "genre_id": None, "genre_name": None}
+    (rows, next_cursor), total = await asyncio.gather(
+        search_by_keyword_page(keyword, page_size=page_size),
+        _count_and_log(mysql_connector.count_by_keyword, (keyword,), "keyword", params),
+    )
+    return total, rows, next_cursor
+
+
+async def genre_search(genre_id, genre_name, year_from, year_to, page_size=mysql_connector.PAGE_SIZE):
+    """
+    Выполняет поиск по жанру и диапазону годов: количество и первая страница
+    получаются одним запросом (mysql_connector.search_by_genres), затем запрос ставится в журнал MongoDB.
+
+    :return: Кортеж (total, rows, next_cursor).
+    """
+    params = {"genre_id": genre_id, "genre_name": genre_name, "year_from": year_from, "year_to": year_to}
+    result = await run_blocking(mysql_connector.search_by_genres, genre_id, year_from, year_to,
+                                page_size=page_size)
+    await run_blocking(mongodb_connector.log_search_to_mongo, "genre_year", params, result["total"])
+    return result["total"], result["rows"], result["next_cursor"]
+
+
+# Сервер сессий: каждый подключившийся клиент (например, через telnet или nc) получает
+# собственную сессию поиска, а все сессии делят один процесс, пул соединений MySQL и клиент MongoDB.
+
+HELP_TEXT = (
+    "Команды:\n"
+    "  keyword <слово>          — поиск по ключевому слову\n"
+    "  genres                   — список жанров\n"
+    "  genre <id> <год[-год]>   — поиск по жанру и годам\n"
+    "  more                     — следующая страница результатов\n"
+    "  quit                     — завершить сессию\n"
+)
+
+
+def _format_film(film) -> str:
+    return f"{film['film_id']}. {film['title']} ({film['release_year']})\n"
+
+
+def _parse_years(text):
+    """Разбирает 'yyyy' или 'yyyy-yyyy'; возвращает (year_from, year_to) или None."""
+    parts = text.split('-')
+    if len(parts) == 1 and parts[0].isdigit():
+        return int(parts[0]), int(parts[0])
+    if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+        return int(parts[0]), int(parts[1])
+    return None
+
+
+class SearchSession:
+    """
+    Состояние одной пользовательской сессии: последний поиск и курсор следующей страницы.
+    """
+
+    def __init__(self):
+        self._fetch_page = None  # функция курсора, возвращающая корутину следующей страницы
+        self._cursor = None      # курсор следующей страницы последнего поиска
+
+    async def handle(self, line: str) -> str:
+        """
+        Выполняет одну команду сессии.
+
+        :param line: Строка команды.
+        :return: Текст ответа.
+        """
+        command, _, argument = line.strip().partition(' ')
+        command = command.lower()
+
+        if command == "keyword" and argument:
+            total, rows, cursor = await keyword_search(argument)
+            self._fetch_page = lambda after: search_by_keyword_page(argument, after)
+            self._cursor = cursor
+            return self._render(total, rows, cursor)
+
+        if command == "genres":
+            genres = await get_all_genres()
+            return "".join(f"{g['category_id']}. {g['name']}\n" for g in genres)
+
+        if command == "genre":
+            genre_text, _, years_text = argument.partition(' ')
+            years = _parse_years(years_text.strip())
+            if not genre_text.isdigit() or years is None:
+                return "Ошибка: формат команды — genre <id> <год или диапазон>\n"
+            genre_id = int(genre_text)
+            genre_names = {g['category_id']: g['name'] for g in await get_all_genres()}
+            if genre_id not in genre_names:
+                return "Ошибка: такого жанра нет.\n"
+            total, rows, cursor = await genre_search(genre_id, genre_names[genre_id], *years)
+            self._fetch_page = lambda after: search_by_genre_and_years_page(genre_id, *years, after)
+            self._cursor = cursor
+            return self._render(total, rows, cursor)
+
+        if command == "more":
+            if self._cursor is None:
+                return "Больше результатов нет.\n"
+            rows, self._cursor = await self._fetch_page(self._cursor)
+            return self._render(None, rows, self._cursor)
+
+        return HELP_TEXT
+
+    @staticmethod
+    def _render(total, rows, cursor) -> str:
+        if total == 0 or not rows:
+            return "Ничего не найдено.\n"
+        text = f"Найдено: {total}\n" if total is not None else ""
+        text += "".join(_format_film(film) for film in rows)
+        text += "Введите more для следующей страницы.\n" if cursor is not None else "Это были все результаты.\n"
+        return text
+
+
+async def _serve_client(reader, writer, limiter):
+    session = SearchSession()
+    writer.write(("Приложение 'Фильмы'\n" + HELP_TEXT).encode('utf-8'))
+    try:
+        while True:
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                break
+            text = line.decode('utf-8', errors='replace').strip()
+            if text.lower() in ("quit", "exit", "0"):
+                break
+            async with limiter:  # ограничиваем число одновременно выполняемых запросов к базам
+                try:
+                    answer = await asyncio.wait_for(session.handle(text), settings.ASYNC_SETTINGS['request_timeout'])
+                except asyncio.TimeoutError:
+                    answer = "Ошибка: превышено время ожидания ответа базы данных.\n"
+            writer.write(answer.encode('utf-8'))
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    """
+    Запускает сервер сессий поиска и обслуживает клиентов до остановки процесса.
+
+    :param host: Адрес для прослушивания.
+    :param port: Порт для прослушивания.
+    """
+    limiter = asyncio.Semaphore(settings.ASYNC_SETTINGS['workers'])
+    server = await asyncio.start_server(lambda r, w: _serve_client(r, w, limiter), host, port)
+    print(f"Сервер сессий запущен на {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервер сессий поиска фильмов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
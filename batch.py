@@ -0,0 +1,286 @@
+# Пакетный (неинтерактивный) режим поиска: запросы читаются из файла или stdin,
+# выполняются параллельно несколькими потоками через общий пул соединений MySQL,
+# результаты построчно выводятся в JSONL или CSV, а журнал запросов пишется в MongoDB пакетами.
+#
+# Формат входа — JSONL (по объекту на строку) или CSV с заголовком, поля:
+#   type       — 'keyword' или 'genre_year' (если не указан, определяется по заполненным полям);
+#   keyword    — ключевое слово (для 'keyword');
+#   genre_id   — идентификатор жанра или genre — его название (для 'genre_year');
+#   year_from, year_to — диапазон годов (year_to по умолчанию равен year_from).
+#
+# Ошибка базы данных отмечается в поле error строки результата и не попадает в журнал MongoDB:
+# пустой результат из-за недоступной MySQL не выдаётся за поиск, который ничего не нашёл.
+# Сообщения об ошибках выводятся в stderr, stdout занят результатами.
+#
+# Примеры:
+#   python main.py batch queries.jsonl -o results.jsonl --workers 8
+#   cat queries.csv | python main.py batch - --input-format csv --output-format csv
+
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import mysql_connector
+import mongodb_connector
+from logger import log_error
+from film_row import row_to_json
+from resilience import CircuitOpenError
+import settings
+
+CSV_FIELDS = ["line", "search_type", "keyword", "genre_id", "genre_name", "year_from", "year_to",
+              "results_count", "film_id", "title", "release_year", "error"]
+
+
+class BatchError(ValueError):
+    """Некорректный запрос во входных данных."""
+
+
+def read_queries(stream, input_format: str = "jsonl"):
+    """
+    Читает запросы из потока.
+
+    :param stream: Текстовый поток (файл или stdin).
+    :param input_format: 'jsonl' или 'csv'.
+    :return: Генератор пар (номер строки, словарь запроса); для неразборчивых строк
+             вместо словаря возвращается исключение BatchError.
+    """
+    if input_format == "csv":
+        for number, row in enumerate(csv.DictReader(stream), start=2):  # первая строка — заголовок
+            yield number, {key: value for key, value in row.items() if key and value not in (None, "")}
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            query = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, BatchError(f"некорректный JSON: {e}")
+            continue
+        yield number, query if isinstance(query, dict) else BatchError("ожидается объект JSON")
+
+
+def _genre_names() -> dict:
+    return {g['category_id']: g['name'] for g in mysql_connector.get_all_genres(strict=True)}
+
+
+def normalize_query(query: dict, genres: dict) -> tuple:
+    """
+    Проверяет запрос и приводит его к параметрам поиска в формате журнала MongoDB.
+
+    :param query: Запрос из входного файла.
+    :param genres: Словарь {category_id: name} всех жанров.
+    :return: Кортеж (search_type, params).
+    :raises BatchError: если запрос некорректен.
+    """
+    search_type = query.get("type") or ("keyword" if query.get("keyword") else "genre_year")
+    if search_type == "keyword":
+        keyword = str(query.get("keyword") or "").strip()
+        if not keyword:
+            raise BatchError("не задано ключевое слово")
+        return "keyword", {"keyword": keyword, "year_from": None, "year_to": None,
+                           "genre_id": None, "genre_name": None}
+
+    if search_type != "genre_year":
+        raise BatchError(f"неизвестный тип запроса: {search_type}")
+    if query.get("genre_id") is not None:
+        try:
+            genre_id = int(query["genre_id"])
+        except (TypeError, ValueError):
+            raise BatchError(f"некорректный genre_id: {query['genre_id']}")
+    else:
+        by_name = {name.lower(): category_id for category_id, name in genres.items()}
+        genre_id = by_name.get(str(query.get("genre") or "").strip().lower())
+    if genre_id not in genres:
+        raise BatchError("такого жанра нет")
+    try:
+        year_from = int(query["year_from"])
+        year_to = int(query.get("year_to", year_from))
+    except (KeyError, TypeError, ValueError):
+        raise BatchError("не задан или некорректен диапазон годов")
+    if year_from > year_to:
+        raise BatchError("начальный год больше конечного")
+    return "genre_year", {"keyword": None, "year_from": year_from, "year_to": year_to,
+                          "genre_id": genre_id, "genre_name": genres[genre_id]}
+
+
+def run_query(search_type: str, params: dict) -> list:
+    """
+    Выполняет один поиск и возвращает список найденных фильмов.
+
+    :raises mysql_connector.SearchError: ошибка базы данных (пустой список означает, что ничего не найдено).
+    :raises CircuitOpenError: MySQL недавно была недоступна.
+    """
+    if search_type == "keyword":
+        return mysql_connector.search_by_keyword(params["keyword"], strict=True)
+    return mysql_connector.search_by_genre_and_years(params["genre_id"], params["year_from"], params["year_to"],
+                                                     strict=True)
+
+
+class _Output:
+    """Потокобезопасный вывод результатов в JSONL или CSV."""
+
+    def __init__(self, stream, output_format: str, counts_only: bool):
+        self._stream = stream
+        self._format = output_format
+        self._counts_only = counts_only
+        self._lock = threading.Lock()
+        self._csv = None
+        if output_format == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, result: dict) -> None:
+        with self._lock:
+            if self._format == "csv":
+                self._write_csv(result)
+            else:
+                if self._counts_only:
+                    result = {key: value for key, value in result.items() if key != "results"}
+                self._stream.write(json.dumps(result, ensure_ascii=False, default=row_to_json) + "\n")
+            self._stream.flush()
+
+    def _write_csv(self, result: dict) -> None:
+        row = dict(result.get("params") or {}, line=result["line"], search_type=result.get("search_type"),
+                   results_count=result.get("results_count"), error=result.get("error"))
+        films = [] if self._counts_only else result.get("results") or []
+        if not films:
+            self._csv.writerow(row)
+        for film in films:
+            self._csv.writerow(dict(row, film_id=film.get("film_id"), title=film.get("title"),
+                                    release_year=film.get("release_year")))
+
+
+def run_batch(queries, output, workers: int = None, log_to_mongo: bool = True,
+              log_batch_size: int = None) -> dict:
+    """
+    Выполняет запросы параллельно и выводит результаты по мере готовности.
+
+    Одновременно в работе держится не больше workers * 4 запросов, поэтому
+    входной файл любого размера читается потоково, без загрузки в память целиком.
+    Результаты выводятся в порядке завершения; номер строки входа сохраняется в поле line.
+
+    :param queries: Итерируемый объект пар (номер строки, запрос), см. read_queries().
+    :param output: Объект _Output для вывода результатов.
+    :param workers: Число потоков (по умолчанию settings.BATCH_SETTINGS['workers']).
+    :param log_to_mongo: Записывать ли выполненные запросы в журнал MongoDB.
+    :param log_batch_size: По сколько записей журнала отправлять в MongoDB за раз.
+    :return: Сводка: total, succeeded, failed, logged, seconds, queries_per_second.
+    :raises mysql_connector.SearchError: если не удалось загрузить список жанров.
+    :raises CircuitOpenError: если MySQL недоступна уже при загрузке списка жанров.
+    """
+    workers = workers or settings.BATCH_SETTINGS['workers']
+    log_batch_size = log_batch_size or settings.BATCH_SETTINGS['log_batch_size']
+    genres = _genre_names()
+    summary = {"total": 0, "succeeded": 0, "failed": 0, "logged": 0}
+    pending_log = []
+    started = time.perf_counter()
+
+    def execute(number, query):
+        result = {"line": number}
+        try:
+            if isinstance(query, Exception):
+                raise query
+            search_type, params = normalize_query(query, genres)
+            result.update(search_type=search_type, params=params)
+            call_started = time.perf_counter()
+            films = run_query(search_type, params)
+            result.update(results_count=len(films), elapsed_ms=round((time.perf_counter() - call_started) * 1000, 3),
+                          results=films, error=None)
+        except BatchError as e:
+            result.update(results_count=None, error=str(e))
+        except (mysql_connector.SearchError, CircuitOpenError) as e:
+            result.update(results_count=None, error=str(e))  # ошибка базы уже записана в журнал ошибок
+        except Exception as e:  # непредвиденная ошибка прерывает только свою строку, а не весь пакет
+            msg = f"Ошибка выполнения запроса из строки {number}: {e}"
+            log_error(msg, exc=e)
+            result.update(results_count=None, error=msg)
+        return result
+
+    def collect(future):
+        result = future.result()
+        summary["total"] += 1
+        if result.get("error"):
+            summary["failed"] += 1
+        else:
+            summary["succeeded"] += 1
+            pending_log.append((result["search_type"], result["params"], result["results_count"]))
+        output.write(result)
+        if log_to_mongo and len(pending_log) >= log_batch_size:
+            summary["logged"] += mongodb_connector.log_searches_to_mongo(pending_log)
+            pending_log.clear()
+
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        for number, query in queries:
+            in_flight.add(executor.submit(execute, number, query))
+            if len(in_flight) >= workers * 4:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+        for future in wait(in_flight).done:
+            collect(future)
+
+    if log_to_mongo and pending_log:
+        summary["logged"] += mongodb_connector.log_searches_to_mongo(pending_log)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    summary["queries_per_second"] = round(summary["total"] / summary["seconds"], 1) if summary["seconds"] else 0.0
+    return summary
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа пакетного режима: python main.py batch ... или python batch.py ...
+
+    :return: Код завершения: 0 — все запросы выполнены, 1 — были некорректные или не выполненные запросы,
+             2 — ошибка ввода-вывода или недоступна MySQL (не загружен список жанров).
+    """
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Пакетный поиск фильмов по файлу запросов")
+    parser.add_argument("input", nargs="?", default="-", help="файл запросов ('-' или не указан — stdin)")
+    parser.add_argument("-o", "--output", default="-", help="файл результатов ('-' — stdout)")
+    parser.add_argument("--input-format", choices=["jsonl", "csv"],
+                        help="формат входа (по умолчанию по расширению файла, иначе jsonl)")
+    parser.add_argument("--output-format", choices=["jsonl", "csv"],
+                        help="формат выхода (по умолчанию по расширению файла, иначе jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=settings.BATCH_SETTINGS['workers'],
+                        help="число параллельных потоков")
+    parser.add_argument("--counts-only", action="store_true", help="выводить только количество найденных фильмов")
+    parser.add_argument("--no-log", action="store_true", help="не записывать запросы в журнал MongoDB")
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or ("csv" if args.input.endswith(".csv") else "jsonl")
+    output_format = args.output_format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    try:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+        target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    except OSError as e:
+        msg = f"Ошибка открытия файла пакетного режима: {e}"
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+        return 2
+
+    try:
+        summary = run_batch(read_queries(source, input_format), _Output(target, output_format, args.counts_only),
+                            workers=args.workers, log_to_mongo=not args.no_log)
+    except (mysql_connector.SearchError, CircuitOpenError) as e:
+        print(f"Пакетный режим остановлен: список жанров не загружен ({e})", file=sys.stderr)
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    # сводка — в stderr, чтобы не смешиваться с результатами в stdout
+    print(f"Выполнено запросов: {summary['total']} (успешно {summary['succeeded']}, с ошибкой {summary['failed']}), "
+          f"записано в журнал: {summary['logged']}, {summary['seconds']} с, "
+          f"{summary['queries_per_second']} запросов/с", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
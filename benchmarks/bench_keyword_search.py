@@ -0,0 +1,107 @@
+# Бенчмарк поиска по ключевому слову: LIKE '%слово%' против триграммного индекса
+#
+# Запуск из корня проекта:
+#   python benchmarks/bench_keyword_search.py --sizes 1000 10000 100000
+#   python benchmarks/bench_keyword_search.py --mysql   # сравнить режимы на настоящей базе sakila
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_films, sample_keywords
+from trigram_index import TrigramIndex
+
+
+def measure(func, keywords) -> dict:
+    """
+    Вызывает func для каждого ключевого слова и возвращает статистику задержек в миллисекундах.
+    """
+    timings = []
+    for keyword in keywords:
+        start = time.perf_counter()
+        func(keyword)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def bench_synthetic(size: int, keywords: list) -> dict:
+    """
+    Сравнивает LIKE-поиск (SQLite, полный просмотр таблицы — как LIKE с ведущим '%' в MySQL)
+    и поиск по триграммному индексу на синтетическом каталоге заданного размера.
+    """
+    films = list(generate_films(size))
+
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("CREATE TABLE film (film_id INTEGER PRIMARY KEY, title TEXT, description TEXT, release_year INTEGER)")
+    db.executemany(
+        "INSERT INTO film VALUES (:film_id, :title, :description, :release_year)", films
+    )
+    db.execute("CREATE INDEX idx_title ON film (title)")
+
+    def like_search(keyword):
+        return db.execute(
+            "SELECT film_id, title, description, release_year FROM film "
+            "WHERE title LIKE '%' || ? || '%' ORDER BY title", (keyword,)
+        ).fetchall()
+
+    start = time.perf_counter()
+    index = TrigramIndex(films)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "size": size,
+        "like": measure(like_search, keywords),
+        "trigram": measure(lambda kw: index.search(kw, include_description=False), keywords),
+        "trigram_build_ms": build_ms,
+    }
+
+
+def bench_mysql(keywords: list) -> dict:
+    """
+    Сравнивает режимы mysql_connector.search_by_keyword на настроенной базе MySQL.
+    """
+    import mysql_connector
+
+    mysql_connector.get_trigram_index()  # строим индекс заранее, чтобы не учитывать его в задержках
+    return {mode: measure(lambda kw: mysql_connector.search_by_keyword(kw, mode=mode), keywords)
+            for mode in ("like", "fulltext", "trigram")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска фильмов по ключевому слову")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="размеры синтетического каталога")
+    parser.add_argument("--queries", type=int, default=200, help="количество поисковых запросов")
+    parser.add_argument("--mysql", action="store_true", help="сравнить режимы на базе из настроек .env")
+    args = parser.parse_args()
+
+    keywords = sample_keywords(args.queries)
+
+    if args.mysql:
+        for mode, stats in bench_mysql(keywords).items():
+            print(f"{mode:>8}: mean {stats['mean_ms']:.3f} мс, p50 {stats['p50_ms']:.3f} мс, "
+                  f"p95 {stats['p95_ms']:.3f} мс")
+        return
+
+    print(f"{'фильмов':>10} | {'LIKE p50':>10} | {'LIKE p95':>10} | {'триграммы p50':>14} | "
+          f"{'триграммы p95':>14} | {'построение':>10}")
+    for size in args.sizes:
+        result = bench_synthetic(size, keywords)
+        print(f"{size:>10} | {result['like']['p50_ms']:>7.3f} мс | {result['like']['p95_ms']:>7.3f} мс | "
+              f"{result['trigram']['p50_ms']:>11.3f} мс | {result['trigram']['p95_ms']:>11.3f} мс | "
+              f"{result['trigram_build_ms']:>7.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
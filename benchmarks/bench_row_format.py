@@ -0,0 +1,139 @@
+# Бенчмарк памяти на строку результата поиска: словари DictCursor против компактных форматов.
+#
+# Измеряется через tracemalloc:
+#   - накладные расходы самого представления строки (строки-значения общие для всех форматов):
+#     dict, FilmRow (__slots__), namedtuple и столбцы (по списку на поле);
+#   - удерживаемая память результата search_by_keyword() целиком — вместе со строками-значениями —
+#     для row_format='dict' и 'compact' на синтетическом каталоге (benchmarks/sqlite_shim.py).
+#
+# Запуск из корня проекта:
+#   python benchmarks/bench_row_format.py --sizes 10000 100000
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIELDS = ("film_id", "title", "description", "release_year")
+FilmTuple = namedtuple("FilmTuple", FIELDS)
+
+
+def retained_bytes(build) -> tuple:
+    """
+    Вызывает build() и возвращает (результат, сколько байт он удерживает в памяти).
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def bench_representations(size: int) -> dict:
+    """Накладные расходы представления строки в байтах на строку (без самих строк-значений)."""
+    from benchmarks.synthetic import generate_films
+    from film_row import FilmRow
+
+    values = [tuple(film[key] for key in FIELDS) for film in generate_films(size)]
+    builders = {
+        "dict": lambda: [dict(zip(FIELDS, row)) for row in values],
+        "film_row": lambda: [FilmRow(*row) for row in values],
+        "namedtuple": lambda: [FilmTuple(*row) for row in values],
+        "columns": lambda: {key: [row[index] for row in values] for index, key in enumerate(FIELDS)},
+    }
+    results = {}
+    for name, build in builders.items():
+        rows, size_bytes = retained_bytes(build)
+        results[name] = round(size_bytes / size, 1)
+        del rows
+    return results
+
+
+def bench_connector(size: int, data_dir: str, keyword: str) -> dict:
+    """Память результата search_by_keyword() в байтах на строку для обоих форматов."""
+    from benchmarks.sqlite_shim import build_catalog, connect_factory
+    from mysql_pool import MySQLConnectionPool, set_pool
+    import mysql_connector
+
+    path = build_catalog(os.path.join(data_dir, f"catalog-{size}.sqlite"), size)
+    set_pool(MySQLConnectionPool({}, connect_func=connect_factory(path)))
+    mysql_connector.search_by_keyword(keyword)  # прогрев: соединение пула и компиляция запроса
+
+    results = {}
+    for row_format in ("dict", "compact"):
+        started = time.perf_counter()
+        rows, size_bytes = retained_bytes(lambda: mysql_connector.search_by_keyword(keyword, row_format=row_format))
+        results[row_format] = {
+            "rows": len(rows),
+            "bytes_per_row": round(size_bytes / max(len(rows), 1), 1),
+            "total_mb": round(size_bytes / 1024 / 1024, 2),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        del rows
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Память на строку результата поиска для разных форматов строк")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="размеры каталога")
+    parser.add_argument("--keyword", default="a", help="ключевое слово поиска (короткое — много совпадений)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sakila-bench"),
+                        help="каталог для файлов синтетических каталогов")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"),
+                        help="каталог для JSON с результатами")
+    args = parser.parse_args()
+
+    os.environ["RESULT_CACHE_ENABLED"] = "0"  # кэш удерживал бы результат и искажал измерение
+    os.environ["KEYWORD_SEARCH_MODE"] = "like"
+    os.environ.setdefault("ERROR_LOG_DIR", args.data_dir)
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    report = {"meta": {"commit": _git_commit(), "timestamp": datetime.now().isoformat(timespec='seconds'),
+                       "python": sys.version.split()[0], "keyword": args.keyword}, "results": {}}
+    for size in args.sizes:
+        representations = bench_representations(size)
+        connector = bench_connector(size, args.data_dir, args.keyword)
+        report["results"][str(size)] = {"representation_bytes_per_row": representations, "search": connector}
+
+        print(f"\n== Каталог {size} фильмов ==")
+        print("Накладные расходы представления (байт на строку, без строк-значений):")
+        for name, value in representations.items():
+            print(f"  {name:<12} {value:>8.1f}")
+        print(f"search_by_keyword({args.keyword!r}), вся удерживаемая память результата:")
+        for row_format, item in connector.items():
+            print(f"  {row_format:<12} {item['bytes_per_row']:>8.1f} байт/строку, {item['total_mb']} МБ "
+                  f"на {item['rows']} строк")
+        saving = 1 - connector["compact"]["bytes_per_row"] / connector["dict"]["bytes_per_row"]
+        print(f"  экономия компактного формата: {saving:.0%}")
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"rowformat-{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# Бенчмарк холодного запуска приложения.
+#
+# Измеряет в отдельных процессах:
+#   - время импорта ui (всё, что main.py загружает до показа меню) по данным python -X importtime;
+#   - время от запуска python main.py до появления приглашения меню;
+#   - какие тяжёлые модули (драйверы, dotenv) оказались загружены до показа меню.
+#
+# Запуск из корня проекта:
+#   python benchmarks/bench_startup.py --runs 10
+#   python benchmarks/bench_startup.py --compare benchmarks/results/startup-<прошлый запуск>.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pymysql", "pymongo", "bson", "dotenv")
+MENU_PROMPT = "Выберите пункт"
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["ERROR_LOG_DIR"] = tempfile.gettempdir()  # ошибки прогрева не должны попадать в error_log.csv проекта
+    env["PYTHONIOENCODING"] = "utf-8"
+    return env
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Разбирает вывод python -X importtime.
+
+    :return: Словарь {модуль: (собственное время, накопленное время)} в миллисекундах.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return modules
+
+
+def measure_import(module: str = "ui") -> tuple:
+    """
+    Импортирует module в новом процессе с -X importtime.
+
+    :return: Кортеж (накопленное время импорта module в мс, все модули, загруженные тяжёлые модули).
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=_env(),
+                            capture_output=True, text=True, encoding="utf-8", check=True)
+    modules = parse_importtime(result.stderr)
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return modules[module][1], modules, loaded
+
+
+def measure_time_to_menu(timeout: float = 30.0) -> float:
+    """
+    Запускает python main.py и возвращает время в мс до появления приглашения главного меню.
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "main.py"], cwd=ROOT, env=_env(),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    try:
+        while MENU_PROMPT.encode("utf-8") not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk or time.perf_counter() - started > timeout:
+                raise RuntimeError("меню не появилось: " + output.decode("utf-8", "replace")[-200:])
+            output += chunk
+        elapsed = (time.perf_counter() - started) * 1000
+        process.communicate(b"0\n", timeout=timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return elapsed
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного запуска приложения")
+    parser.add_argument("--runs", type=int, default=5, help="количество запусков (берётся медиана)")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых медленных импортов показать")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"),
+                        help="каталог для JSON с результатами")
+    parser.add_argument("--compare", help="JSON прошлого запуска для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост времени запуска (доля)")
+    args = parser.parse_args()
+
+    measure_import()  # первый запуск компилирует .pyc — в измерения не входит
+    import_times, menu_times = [], []
+    modules, loaded = {}, []
+    for _ in range(args.runs):
+        import_ms, modules, loaded = measure_import()
+        import_times.append(import_ms)
+        menu_times.append(measure_time_to_menu())
+
+    results = {
+        "import_ui_ms": statistics.median(import_times),
+        "time_to_menu_ms": statistics.median(menu_times),
+    }
+    print(f"Импорт ui (медиана из {args.runs}): {results['import_ui_ms']:.1f} мс")
+    print(f"Запуск main.py до меню (медиана): {results['time_to_menu_ms']:.1f} мс")
+    print(f"Тяжёлые модули, загруженные до меню: {', '.join(loaded) or 'нет'}")
+    print(f"\nСамые медленные импорты (собственное время, последний запуск):")
+    for name, (self_ms, cumulative_ms) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {name:<40} {self_ms:>8.2f} мс (с зависимостями {cumulative_ms:.2f} мс)")
+
+    report = {
+        "meta": {"commit": _git_commit(), "timestamp": datetime.now().isoformat(timespec='seconds'),
+                 "python": sys.version.split()[0], "runs": args.runs},
+        "results": results,
+        "heavy_modules_loaded": loaded,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"startup-{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regression = False
+        for name, value in results.items():
+            if baseline.get(name):
+                change = value / baseline[name] - 1
+                regression = regression or change > args.threshold
+                print(f"{name}: было {baseline[name]:.1f} мс, стало {value:.1f} мс ({change:+.1%})")
+        if regression:
+            print("Время запуска выросло больше допустимого.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# Нагрузочный тест HTTP-сервиса поиска (http_service.py).
+#
+# По умолчанию сервис запускается в отдельном процессе на локальных заменах баз данных:
+# MySQL — файл SQLite с синтетическим каталогом (benchmarks/sqlite_shim.py), MongoDB — mongomock.
+# Клиенты — потоки с постоянными (keep-alive) соединениями, отправляющие смесь запросов:
+# поиск по ключевому слову, поиск по жанру и годам, список жанров.
+#
+# Запуск из корня проекта:
+#   python benchmarks/load_test_http.py --size 100000 --clients 16 --duration 15
+#   python benchmarks/load_test_http.py --url http://127.0.0.1:8080   # уже запущенный сервис
+#
+# Результат — запросы в секунду, задержки p50/p95/p99 по эндпоинтам и число ответов по статусам;
+# он сохраняется в benchmarks/results/loadtest-<время>-<коммит>.json.
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_local_service(catalog_path: str, port: int, workers: int, cache: bool) -> None:
+    """Точка входа процесса сервиса: подключает локальные замены баз и запускает http_service."""
+    os.environ["RESULT_CACHE_ENABLED"] = "1" if cache else "0"
+    os.environ["KEYWORD_SEARCH_MODE"] = "like"
+    os.environ.setdefault("MONGO_DB", "films_bench")
+    os.environ.setdefault("MONGO_COLLECTION", "search_log")
+    os.environ.setdefault("ERROR_LOG_DIR", os.path.dirname(catalog_path))
+    try:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    except ImportError:
+        print("mongomock не установлен — журнал запросов не записывается.", file=sys.stderr)
+
+    import http_service
+    from benchmarks.sqlite_shim import connect_factory
+    from mysql_pool import MySQLConnectionPool, set_pool
+
+    set_pool(MySQLConnectionPool({}, max_size=workers, connect_func=connect_factory(catalog_path)))
+    server = http_service.SearchHTTPServer(("127.0.0.1", port), workers=workers)
+    server.serve_forever()
+
+
+def wait_ready(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=2)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"сервис на {host}:{port} не ответил за {timeout} с")
+
+
+def make_requests(count: int, seed: int = 1) -> list:
+    """Смесь запросов: 50% по ключевому слову, 40% по жанру и годам, 10% список жанров."""
+    from benchmarks.sqlite_shim import CATEGORIES
+    from benchmarks.synthetic import sample_keywords
+
+    rnd = random.Random(seed)
+    keywords = sample_keywords(max(count // 2, 1))
+    requests = []
+    for index in range(count):
+        kind = rnd.random()
+        if kind < 0.5:
+            requests.append(("keyword", "/search/keyword?" + urlencode({"keyword": keywords[index % len(keywords)]})))
+        elif kind < 0.9:
+            year_from = rnd.randint(1990, 2024)
+            query = {"genre_id": rnd.randint(1, len(CATEGORIES)), "year_from": year_from,
+                     "year_to": min(2024, year_from + rnd.randint(0, 5))}
+            requests.append(("genre", "/search/genre?" + urlencode(query)))
+        else:
+            requests.append(("genres", "/genres"))
+    return requests
+
+
+def client(host: str, port: int, requests: list, deadline: float, results: list, statuses: Counter,
+           lock: threading.Lock) -> None:
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    timings = defaultdict(list)
+    local_statuses = Counter()
+    index = 0
+    while time.monotonic() < deadline:
+        name, path = requests[index % len(requests)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            local_statuses[response.status] += 1
+        except (OSError, http.client.HTTPException):
+            local_statuses["error"] += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            continue
+        timings[name].append((time.perf_counter() - started) * 1000)
+    connection.close()
+    with lock:
+        results.append(timings)
+        statuses.update(local_statuses)
+
+
+def run_load(host: str, port: int, clients: int, duration: float, requests: list) -> dict:
+    from metrics import Histogram
+
+    results, statuses, lock = [], Counter(), threading.Lock()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    threads = []
+    for number in range(clients):
+        shuffled = requests[number:] + requests[:number]  # клиенты начинают с разных запросов
+        thread = threading.Thread(target=client, args=(host, port, shuffled, deadline, results, statuses, lock))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = defaultdict(list)
+    for timings in results:
+        for name, values in timings.items():
+            merged[name].extend(values)
+    endpoints = {}
+    for name, values in sorted(merged.items()):
+        histogram = Histogram(max_samples=len(values))  # перцентили по всем запросам, а не по окну
+        for value in values:
+            histogram.observe(value)
+        p50, p95, p99 = histogram.percentiles(0.5, 0.95, 0.99)
+        endpoints[name] = {"requests": len(values), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+    total = sum(len(values) for values in merged.values())
+    return {"clients": clients, "seconds": round(elapsed, 3), "requests": total,
+            "requests_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+            "statuses": {str(status): count for status, count in statuses.items()}, "endpoints": endpoints}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP-сервиса поиска")
+    parser.add_argument("--url", help="адрес уже запущенного сервиса (по умолчанию запускается локальный)")
+    parser.add_argument("--size", type=int, default=10000, help="размер синтетического каталога")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="число одновременных клиентов")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность каждого прогона в секундах")
+    parser.add_argument("--workers", type=int, default=8, help="потоки обращения к базам локального сервиса")
+    parser.add_argument("--cache", action="store_true", help="включить кэш результатов в локальном сервисе")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sakila-bench"),
+                        help="каталог для файлов синтетических каталогов")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"),
+                        help="каталог для JSON с результатами")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        from benchmarks.sqlite_shim import build_catalog
+
+        os.makedirs(args.data_dir, exist_ok=True)
+        print(f"Подготовка каталога из {args.size} фильмов...")
+        catalog = build_catalog(os.path.join(args.data_dir, f"catalog_{args.size}.sqlite"), args.size)
+        host, port = "127.0.0.1", _free_port()
+        process = multiprocessing.Process(target=run_local_service,
+                                          args=(catalog, port, args.workers, args.cache), daemon=True)
+        process.start()
+
+    report = {"meta": {"commit": _git_commit(), "timestamp": datetime.now().isoformat(timespec='seconds'),
+                       "python": sys.version.split()[0], "url": args.url, "size": None if args.url else args.size,
+                       "workers": None if args.url else args.workers, "cache": args.cache},
+              "runs": []}
+    try:
+        wait_ready(host, port)
+        requests = make_requests(2000)
+        for clients in args.clients:
+            result = run_load(host, port, clients, args.duration, requests)
+            report["runs"].append(result)
+            print(f"\nКлиентов: {clients}: {result['requests_per_second']} запросов/с "
+                  f"({result['requests']} за {result['seconds']} с), статусы: {result['statuses']}")
+            for name, stats in result["endpoints"].items():
+                print(f"  {name:<8} p50 {stats['p50_ms']:.2f} мс, p95 {stats['p95_ms']:.2f} мс, "
+                      f"p99 {stats['p99_ms']:.2f} мс ({stats['requests']} запросов)")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join(5)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
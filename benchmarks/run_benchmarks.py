@@ -0,0 +1,217 @@
+# Воспроизводимый набор бенчмарков путей доступа к данным.
+#
+# MySQL заменяется файлом SQLite со схемой Sakila и синтетическим каталогом заданного размера
+# (benchmarks/sqlite_shim.py), MongoDB — mongomock (или настоящим сервером из .env: --mongo real).
+# Кэши результатов и справочных данных отключаются, чтобы измерялись сами запросы.
+#
+# Запуск из корня проекта:
+#   python benchmarks/run_benchmarks.py                          # 1k и 100k фильмов
+#   python benchmarks/run_benchmarks.py --sizes 1000 100000 10000000
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/<прошлый запуск>.json
+#
+# Результаты сохраняются в benchmarks/results/<время>-<коммит>.json. При --compare
+# этапы, у которых p50 вырос больше чем на --threshold, считаются регрессией (код выхода 1).
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_case(func, arguments: list) -> dict:
+    """
+    Вызывает func для каждого набора аргументов и возвращает пропускную способность и задержки.
+
+    :param func: Измеряемая функция.
+    :param arguments: Список кортежей аргументов.
+    :return: Словарь с полями ops, seconds, throughput, mean_ms, p50_ms, p95_ms, p99_ms.
+    """
+    from metrics import Histogram
+
+    timings = Histogram(max_samples=max(1, len(arguments)))  # перцентили по всем вызовам, а не по окну
+    started = time.perf_counter()
+    for args in arguments:
+        call_started = time.perf_counter()
+        func(*args)
+        timings.observe((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = timings.percentiles(0.5, 0.95, 0.99)
+    return {
+        "ops": timings.count,
+        "seconds": elapsed,
+        "throughput": timings.count / elapsed if elapsed else 0.0,
+        "mean_ms": timings.total / timings.count if timings.count else 0.0,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_mysql(size: int, data_dir: str, queries: int) -> dict:
+    """Измеряет функции поиска mysql_connector на синтетическом каталоге из size фильмов."""
+    import mysql_connector
+    from mysql_pool import MySQLConnectionPool, set_pool
+    from benchmarks.sqlite_shim import build_catalog, connect_factory, CATEGORIES
+    from benchmarks.synthetic import sample_keywords
+
+    print(f"Подготовка каталога из {size} фильмов...")
+    path = build_catalog(os.path.join(data_dir, f"catalog_{size}.sqlite"), size)
+    set_pool(MySQLConnectionPool({}, max_size=4, connect_func=connect_factory(path)))
+
+    rnd = random.Random(size)
+    keywords = [(keyword,) for keyword in sample_keywords(queries)]
+    genre_years = []
+    for _ in range(queries):
+        year_from = rnd.randint(1990, 2024)
+        genre_years.append((rnd.randint(1, len(CATEGORIES)), year_from, min(2024, year_from + rnd.randint(0, 5))))
+    genres = [(rnd.randint(1, len(CATEGORIES)),) for _ in range(queries)]
+
+    results = {}
+    for name, func, arguments in (
+        ("search_by_keyword", mysql_connector.search_by_keyword, keywords),
+        ("search_by_genre_and_years", mysql_connector.search_by_genre_and_years, genre_years),
+        ("get_year_range_for_genre", mysql_connector.get_year_range_for_genre, genres),
+    ):
+        results[f"{name}@{size}"] = run_case(func, arguments)
+        print(f"  {name}: p50 {results[f'{name}@{size}']['p50_ms']:.3f} мс")
+    return results
+
+
+def bench_mongo(queries: int) -> dict:
+    """Измеряет запись журнала запросов и расчёт топ-5 в MongoDB (или mongomock)."""
+    import mongodb_connector
+    from benchmarks.synthetic import sample_keywords
+
+    entries = [("keyword", {"keyword": keyword, "year_from": None, "year_to": None,
+                            "genre_id": None, "genre_name": None}, 10)
+               for keyword in sample_keywords(queries)]
+    results = {"log_search_to_mongo": run_case(mongodb_connector.log_search_to_mongo, entries)}
+
+    # пропускная способность записи с учётом фонового сброса пакетов в MongoDB
+    started = time.perf_counter()
+    for entry in entries:
+        mongodb_connector.log_search_to_mongo(*entry)
+    mongodb_connector.get_log_writer().flush(timeout=60)
+    elapsed = time.perf_counter() - started
+    results["log_search_to_mongo_flushed"] = {"ops": len(entries), "seconds": elapsed,
+                                              "throughput": len(entries) / elapsed if elapsed else 0.0}
+
+    with contextlib.redirect_stdout(io.StringIO()):  # функция печатает результат
+        results["get_most_frequent_queries"] = run_case(mongodb_connector.get_most_frequent_queries,
+                                                        [()] * min(queries, 50))
+    for name, stats in results.items():
+        if "p50_ms" in stats:
+            print(f"  {name}: p50 {stats['p50_ms']:.3f} мс")
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Сравнивает результаты с базовым запуском и печатает таблицу изменений.
+
+    :return: True, если найдена регрессия p50 больше threshold.
+    """
+    regression = False
+    print(f"\n{'этап':<45} {'было p50':>10} {'стало p50':>10} {'изменение':>10}")
+    for name, stats in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "p50_ms" not in stats or not old.get("p50_ms"):
+            continue
+        change = stats["p50_ms"] / old["p50_ms"] - 1
+        marker = "  <- регрессия" if change > threshold else ""
+        regression = regression or change > threshold
+        print(f"{name:<45} {old['p50_ms']:>8.3f}мс {stats['p50_ms']:>8.3f}мс {change:>+9.1%}{marker}")
+    return regression
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки поиска фильмов и журнала запросов")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000],
+                        help="размеры синтетического каталога (например 1000 100000 10000000)")
+    parser.add_argument("--queries", type=int, default=200, help="количество вызовов на каждый этап")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "films-bench"),
+                        help="каталог для сгенерированных баз SQLite")
+    parser.add_argument("--mongo", choices=["mongomock", "real", "none"], default="mongomock",
+                        help="замена MongoDB: mongomock, настоящий сервер из .env или не измерять")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"),
+                        help="каталог для JSON с результатами")
+    parser.add_argument("--compare", help="JSON прошлого запуска для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост p50 (доля)")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    # настройки должны быть заданы до импорта модулей приложения
+    os.environ["RESULT_CACHE_ENABLED"] = "0"
+    os.environ["REFERENCE_CACHE_TTL"] = "0"
+    os.environ["KEYWORD_SEARCH_MODE"] = "like"
+    os.environ.setdefault("ERROR_LOG_DIR", args.data_dir)
+    if args.mongo == "mongomock":
+        os.environ.setdefault("MONGO_DB", "films_bench")
+        os.environ.setdefault("MONGO_COLLECTION", "search_log")
+
+    results = {}
+    for size in args.sizes:
+        results.update(bench_mysql(size, args.data_dir, args.queries))
+
+    if args.mongo != "none":
+        import mongodb_connector
+        if args.mongo == "mongomock":
+            try:
+                import mongomock
+            except ImportError:
+                print("mongomock не установлен (pip install mongomock) — этапы MongoDB пропущены.")
+                mongomock = None
+            if mongomock is not None:
+                import pymongo
+                pymongo.MongoClient = mongomock.MongoClient  # mongodb_connector берёт клиент из pymongo при подключении
+                results.update(bench_mongo(args.queries))
+        else:
+            results.update(bench_mongo(args.queries))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "mongo": args.mongo,
+            "sizes": args.sizes,
+            "queries": args.queries,
+        },
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            if compare(report, json.load(file), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# Локальная замена MySQL для бенчмарков: соединение с файлом SQLite с интерфейсом pymysql
+# (cursor() как контекстный менеджер, параметры %s, строки-словари, ошибки pymysql.MySQLError).
+# Запросы mysql_connector переводятся в диалект SQLite так же, как для снимка каталога (catalog_snapshot.to_sqlite).
+
+import os
+import sqlite3
+
+import pymysql
+
+from benchmarks.synthetic import generate_films
+from catalog_snapshot import to_sqlite as translate
+
+
+class ShimCursor:
+    """Курсор с интерфейсом pymysql.cursors.DictCursor поверх sqlite3."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+        self._cursor = None
+        self._names = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor = self._connection.execute(translate(sql), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise pymysql.err.OperationalError(0, str(e)) from e
+        self._names = [column[0] for column in self._cursor.description or ()]
+        return self._cursor.rowcount
+
+    def _as_dict(self, row):
+        return dict(zip(self._names, row))
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._as_dict(row) if row is not None else None
+
+    def fetchall(self):
+        return [self._as_dict(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size=None):
+        return [self._as_dict(row) for row in self._cursor.fetchmany(size or 1)]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._as_dict(row)
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+
+
+class ShimConnection:
+    """Соединение с интерфейсом pymysql.Connection (в объёме, нужном пулу и mysql_connector)."""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self.open = True
+
+    def cursor(self, cursor_class=None):
+        return ShimCursor(self._connection)
+
+    def ping(self, reconnect=True):
+        pass
+
+    def thread_id(self):
+        return id(self)
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+        self.open = False
+
+
+def connect_factory(path: str):
+    """Возвращает функцию connect(**kwargs) для MySQLConnectionPool(connect_func=...)."""
+    return lambda **kwargs: ShimConnection(path)
+
+
+CATEGORIES = ["Action", "Animation", "Children", "Classics", "Comedy", "Documentary", "Drama", "Family",
+              "Foreign", "Games", "Horror", "Music", "New", "Sci-Fi", "Sports", "Travel"]
+
+
+def build_catalog(path: str, size: int, seed: int = 42, chunk: int = 50000) -> str:
+    """
+    Создаёт файл SQLite со схемой film / category / film_category, как в Sakila,
+    и заполняет его синтетическим каталогом из size фильмов. Готовый файл повторно не пересоздаётся.
+
+    :param path: Путь к файлу базы.
+    :param size: Количество фильмов.
+    :param seed: Начальное значение генератора (одинаковые данные между запусками).
+    :param chunk: Размер пакета вставки.
+    :return: Путь к файлу базы.
+    """
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    db.executescript('''
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE film (
+            film_id INTEGER PRIMARY KEY, title TEXT NOT NULL, description TEXT,
+            release_year INTEGER, length INTEGER, rating TEXT,
+            last_update TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE category (
+            category_id INTEGER PRIMARY KEY, name TEXT NOT NULL,
+            last_update TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE film_category (
+            film_id INTEGER NOT NULL, category_id INTEGER NOT NULL,
+            last_update TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (film_id, category_id)
+        );
+    ''')
+    db.executemany("INSERT INTO category (category_id, name) VALUES (?, ?)", list(enumerate(CATEGORIES, start=1)))
+
+    films = []
+    links = []
+    for film in generate_films(size, seed):
+        films.append((film["film_id"], film["title"], film["description"], film["release_year"],
+                      film["length"], film["rating"]))
+        links.append((film["film_id"], film["film_id"] * 7 % len(CATEGORIES) + 1))
+        if len(films) >= chunk:
+            db.executemany("INSERT INTO film (film_id, title, description, release_year, length, rating) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", films)
+            db.executemany("INSERT INTO film_category (film_id, category_id) VALUES (?, ?)", links)
+            films, links = [], []
+    if films:
+        db.executemany("INSERT INTO film (film_id, title, description, release_year, length, rating) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", films)
+        db.executemany("INSERT INTO film_category (film_id, category_id) VALUES (?, ?)", links)
+
+    # индексы, как в Sakila: idx_title и idx_fk_category_id
+    db.executescript('''
+        CREATE INDEX idx_title ON film (title);
+        CREATE INDEX idx_fk_category_id ON film_category (category_id);
+    ''')
+    db.commit()
+    db.close()
+    os.replace(tmp_path, path)
+    return path
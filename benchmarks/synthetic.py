@@ -0,0 +1,69 @@
+# Генерация синтетического каталога фильмов в духе Sakila для бенчмарков
+
+import random
+
+WORDS = [
+    "ACADEMY", "ACE", "ADAPTATION", "AFFAIR", "AFRICAN", "AGENT", "AIRPLANE", "ALABAMA", "ALADDIN",
+    "ALAMO", "ALASKA", "ALI", "ALIEN", "ALLEY", "AMADEUS", "AMELIE", "AMERICAN", "ANACONDA", "ANGELS",
+    "ANNIE", "ANONYMOUS", "ANTHEM", "ANTITRUST", "ANYTHING", "APACHE", "APOCALYPSE", "APOLLO",
+    "ARABIA", "ARGONAUTS", "ARIZONA", "ARMAGEDDON", "ARMY", "ARSENIC", "ARTIST", "ATLANTIS",
+    "ATTACKS", "BABY", "BACKLASH", "BADMAN", "BAKED", "BALLOON", "BANG", "BARBARELLA", "BEACH",
+    "BEAR", "BEAST", "BEAUTY", "BED", "BEDAZZLED", "BEHAVIOR", "BENEATH", "BERETS", "BETRAYED",
+    "BILKO", "BINGO", "BIRCH", "BIRD", "BLADE", "BLANKET", "BLINDNESS", "BLOOD", "BLUES", "BOILED",
+    "BONNIE", "BOONDOCK", "BORN", "BOULEVARD", "BOUND", "BOWFINGER", "BRANNIGAN", "BRAVEHEART",
+    "BREAKFAST", "BRIDE", "BRIGHT", "BRINGING", "BROOKLYN", "BROTHERHOOD", "BUBBLE", "BUCKET",
+    "BUGSY", "BULL", "BULWORTH", "BUNCH", "BUTCH", "BUTTERFLY", "CABIN", "CADDYSHACK", "CALENDAR",
+    "CALIFORNIA", "CAMELOT", "CAMPUS", "CANDIDATE", "CANDLES", "CANYON", "CAPER", "CARIBBEAN",
+    "CAROL", "CARRIE", "CASABLANCA", "CASPER", "CASSIDY", "CASUALTIES", "CAT", "CATCH", "CAUSE",
+    "CELEBRITY", "CENTER", "CHAINSAW", "CHAMBER", "CHAMPION", "CHANCE", "CHAPLIN", "CHARADE",
+    "CHARIOTS", "CHASING", "CHEAPER", "CHICAGO", "CHICKEN", "CHILL", "CHINATOWN", "CHISUM",
+]
+ADJECTIVES = ["Epic", "Astounding", "Fateful", "Boring", "Touching", "Intrepid", "Stunning", "Thoughtful"]
+NOUNS = ["Drama", "Documentary", "Saga", "Story", "Reflection", "Panorama", "Display", "Tale"]
+CHARACTERS = ["Dentist", "Cat", "Boat", "Astronaut", "Monkey", "Feminist", "Robot", "Hunter", "Lumberjack"]
+PLACES = ["Canadian Rockies", "Gulf of Mexico", "Ancient China", "Monastery", "Shark Tank", "Abandoned Mine Shaft"]
+
+
+def generate_films(count: int, seed: int = 42):
+    """
+    Генерирует строки таблицы film со случайными названиями и описаниями в стиле Sakila.
+
+    :param count: Количество фильмов.
+    :param seed: Начальное значение генератора случайных чисел (для воспроизводимости).
+    :return: Генератор словарей с полями film_id, title, description, release_year, length, rating.
+    """
+    rnd = random.Random(seed)
+    for film_id in range(1, count + 1):
+        title = f"{rnd.choice(WORDS)} {rnd.choice(WORDS)}"
+        if count > len(WORDS) ** 2:
+            title += f" {film_id}"  # в больших каталогах названия должны оставаться уникальными
+        description = (
+            f"A {rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)} of a {rnd.choice(CHARACTERS)} "
+            f"And a {rnd.choice(CHARACTERS)} who must Meet a {rnd.choice(CHARACTERS)} "
+            f"in {rnd.choice(PLACES)}"
+        )
+        yield {
+            "film_id": film_id,
+            "title": title,
+            "description": description,
+            "release_year": rnd.randint(1990, 2024),
+            "length": rnd.randint(46, 185),
+            "rating": rnd.choice(["G", "PG", "PG-13", "R", "NC-17"]),
+        }
+
+
+def sample_keywords(count: int, seed: int = 7) -> list:
+    """
+    Возвращает набор ключевых слов для поиска: фрагменты слов из названий разной длины.
+
+    :param count: Количество ключевых слов.
+    :param seed: Начальное значение генератора случайных чисел.
+    """
+    rnd = random.Random(seed)
+    keywords = []
+    for _ in range(count):
+        word = rnd.choice(WORDS)
+        length = rnd.randint(3, len(word))
+        start = rnd.randint(0, len(word) - length)
+        keywords.append(word[start:start + length].lower())
+    return keywords
@@ -0,0 +1,101 @@
+# Модуль кэша в памяти с ограничением времени жизни записей (TTL) и вытеснением давно неиспользуемых (LRU)
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш «ключ — значение» с TTL и LRU-вытеснением.
+
+    Запись считается устаревшей через ttl секунд после сохранения.
+    При превышении maxsize вытесняется запись, к которой дольше всего не обращались.
+    Счётчики hits/misses/evictions позволяют оценить эффективность кэша.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300.0):
+        """
+        :param maxsize: Максимальное количество записей.
+        :param ttl: Время жизни записи в секундах.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # ключ -> (значение, момент устаревания)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Возвращает значение из кэша или default, если записи нет или она устарела.
+        """
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value) -> None:
+        """
+        Сохраняет значение в кэше, при необходимости вытесняя самую старую по использованию запись.
+        """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, cache_if=None):
+        """
+        Возвращает значение из кэша, а при промахе вызывает loader() и сохраняет результат.
+
+        :param key: Ключ записи.
+        :param loader: Функция без аргументов, загружающая значение.
+        :param cache_if: Необязательная проверка: сохранять результат, только если cache_if(value) истинно
+                         (например, чтобы не кэшировать пустой ответ после ошибки базы).
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if cache_if is None or cache_if(value):
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=_MISSING) -> None:
+        """
+        Удаляет запись по ключу или, если ключ не указан, очищает весь кэш.
+        """
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        :return: Словарь с полями size, maxsize, hits, misses, evictions, hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
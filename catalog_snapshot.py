@@ -0,0 +1,373 @@
+# Локальный снимок каталога фильмов: таблицы film, category и film_category,
+# выгруженные из MySQL в файл SQLite с индексами. Каталог sakila небольшой и почти не меняется,
+# поэтому поиск по ключевому слову и по жанру/годам можно выполнять в процессе, без обращения к серверу.
+#
+# Снимок хранит «версию» каталога — количество строк и время последнего изменения каждой таблицы.
+# Раз в check_interval секунд версия сверяется с MySQL в фоновом потоке; если каталог изменился (или снимок старше
+# max_age), снимок считается устаревшим и mysql_connector возвращается к запросам в MySQL.
+#
+# Выгрузка:  python catalog_snapshot.py export [--path catalog.sqlite]
+# Состояние: python catalog_snapshot.py status
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import settings
+from lazy_import import lazy_import
+from mysql_pool import get_pool
+from logger import log_error
+from metrics import timed, observe, register_gauge
+
+pymysql = lazy_import("pymysql")
+
+# Схема повторяет нужную часть sakila. title сравнивается без учёта регистра,
+# как в MySQL (utf8mb4_general_ci), чтобы порядок и курсоры страниц совпадали.
+SCHEMA = '''
+    CREATE TABLE film (
+        film_id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL COLLATE NOCASE,
+        description TEXT,
+        release_year INTEGER,
+        length INTEGER,
+        rating TEXT
+    );
+    CREATE TABLE category (category_id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+    CREATE TABLE film_category (
+        film_id INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        PRIMARY KEY (film_id, category_id)
+    );
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+'''
+
+INDEXES = '''
+    CREATE INDEX idx_title ON film (title);
+    CREATE INDEX idx_film_release_year_title ON film (release_year, title);
+    CREATE INDEX idx_film_category_category_film ON film_category (category_id, film_id);
+'''
+
+# Версия каталога: любое изменение строк меняет количество или время последнего изменения (last_update)
+VERSION_SQL = '''
+    SELECT (SELECT COUNT(*) FROM film) AS films,
+           (SELECT MAX(last_update) FROM film) AS films_updated,
+           (SELECT COUNT(*) FROM category) AS categories,
+           (SELECT MAX(last_update) FROM category) AS categories_updated,
+           (SELECT COUNT(*) FROM film_category) AS links,
+           (SELECT MAX(last_update) FROM film_category) AS links_updated;
+'''
+
+_CONCAT = re.compile(r"CONCAT\(([^()]*)\)", re.IGNORECASE)
+
+
+def to_sqlite(sql: str) -> str:
+    """
+    Переводит запрос mysql_connector из диалекта MySQL в диалект SQLite:
+    CONCAT(a, b) -> (a || b), параметры %s -> ?, %% -> %.
+    """
+    sql = _CONCAT.sub(lambda m: "(" + " || ".join(part.strip() for part in m.group(1).split(",")) + ")", sql)
+    return sql.replace("%%", "%").replace("%s", "?")
+
+
+def read_catalog_version(connection) -> str:
+    """
+    Возвращает версию каталога в MySQL.
+
+    :param connection: Соединение pymysql.
+    :return: Строка вида 'films:updated|categories:updated|links:updated'.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(VERSION_SQL)
+        row = cursor.fetchone()
+    return "|".join(f"{row[count]}:{row[updated]}" for count, updated in
+                    (("films", "films_updated"), ("categories", "categories_updated"), ("links", "links_updated")))
+
+
+class CatalogSnapshot:
+    """
+    Открытый только для чтения снимок каталога.
+
+    Каждый поток получает собственное соединение SQLite, поэтому запросы из пула
+    потоков (batch.py, async_api.py) выполняются параллельно без блокировок.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        meta = dict(self._connection().execute("SELECT key, value FROM meta").fetchall())
+        self.version = meta.get("version", "")
+        self.created_at = float(meta.get("created_at", 0))
+        self.films = int(meta.get("films", 0))
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def query(self, sql: str, params=(), one: bool = False):
+        """
+        Выполняет запрос mysql_connector (в диалекте MySQL) по снимку.
+
+        :param sql: Текст запроса.
+        :param params: Параметры запроса.
+        :param one: Вернуть одну строку вместо списка.
+        :return: Словарь, список словарей или None, если запрос не поддерживается SQLite.
+        """
+        started = time.perf_counter()
+        try:
+            cursor = self._connection().execute(to_sqlite(sql), tuple(params))
+            rows = cursor.fetchmany(1) if one else cursor.fetchall()
+        except sqlite3.Error as e:
+            log_error(f"Ошибка запроса к снимку каталога: {e}", exc=e)
+            return None
+        observe("snapshot.query", time.perf_counter() - started)
+        rows = [dict(row) for row in rows]
+        return (rows[0] if rows else None) if one else rows
+
+    def stream(self, sql: str, params=(), fetch_size: int = 100):
+        """
+        Выполняет запрос по снимку и отдаёт строки по мере чтения, по fetch_size за раз.
+
+        :param sql: Текст запроса (в диалекте MySQL).
+        :param params: Параметры запроса.
+        :param fetch_size: Сколько строк читать из SQLite за раз.
+        :return: Генератор словарей или None, если запрос не поддерживается SQLite.
+        """
+        try:
+            cursor = self._connection().execute(to_sqlite(sql), tuple(params))
+        except sqlite3.Error as e:
+            log_error(f"Ошибка запроса к снимку каталога: {e}", exc=e)
+            return None
+        return self._iterate(cursor, fetch_size)
+
+    @staticmethod
+    def _iterate(cursor: sqlite3.Cursor, fetch_size: int):
+        try:
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(row)
+        finally:
+            cursor.close()
+
+    def age(self) -> float:
+        """Возраст снимка в секундах."""
+        return time.time() - self.created_at
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+
+@timed("snapshot.export")
+def export_snapshot(path: str = None) -> CatalogSnapshot:
+    """
+    Выгружает каталог из MySQL в новый файл снимка и атомарно заменяет им прежний.
+
+    Версия каталога читается до выгрузки строк, поэтому изменения, сделанные во время
+    выгрузки, будут обнаружены при следующей сверке и снимок будет обновлён ещё раз.
+
+    :param path: Путь к файлу снимка (по умолчанию settings.CATALOG_SNAPSHOT_SETTINGS['path']).
+    :return: Открытый новый снимок.
+    :raises pymysql.MySQLError: если не удалось прочитать каталог из MySQL.
+    """
+    path = path or settings.CATALOG_SNAPSHOT_SETTINGS['path']
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(SCHEMA)
+        with get_pool().connection() as connection:
+            version = read_catalog_version(connection)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT film_id, title, description, release_year, length, rating FROM film")
+                films = [(r['film_id'], r['title'], r['description'], r['release_year'], r['length'], r['rating'])
+                         for r in cursor.fetchall()]
+                cursor.execute("SELECT category_id, name FROM category")
+                categories = [(r['category_id'], r['name']) for r in cursor.fetchall()]
+                cursor.execute("SELECT film_id, category_id FROM film_category")
+                links = [(r['film_id'], r['category_id']) for r in cursor.fetchall()]
+
+        db.executemany("INSERT INTO film VALUES (?, ?, ?, ?, ?, ?)", films)
+        db.executemany("INSERT INTO category VALUES (?, ?)", categories)
+        db.executemany("INSERT INTO film_category VALUES (?, ?)", links)
+        db.executescript(INDEXES)
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", version), ("created_at", repr(time.time())), ("films", str(len(films))),
+        ])
+        db.commit()
+        db.execute("ANALYZE")
+    except BaseException:
+        db.close()
+        os.remove(tmp_path)
+        raise
+    db.close()
+    os.replace(tmp_path, path)
+    return CatalogSnapshot(path)
+
+
+_snapshot = None
+_stale = False        # снимок не совпадает с каталогом в MySQL
+_checked_at = 0.0     # время последней сверки версии с MySQL
+_state_lock = threading.Lock()
+_check_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def _load() -> CatalogSnapshot:
+    """Открывает файл снимка при первом обращении (None, если файла нет или он повреждён)."""
+    global _snapshot, _checked_at
+    if _snapshot is None and os.path.exists(settings.CATALOG_SNAPSHOT_SETTINGS['path']):
+        with _state_lock:
+            if _snapshot is None:
+                try:
+                    _snapshot = CatalogSnapshot(settings.CATALOG_SNAPSHOT_SETTINGS['path'])
+                    _checked_at = 0.0  # сверить версию при первом же запросе
+                except sqlite3.Error as e:
+                    log_error(f"Не удалось открыть снимок каталога: {e}", exc=e)
+    return _snapshot
+
+
+def _check_version(snapshot: CatalogSnapshot, background: bool = False) -> None:
+    """
+    Сверяет версию снимка с MySQL. Недоступность MySQL не делает снимок устаревшим.
+
+    :param background: Выполнить сверку в фоновом потоке: поиск продолжает пользоваться
+                       текущим снимком и не ждёт ответа MySQL (или его таймаута).
+    """
+    global _stale, _checked_at
+    if background:
+        if _check_lock.locked():
+            return
+        _checked_at = time.monotonic()  # следующие запросы не запускают ещё одну сверку
+        threading.Thread(target=_check_version, args=(snapshot,), daemon=True, name="catalog-snapshot-check").start()
+        return
+
+    if not _check_lock.acquire(blocking=False):
+        return  # сверку уже выполняет другой поток, остальные пользуются прежним результатом
+    try:
+        with get_pool().connection() as connection:
+            version = read_catalog_version(connection)
+        with _state_lock:
+            if snapshot is _snapshot:
+                _stale = version != snapshot.version
+    except Exception as e:
+        log_error(f"Не удалось сверить снимок каталога с MySQL: {e}", exc=e)
+    finally:
+        _checked_at = time.monotonic()
+        _check_lock.release()
+
+
+def get_snapshot():
+    """
+    Возвращает актуальный снимок каталога или None, если запросы нужно выполнять в MySQL:
+    снимок не настроен (CATALOG_SNAPSHOT_PATH пуст), не выгружен, старше max_age
+    или не совпадает с каталогом в MySQL.
+
+    Версия сверяется с MySQL в фоновом потоке, поэтому запрос не ждёт MySQL: до окончания
+    сверки используется текущий снимок. При auto_refresh устаревший или отсутствующий снимок
+    обновляется в фоновом потоке.
+    """
+    if not settings.CATALOG_SNAPSHOT_SETTINGS['path']:
+        return None
+    snapshot = _load()
+    if snapshot is not None and time.monotonic() - _checked_at >= settings.CATALOG_SNAPSHOT_SETTINGS['check_interval']:
+        _check_version(snapshot, background=True)
+
+    max_age = settings.CATALOG_SNAPSHOT_SETTINGS['max_age']
+    if snapshot is None or _stale or (max_age and snapshot.age() > max_age):
+        if settings.CATALOG_SNAPSHOT_SETTINGS['auto_refresh']:
+            refresh_snapshot(background=True)
+        return None
+    return snapshot
+
+
+def refresh_snapshot(background: bool = False) -> bool:
+    """
+    Выгружает каталог заново и переключает приложение на новый снимок.
+
+    :param background: Выполнить выгрузку в фоновом потоке и сразу вернуть управление.
+    :return: True, если снимок обновлён (для background — если выгрузка запущена).
+    """
+    global _snapshot, _stale, _checked_at
+    if background:
+        if _refresh_lock.locked():
+            return False
+        threading.Thread(target=refresh_snapshot, daemon=True, name="catalog-snapshot").start()
+        return True
+
+    if not _refresh_lock.acquire(blocking=False):
+        return False  # выгрузку уже выполняет другой поток
+    try:
+        snapshot = export_snapshot()
+    except (pymysql.MySQLError, OSError, sqlite3.Error) as e:
+        msg = f"Ошибка выгрузки снимка каталога: {e}"
+        print(msg)
+        log_error(msg, exc=e)
+        return False
+    finally:
+        _refresh_lock.release()
+
+    # прежний снимок не закрывается явно: другие потоки могут ещё выполнять по нему запросы,
+    # его соединения закроются вместе с объектом
+    with _state_lock:
+        _snapshot = snapshot
+        _stale = False
+        _checked_at = time.monotonic()
+    return True
+
+
+def snapshot_status() -> dict:
+    """
+    Возвращает состояние снимка: enabled, loaded, stale, age, films.
+    """
+    snapshot = _snapshot
+    return {
+        "enabled": bool(settings.CATALOG_SNAPSHOT_SETTINGS['path']),
+        "loaded": snapshot is not None,
+        "stale": _stale,
+        "age": round(snapshot.age(), 1) if snapshot is not None else None,
+        "films": snapshot.films if snapshot is not None else 0,
+    }
+
+
+register_gauge("catalog_snapshot", snapshot_status)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный снимок каталога фильмов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="выгрузить каталог из MySQL в файл снимка")
+    export_parser.add_argument("--path", default=settings.CATALOG_SNAPSHOT_SETTINGS['path'] or "catalog_snapshot.sqlite",
+                               help="путь к файлу снимка (по умолчанию CATALOG_SNAPSHOT_PATH)")
+    subparsers.add_parser("status", help="сравнить снимок с каталогом в MySQL")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        snapshot = export_snapshot(args.path)
+        print(f"Снимок сохранён в {args.path}: {snapshot.films} фильмов, версия {snapshot.version}")
+    else:
+        snapshot = _load()
+        if snapshot is None:
+            print("Снимок не найден (проверьте CATALOG_SNAPSHOT_PATH).")
+        else:
+            _check_version(snapshot)
+            status = snapshot_status()
+            print(f"Снимок {snapshot.path}: {status['films']} фильмов, возраст {status['age']} с, "
+                  f"{'устарел' if status['stale'] else 'актуален'}")
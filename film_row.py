@@ -0,0 +1,74 @@
+# Компактное представление строки фильма в результатах поиска.
+#
+# Строка DictCursor — это словарь с четырьмя строковыми ключами: на 100 тысяч найденных фильмов
+# только сами словари занимают около 19 МБ. Объект класса с __slots__ хранит те же четыре
+# значения без словаря атрибутов и без хэш-таблицы ключей и занимает в 2,5 раза меньше
+# (см. benchmarks/bench_row_format.py).
+# Доступ по ключу (film['title']) и метод get() сохранены, так что код, написанный для словарей
+# (handler.py, batch.py), работает с обоими форматами без изменений.
+
+class FilmRow:
+    """Строка результата поиска: film_id, title, description, release_year."""
+
+    __slots__ = ("film_id", "title", "description", "release_year")
+
+    def __init__(self, film_id, title, description, release_year):
+        self.film_id = film_id
+        self.title = title
+        self.description = description
+        self.release_year = release_year
+
+    @classmethod
+    def from_mapping(cls, row) -> "FilmRow":
+        """Создаёт строку из словаря (строки DictCursor или снимка каталога); лишние поля отбрасываются."""
+        return cls(row['film_id'], row['title'], row['description'], row['release_year'])
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> tuple:
+        return self.__slots__
+
+    def to_dict(self) -> dict:
+        """Возвращает строку в виде обычного словаря (например, для JSON)."""
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __eq__(self, other):
+        if isinstance(other, FilmRow):
+            return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+        if isinstance(other, dict):
+            return self.to_dict() == {key: other.get(key) for key in self.__slots__}
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"FilmRow({self.film_id!r}, {self.title!r}, release_year={self.release_year!r})"
+
+
+def compact_rows(rows: list) -> list:
+    """
+    Переводит список строк-словарей в список FilmRow (уже компактный список возвращается как есть).
+
+    :param rows: Строки с полями film_id, title, description, release_year.
+    :return: Список FilmRow.
+    """
+    if not rows or isinstance(rows[0], FilmRow):
+        return rows
+    return [FilmRow.from_mapping(row) for row in rows]
+
+
+def row_to_json(value):
+    """Функция default для json.dumps: FilmRow записывается как словарь, прочие объекты — строкой."""
+    if isinstance(value, FilmRow):
+        return value.to_dict()
+    return str(value)
@@ -1,12 +1,77 @@
 
 #Модуль содержит обработчики основных команд приложения
 
+from itertools import chain, islice
+
 from mongodb_connector import *
 from mysql_connector import *
 from logger import log_error # Функция логирования ошибок в файл
+from metrics import REGISTRY, timed, timer
+from query_registry import query_stats
+from suggest import suggest
+
+
+def _show_page(page, show_film):
+    """Выводит одну страницу фильмов."""
+    with timer("handler.render"):
+        for film in page:
+            show_film(film)
+
+
+def _show_stream(rows, show_film, prompt):
+    """
+    Постранично выводит оставшиеся фильмы по мере их чтения из базы (см. mysql_connector.stream_by_keyword).
+
+    Вызывается, когда пользователь попросил продолжение после первой страницы: следующая
+    страница выводится, как только из базы пришли её строки, а не весь остаток результата.
+    Поток закрывается по выходу, в том числе если пользователь прервал просмотр.
+
+    :param rows: Генератор строк результата после уже показанной страницы.
+    :param show_film: Функция вывода одного фильма.
+    :param prompt: Вопрос о продолжении просмотра.
+    :return: True, если результат прочитан до конца; False, если пользователь прервал просмотр
+             или чтение прервано ошибкой базы данных.
+    """
+    try:
+        pending = next(rows, None)
+        while pending is not None:
+            _show_page(chain([pending], islice(rows, PAGE_SIZE - 1)), show_film)
+            pending = next(rows, None)  # есть ли следующая страница
+            if pending is not None and input(prompt).strip().lower() != 'y':
+                return False
+        return True
+    except StreamError:
+        print("Показ результатов прерван из-за ошибки базы данных.\n")  # сама ошибка уже выведена
+        return False
+    finally:
+        rows.close()
+
+
+def _show_results(page, cursor, more_rows, show_film, prompt, end_message):
+    """
+    Выводит первую страницу результатов и, если пользователь хочет продолжения, остальные — потоком.
+
+    Первая страница и количество берутся обычными (кэшируемыми) запросами;
+    небуферизованное чтение открывается только для продолжения просмотра.
+
+    :param page: Первая страница фильмов.
+    :param cursor: Курсор следующей страницы или None, если других страниц нет.
+    :param more_rows: Функция от курсора, возвращающая генератор строк после первой страницы.
+    :param show_film: Функция вывода одного фильма.
+    :param prompt: Вопрос о продолжении просмотра.
+    :param end_message: Сообщение после последней страницы.
+    """
+    _show_page(page, show_film)
+    if cursor is not None:
+        if input(prompt).strip().lower() != 'y':
+            return
+        if not _show_stream(more_rows(cursor), show_film, prompt):
+            return
+    print(end_message)
 
 # обработка первого пункта меню
 
+@timed("handler.handle_keyword_search")
 def handle_keyword_search():
     """
     Обрабатывает поиск фильмов по ключевому слову.
@@ -14,55 +79,71 @@ def handle_keyword_search():
     1. Запрашивает у пользователя ключевое слово.
     2. Выполняет поиск по части названия фильма в базе MySQL.
     3. Логирует запрос в MongoDB.
-    4. Постранично отображает найденные фильмы по 10 результатов за раз.
+    4. Постранично отображает найденные фильмы по 10 результатов за раз: первая страница
+       и количество берутся из кэша результатов или короткими запросами, остальные страницы
+       читаются потоком по мере просмотра.
+    5. Если ничего не найдено — предлагает похожие названия (см. suggest.py)
+       и ищет выбранное, чтобы пользователю не приходилось подбирать слово наугад.
     """
     print("\n== ПОИСК ПО КЛЮЧЕВОМУ СЛОВУ ==")
     keyword = input("Введите слово или название фильма (или 0 для возврата): ")
     if keyword == "0":
         return
 
-    print(f"Выполняется поиск по ключевому слову: {keyword}...\n")
-    results = search_by_keyword(keyword)
-
-    # Логирование запроса в MongoDB с новой структурой
-    log_search_to_mongo(
-        search_type="keyword",
-        params={
-            "keyword": keyword,
-            "year_from": None,
-            "year_to": None,
-            "genre_id": None,
-            "genre_name": None
-        },
-        results_count=len(results)
-    )
-
-    if not results:
+    def show_film(film):
+        print(f"{film['film_id']}. {film['title']} ({film['release_year']})")
+        print(f"Описание: {film['description']}\n")
+
+    while keyword is not None:
+        print(f"Выполняется поиск по ключевому слову: {keyword}...\n")
+        total = count_by_keyword(keyword)
+
+        # Логирование запроса в MongoDB с новой структурой
+        log_search_to_mongo(
+            search_type="keyword",
+            params={
+                "keyword": keyword,
+                "year_from": None,
+                "year_to": None,
+                "genre_id": None,
+                "genre_name": None
+            },
+            results_count=total
+        )
+
+        if total:
+            page, cursor = search_by_keyword_page(keyword)
+            _show_results(page, cursor, lambda after: stream_by_keyword(keyword, after=after), show_film,
+                          "Показать следующие 10 результатов? (y/n): ", "Это были все результаты.\n")
+            return
+
         print("Ничего не найдено.\n")
-        return
+        keyword = _choose_suggestion(keyword)
 
-    index = 0
-    page_size = 10
-    total = len(results)
 
-    while index < total:
-        page = results[index:index + page_size]
-        for film in page:
-            print(f"{film['film_id']}. {film['title']} ({film['release_year']})")
-            print(f"Описание: {film['description']}\n")
-
-        index += page_size
+def _choose_suggestion(keyword):
+    """
+    Показывает названия фильмов, слово которых начинается с введённого фрагмента
+    (или с его начала, если во фрагменте опечатка), и предлагает выбрать одно для поиска.
 
-        if index < total:
-            more = input("Показать следующие 10 результатов? (y/n): ").lower()
-            if more != 'y':
-                break
-        else:
-            print("Это были все результаты.\n")
+    :param keyword: Фрагмент, по которому ничего не найдено.
+    :return: Выбранное название или None, если подсказок нет или пользователь отказался.
+    """
+    suggestions = suggest(keyword, shorten=True)
+    if not suggestions:
+        return None
+    print("Возможно, вы искали:")
+    for number, item in enumerate(suggestions, start=1):
+        print(f"{number}. {item['title']}")
+    choice = input("Введите номер названия для поиска (Enter — вернуться в меню): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(suggestions):
+        return suggestions[int(choice) - 1]['title']
+    return None
 
 
 # обработка второго пункта меню
 
+@timed("handler.handle_genre_search")
 def handle_genre_search():
     """
     Обрабатывает поиск фильмов по выбранному жанру и диапазону годов.
@@ -72,13 +153,16 @@ def handle_genre_search():
     2. Пользователь выбирает жанр.
     3. Отображает допустимый диапазон годов.
     4. Пользователь вводит год или диапазон годов.
-    5. Выполняется поиск фильмов в базе MySQL.
-    6. Результаты логируются в MongoDB.
-    7. Результаты отображаются постранично (по 10 записей).
+    5. Выполняется поиск фильмов в базе MySQL: количество и первая страница — одним запросом.
+    6. Запрос логируется в MongoDB.
+    7. Результаты отображаются постранично (по 10 записей); страницы после первой
+       читаются потоком по мере просмотра.
     """
+    genres = get_all_genres()
+    genre_names = {g['category_id']: g['name'] for g in genres}
+
     while True:
         print("\n== ДОСТУПНЫЕ ЖАНРЫ ==")
-        genres = get_all_genres()
         for g in genres:
             print(f"{g['category_id']}. {g['name']}")
         print("-------------------------------\n0. Вернуться в меню")
@@ -92,7 +176,6 @@ def handle_genre_search():
             continue
 
         genre_id = int(genre_input)
-        genre_names = {g['category_id']: g['name'] for g in genres}
         if genre_id not in genre_names:
             print("Ошибка: такого жанра нет.")
             continue
@@ -122,7 +205,9 @@ def handle_genre_search():
                 print("Ошибка: введите год в формате yyyy или yyyy-yyyy")
                 continue
 
-            results = search_by_genre_and_years(genre_id, year_from, year_to)
+            # количество и первая страница — одним запросом
+            result = search_by_genres(genre_id, year_from, year_to)
+            total = result["total"]
 
             # логирование в MongoDB
             log_search_to_mongo(
@@ -133,33 +218,25 @@ def handle_genre_search():
                     "year_from": year_from,
                     "year_to": year_to
                 },
-                results_count=len(results)
+                results_count=total
             )
 
-            if not results:
+            if not total:
                 print("Фильмы не найдены.")
                 continue
 
-            index = 0
-            page_size = 10
-            while index < len(results):
-                page = results[index:index + page_size]
-                for film in page:
-                    print(f"{film['film_id']} | {film['title']} ({film['release_year']})")
-                    print(f"Описание: {film['description']}\n")
-
-                index += page_size
-                if index >= len(results):
-                    print("Это были все результаты.")
-                    break
-
-                cont = input("Показать следующие 10? (y/n): ").strip().lower()
-                if cont != 'y':
-                    break
+            def show_film(film):
+                print(f"{film['film_id']} | {film['title']} ({film['release_year']})")
+                print(f"Описание: {film['description']}\n")
+
+            _show_results(result["rows"], result["next_cursor"],
+                          lambda after: stream_by_genre_and_years(genre_id, year_from, year_to, after=after),
+                          show_film, "Показать следующие 10? (y/n): ", "Это были все результаты.")
             break
 
 # обработка третьего пункта меню
 
+@timed("handler.show_top_5_keyword_queries")
 def show_top_5_keyword_queries():
     """
     Выводит топ-5 наиболее частых поисковых запросов по ключевому слову.
@@ -174,9 +251,10 @@ def show_top_5_keyword_queries():
         # print(f"Ошибка при получении статистики: {e}")
         error_msg = f"Ошибка при получении статистики: {e}"
         print(error_msg)
-        log_error(error_msg)
+        log_error(error_msg, exc=e)
 
 
+@timed("handler.show_last_5_keyword_queries")
 def show_last_5_keyword_queries():
     """
     Выводит последние 5 поисковых запросов по ключевому слову.
@@ -190,9 +268,10 @@ def show_last_5_keyword_queries():
         #print(f"Ошибка при получении последних запросов: {e}")
         error_msg = f"Ошибка при получении последних запросов: {e}"
         print(error_msg)
-        log_error(error_msg)
+        log_error(error_msg, exc=e)
 
    
+@timed("handler.show_recent_query_logs")
 def show_recent_query_logs():
     """
     Выводит все поисковые запросы, сохранённые в MongoDB, постранично по 10 записей.
@@ -207,38 +286,142 @@ def show_recent_query_logs():
     """
     print("\n== СПИСОК ВСЕХ ПОИСКОВЫХ ЗАПРОСОВ (ПО 10 НА СТРАНИЦЕ) ==")
 
-    client, collection = connect_to_mongo()
+    get_log_writer().flush()  # чтобы в списке были и только что выполненные поиски
 
-    try:
-        cursor = collection.find().sort("timestamp", -1)
-        results = list(cursor)
-        if not results:
-            print("Нет сохранённых запросов.\n")
-            return
+    page, cursor = get_logs_page()
+    if not page:
+        print("Нет сохранённых запросов.\n")
+        return
 
-        index = 0
-        page_size = 10
-        total = len(results)
+    while True:
+        for doc in page:
+            timestamp = format_timestamp(doc.get("timestamp", "N/A"))
+            search_type = doc.get("search_type", "N/A")
+            params = doc.get("params", {})
+            results_count = doc.get("results_count", "N/A")
 
-        while index < total:
-            page = results[index:index + page_size]
-            for doc in page:
-                timestamp = doc.get("timestamp", "N/A")
-                search_type = doc.get("search_type", "N/A")
-                params = doc.get("params", {})
-                results_count = doc.get("results_count", "N/A")
+            print(f"[{timestamp}] {search_type.upper()} — {params} (результатов: {results_count})")
 
-                print(f"[{timestamp}] {search_type.upper()} — {params} (результатов: {results_count})")
+        if cursor is None:
+            print("\nЭто были все запросы.\n")
+            break
 
-            index += page_size
+        cont = input("\nПоказать ещё 10 запросов? (y/n): ").strip().lower()
+        if cont != "y":
+            break
+        page, cursor = get_logs_page(after=cursor)
 
-            if index < total:
-                cont = input("\nПоказать ещё 10 запросов? (y/n): ").strip().lower()
-                if cont != "y":
-                    break
-            else:
-                print("\nЭто были все запросы.\n")
 
-    finally:
-        client.close()
+@timed("handler.show_cache_stats")
+def show_cache_stats():
+    """
+    Выводит статистику кэшей поиска: кэша результатов и кэша справочных данных (жанры, годы).
+
+    Доля попаданий (hit rate) показывает, какая часть запросов обслужена без обращения к MySQL.
+    """
+    print("\n== ЭФФЕКТИВНОСТЬ КЭШЕЙ ==")
+
+    stats = get_result_cache_stats()
+    if stats is None:
+        print("Кэш результатов поиска отключён.")
+    else:
+        print("Кэш результатов поиска:")
+        print(f"- попаданий: {stats['hits'] + stats['shared_hits']} (из общего хранилища: {stats['shared_hits']}), "
+              f"промахов: {stats['misses']}, доля попаданий: {stats['hit_rate']:.1%}")
+        print(f"- записей: {stats['entries']}, объём: {stats['bytes'] / 1024:.1f} из "
+              f"{stats['max_bytes'] / 1024:.0f} КБ, вытеснено: {stats['evictions']}")
+
+    stats = get_reference_cache_stats()
+    print("Кэш жанров и диапазонов годов:")
+    print(f"- попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+          f"доля попаданий: {stats['hit_rate']:.1%}, записей: {stats['size']}")
+
+
+@timed("handler.show_mongo_diagnostics")
+def show_mongo_diagnostics():
+    """
+    Выводит планы выполнения запросов статистики MongoDB: используемые индексы
+    и количество просмотренных документов и ключей.
+
+    Если документов просмотрено намного больше, чем возвращено, запросу не хватает индекса.
+    """
+    print("\n== ДИАГНОСТИКА ЗАПРОСОВ СТАТИСТИКИ ==")
+    try:
+        for plan in explain_stats_queries():
+            indexes = ", ".join(plan['indexes']) or "нет (полный просмотр)"
+            print(f"- {plan['query']}")
+            print(f"  этапы: {', '.join(plan['stages'])}; индексы: {indexes}")
+            print(f"  просмотрено документов: {plan['docs_examined']}, ключей: {plan['keys_examined']}, "
+                  f"возвращено: {plan['returned']}, время: {plan['time_ms']} мс")
+    except Exception as e:
+        error_msg = f"Ошибка при получении планов запросов: {e}"
+        print(error_msg)
+        log_error(error_msg, exc=e)
+
 
+@timed("handler.show_searches_per_period")
+def show_searches_per_period():
+    """
+    Выводит количество поисковых запросов по часам за последние сутки
+    или по дням за последний месяц.
+    """
+    print("\n== КОЛИЧЕСТВО ПОИСКОВ ПО ВРЕМЕНИ ==")
+    unit = input("Группировать по часам (h) или по дням (d)? ").strip().lower()
+    unit, periods = ("day", 30) if unit == "d" else ("hour", 24)
+    try:
+        buckets = get_searches_per_period(unit, periods)
+    except Exception as e:
+        error_msg = f"Ошибка при получении статистики по времени: {e}"
+        print(error_msg)
+        log_error(error_msg, exc=e)
+        return
+
+    if not buckets:
+        print("За этот период поисков не было.")
+        return
+    for bucket in buckets:
+        print(f"{bucket['period']}: {bucket['total']} "
+              f"(по ключевому слову: {bucket['keyword']}, по жанру: {bucket['genre_year']})")
+
+
+def show_performance():
+    """
+    Выводит метрики производительности: перцентили p50/p95/p99 длительности каждого этапа
+    (подключение, запросы MySQL и MongoDB, запись журнала, вывод результатов),
+    счётчики и состояние пулов и кэшей.
+
+    Время обработчиков handler.* включает ожидание ввода пользователя.
+    Запросы MySQL из реестра (query_registry.py) выводятся отдельно, от самых затратных по суммарному времени.
+    Метрики можно сохранить в файл в формате Prometheus или JSON.
+    """
+    print("\n== ПРОИЗВОДИТЕЛЬНОСТЬ ==")
+    snapshot = REGISTRY.snapshot()
+    if not snapshot["stages"]:
+        print("Пока нет измерений.")
+    else:
+        print(f"{'этап':<45} {'вызовов':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+        for stage, stats in snapshot["stages"].items():
+            print(f"{stage:<45} {stats['count']:>8} {stats['p50'] * 1000:>9.2f} "
+                  f"{stats['p95'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f}")
+    for name, value in {**snapshot["counters"], **snapshot["gauges"]}.items():
+        print(f"- {name}: {value:.3f}" if isinstance(value, float) else f"- {name}: {value}")
+
+    queries = query_stats()
+    if queries:
+        print("\nЗапросы MySQL по суммарному времени:")
+        print(f"{'запрос':<25} {'вызовов':>8} {'всего, мс':>11} {'ср., мс':>9} {'p95, мс':>9} {'строк':>9} {'ошибок':>7}")
+        for item in queries[:10]:
+            print(f"{item['name']:<25} {item['calls']:>8} {item['total_ms']:>11.1f} {item['avg_ms']:>9.2f} "
+                  f"{item['p95_ms']:>9.2f} {item['rows']:>9} {item['errors']:>7}")
+
+    export = input("\nСохранить метрики в файл? (p — Prometheus, j — JSON, Enter — нет): ").strip().lower()
+    if export in ("p", "j"):
+        path = "metrics.prom" if export == "p" else "metrics.json"
+        try:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(REGISTRY.to_prometheus() if export == "p" else REGISTRY.to_json())
+            print(f"Метрики сохранены в {path}")
+        except OSError as e:
+            error_msg = f"Ошибка при сохранении метрик: {e}"
+            print(error_msg)
+            log_error(error_msg, exc=e)
@@ -0,0 +1,315 @@
+# HTTP-сервис поиска фильмов: функции mysql_connector и статистика MongoDB в виде JSON-эндпоинтов.
+#
+# Все клиенты обслуживаются одним процессом и делят общий пул соединений MySQL и клиент MongoDB,
+# а не открывают собственные подключения, как отдельные экземпляры интерактивного меню.
+# Запросы к базам выполняются в ограниченном пуле потоков (HTTP_SETTINGS['workers']);
+# если ответ не готов за HTTP_SETTINGS['request_timeout'] секунд, клиент получает 504.
+#
+# Эндпоинты (только GET, ответы в JSON):
+#   /genres                                                 — список жанров
+#   /search/keyword?keyword=<слово>[&page_size=N][&after=<курсор>]
+#   /search/genre?genre_id=<id>[&genre_id=<id>...]&year_from=<год>[&year_to=<год>][&page_size=N][&after=<курсор>]
+#   /suggest?prefix=<начало слова>[&limit=N]                — подсказки названий фильмов (см. suggest.py)
+#   /stats/top[?limit=N]                                    — самые частые запросы по ключевому слову
+#   /stats/last[?limit=N]                                   — последние запросы по ключевому слову
+#   /metrics[?format=prometheus]                            — метрики приложения
+#   /health                                                 — состояние выключателей MySQL и MongoDB
+#
+# Поиск возвращает {"total", "rows", "next_cursor"}; следующая страница запрашивается с after=next_cursor.
+# total считается только для первой страницы (на следующих он равен null).
+# Ошибка базы данных — ответ 503; такой поиск не записывается в журнал запросов.
+#
+# Запуск:
+#   python main.py serve [--host 0.0.0.0] [--port 8080]
+#   python http_service.py [--host 0.0.0.0] [--port 8080]
+
+import argparse
+import base64
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import mysql_connector
+import mongodb_connector
+import settings
+from film_row import row_to_json
+from logger import log_error
+from metrics import REGISTRY, observe, inc
+from resilience import CircuitOpenError, get_breaker
+from suggest import suggest
+
+
+class RequestError(ValueError):
+    """Некорректные параметры запроса (ответ 400)."""
+
+
+def _param(query: dict, name: str, kind=str, default=None, required: bool = False):
+    """
+    Возвращает параметр строки запроса, приведённый к типу kind.
+
+    :raises RequestError: если обязательный параметр не указан или не приводится к типу.
+    """
+    values = query.get(name)
+    if not values or values[0] == "":
+        if required:
+            raise RequestError(f"не указан параметр {name}")
+        return default
+    try:
+        return kind(values[0])
+    except ValueError:
+        raise RequestError(f"некорректное значение параметра {name}: {values[0]}")
+
+
+def _page_size(query: dict) -> int:
+    page_size = _param(query, "page_size", int, mysql_connector.PAGE_SIZE)
+    return max(1, min(page_size, settings.HTTP_SETTINGS['max_page_size']))
+
+
+def encode_cursor(cursor) -> str:
+    """Кодирует курсор следующей страницы в непрозрачную строку для клиента (None остаётся None)."""
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor, ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(text: str, offset: bool = False):
+    """
+    Разбирает курсор, полученный от клиента, и проверяет его вид.
+
+    :param text: Строка курсора из параметра after (None — первая страница).
+    :param offset: Ожидается позиция в результате (неотрицательное целое), а не пара [title, film_id].
+    :return: Целое число или кортеж (title, film_id).
+    :raises RequestError: если курсор не разбирается или не подходит для этого поиска.
+    """
+    if text is None:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(text.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise RequestError("некорректный курсор after")
+    if offset:
+        if isinstance(cursor, int) and not isinstance(cursor, bool) and cursor >= 0:
+            return cursor
+    elif (isinstance(cursor, list) and len(cursor) == 2 and isinstance(cursor[0], str)
+          and isinstance(cursor[1], int) and not isinstance(cursor[1], bool)):
+        return tuple(cursor)
+    raise RequestError("курсор after не подходит для этого поиска")
+
+
+def genres(query: dict) -> dict:
+    return {"genres": mysql_connector.get_all_genres(strict=True)}
+
+
+def keyword_search(query: dict) -> dict:
+    keyword = _param(query, "keyword", required=True).strip()
+    if not keyword:
+        raise RequestError("пустое ключевое слово")
+    after = decode_cursor(_param(query, "after"), offset=mysql_connector.keyword_page_uses_offset(keyword))
+    rows, next_cursor = mysql_connector.search_by_keyword_page(keyword, after=after, page_size=_page_size(query),
+                                                               strict=True)
+    total = None
+    if after is None:  # первая страница: считаем результаты и записываем запрос в журнал, как меню
+        total = mysql_connector.count_by_keyword(keyword, strict=True)
+        mongodb_connector.log_search_to_mongo(
+            "keyword", {"keyword": keyword, "year_from": None, "year_to": None, "genre_id": None, "genre_name": None},
+            total)
+    return {"total": total, "rows": rows, "next_cursor": encode_cursor(next_cursor)}
+
+
+def genre_search(query: dict) -> dict:
+    try:
+        genre_ids = [int(value) for value in query.get("genre_id", []) if value]
+    except ValueError:
+        raise RequestError("некорректное значение параметра genre_id")
+    if not genre_ids:
+        raise RequestError("не указан параметр genre_id")
+    year_from = _param(query, "year_from", int)
+    year_to = _param(query, "year_to", int, year_from)
+    if year_from is not None and year_to is not None and year_from > year_to:
+        raise RequestError("начальный год больше конечного")
+    after = decode_cursor(_param(query, "after"))
+
+    result = mysql_connector.search_by_genres(genre_ids, year_from, year_to, after=after, page_size=_page_size(query),
+                                              strict=True)
+    if after is None:
+        names = {g['category_id']: g['name'] for g in mysql_connector.get_all_genres(strict=True)}
+        genre_id = genre_ids[0] if len(genre_ids) == 1 else genre_ids
+        genre_name = names.get(genre_ids[0]) if len(genre_ids) == 1 else [names.get(i) for i in genre_ids]
+        mongodb_connector.log_search_to_mongo(
+            "genre_year", {"genre_id": genre_id, "genre_name": genre_name, "year_from": year_from, "year_to": year_to},
+            result["total"])
+    return {"total": result["total"] if after is None else None, "min_year": result["min_year"],
+            "max_year": result["max_year"], "rows": result["rows"],
+            "next_cursor": encode_cursor(result["next_cursor"])}
+
+
+def suggestions(query: dict) -> dict:
+    prefix = _param(query, "prefix", required=True)
+    limit = max(1, min(_param(query, "limit", int, settings.SUGGEST_SETTINGS['limit']), 20))
+    return {"suggestions": suggest(prefix, limit)}
+
+
+def _limit(query: dict) -> int:
+    return max(1, min(_param(query, "limit", int, 5), 100))
+
+
+def top_queries(query: dict) -> dict:
+    results = mongodb_connector.most_frequent_queries(limit=_limit(query))
+    if results is None:
+        raise CircuitOpenError("mongo", get_breaker("mongo").retry_in())
+    return {"queries": results}
+
+
+def last_queries(query: dict) -> dict:
+    results = mongodb_connector.last_queries(limit=_limit(query))
+    if results is None:
+        raise CircuitOpenError("mongo", get_breaker("mongo").retry_in())
+    return {"queries": [{"keyword": entry.get("params", {}).get("keyword"),
+                         "timestamp": entry["timestamp"].isoformat() if hasattr(entry.get("timestamp"), "isoformat")
+                         else entry.get("timestamp")}
+                        for entry in results]}
+
+
+def health(query: dict) -> dict:
+    breakers = {name: get_breaker(name).state for name in ("mysql", "mongo")}
+    return {"status": "ok" if breakers["mysql"] == "closed" else "degraded", "breakers": breakers}
+
+
+# Обработчики, обращающиеся к базам, выполняются в пуле потоков с таймаутом
+ROUTES = {
+    "/genres": genres,
+    "/search/keyword": keyword_search,
+    "/search/genre": genre_search,
+    "/suggest": suggestions,
+    "/stats/top": top_queries,
+    "/stats/last": last_queries,
+}
+
+
+class SearchHTTPServer(ThreadingHTTPServer):
+    """
+    Многопоточный HTTP-сервер: каждое соединение обслуживается своим потоком,
+    а обращения к базам — ограниченным пулом потоков с таймаутом на запрос.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128  # очередь входящих соединений (по умолчанию 5: лишние клиенты ждали бы повтора SYN)
+
+    def __init__(self, address, workers: int = None, request_timeout: float = None):
+        """
+        :param address: Пара (host, port).
+        :param workers: Сколько запросов одновременно выполняется в базах (по умолчанию HTTP_SETTINGS['workers']).
+        :param request_timeout: Таймаут запроса в секундах (по умолчанию HTTP_SETTINGS['request_timeout']).
+        """
+        super().__init__(address, SearchRequestHandler)
+        self.request_timeout = request_timeout or settings.HTTP_SETTINGS['request_timeout']
+        self.executor = ThreadPoolExecutor(max_workers=workers or settings.HTTP_SETTINGS['workers'],
+                                           thread_name_prefix="http-db")
+
+    def call(self, func, query: dict) -> tuple:
+        """
+        Выполняет обработчик в пуле потоков.
+
+        :return: Кортеж (HTTP-статус, тело ответа).
+        """
+        future = self.executor.submit(func, query)
+        try:
+            return 200, future.result(timeout=self.request_timeout)
+        except FuturesTimeout:
+            future.cancel()  # если запрос ещё ждёт в очереди, он не будет выполнен
+            inc("http.timeouts")
+            return 504, {"error": f"превышено время ожидания ответа ({self.request_timeout} с)"}
+        except RequestError as e:
+            return 400, {"error": str(e)}
+        except CircuitOpenError as e:
+            return 503, {"error": str(e)}
+        except mysql_connector.SearchError:
+            return 503, {"error": "база данных недоступна"}  # подробности уже записаны в журнал ошибок
+        except Exception as e:
+            log_error(f"Ошибка HTTP-запроса {func.__name__}: {e}", exc=e)
+            return 500, {"error": "внутренняя ошибка сервера"}
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP-запросов: разбор адреса, вызов обработчика и ответ в JSON."""
+
+    server_version = "FilmsSearch/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive: клиент не открывает соединение на каждый запрос
+    timeout = 60                   # закрывать соединения клиентов, молчащих дольше минуты
+    disable_nagle_algorithm = True # заголовки и тело уходят отдельными пакетами: без этого keep-alive ждёт ~40 мс ACK
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/metrics":
+            if _param(query, "format") == "prometheus":
+                self._send(200, REGISTRY.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._send_json(200, REGISTRY.snapshot())
+            return
+        if url.path == "/health":
+            self._send_json(200, health(query))
+            return
+
+        func = ROUTES.get(url.path)
+        if func is None:
+            self._send_json(404, {"error": f"неизвестный адрес {url.path}"})
+            return
+        status, body = self.server.call(func, query)
+        self._send_json(status, body)
+        observe(f"http.{func.__name__}", time.perf_counter() - started)
+        inc(f"http.status_{status}")
+
+    def _send_json(self, status: int, body) -> None:
+        self._send(status, json.dumps(body, ensure_ascii=False, default=row_to_json).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+    def _send(self, status: int, payload: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # журнал каждого запроса в stderr замедлял бы сервис; ошибки пишутся через log_error
+
+
+def serve(host: str = None, port: int = None) -> None:
+    """
+    Запускает HTTP-сервис и обслуживает клиентов до остановки процесса.
+
+    :param host: Адрес для прослушивания (по умолчанию HTTP_SETTINGS['host']).
+    :param port: Порт для прослушивания (по умолчанию HTTP_SETTINGS['port']).
+    """
+    host = host or settings.HTTP_SETTINGS['host']
+    port = settings.HTTP_SETTINGS['port'] if port is None else port
+    server = SearchHTTPServer((host, port))
+    print(f"HTTP-сервис поиска запущен на http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Сервис остановлен.")
+    finally:
+        server.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="main.py serve", description="HTTP-сервис поиска фильмов")
+    parser.add_argument("--host", help="адрес для прослушивания (по умолчанию HTTP_HOST или 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="порт (по умолчанию HTTP_PORT или 8080)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
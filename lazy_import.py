@@ -0,0 +1,35 @@
+# Отложенный импорт тяжёлых модулей (драйверов pymysql и pymongo).
+#
+# Импорт pymongo занимает больше 100 мс, а при запуске приложения он не нужен:
+# меню должно появиться сразу, а драйвер понадобится только при первом запросе к базе.
+
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Заместитель модуля: настоящий модуль импортируется при первом обращении к любому атрибуту.
+
+    Обращения делегируются модулю из sys.modules, поэтому замена атрибута настоящего модуля
+    (например, pymongo.MongoClient в бенчмарках) видна и через заместитель. Импорт выполняется
+    через importlib.import_module, который защищён блокировкой импорта, поэтому первое обращение
+    из нескольких потоков одновременно безопасно.
+    """
+
+    def __getattr__(self, name):
+        return getattr(importlib.import_module(self.__name__), name)
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}'>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Возвращает заместитель модуля name, не импортируя его.
+
+    Пример: pymongo = lazy_import("pymongo"); ...; client = pymongo.MongoClient(uri)
+
+    :param name: Полное имя модуля.
+    """
+    return LazyModule(name)
@@ -0,0 +1,445 @@
+# Хранение журнала поисковых запросов: дневные сводки, архив в сжатых файлах и удаление старых записей.
+#
+# Журнал (коллекция MONGODB_SETTINGS['collection']) растёт без ограничения, а запросы статистики
+# и просмотр журнала работают тем медленнее, чем он больше. Записи старше archive_after_days дней
+# обрабатываются по суткам (UTC), за один проход чтения на сутки:
+#   1. записи выгружаются в сжатый файл <archive_dir>/<коллекция>/<год>/<YYYY-MM-DD>.<формат>.gz;
+#   2. по ним строится дневная сводка в коллекции <collection>_daily
+#      (число запросов по типам, поиски без результатов, популярные ключевые слова и жанры, запросы по часам);
+#   3. из журнала пакетами по batch_size удаляются записи с _id, выгруженными в файл.
+# Сводка получает status='archived' только после записи файла, поэтому прерванный запуск
+# безопасно повторить. Для уже выгруженных суток повторный запуск удаляет записи, которые есть в файлах
+# архива, а записи, попавшие в эти сутки позже (например, строки времени, преобразованные
+# migrate_timestamps_to_dates), выгружает в следующую часть <YYYY-MM-DD>.part<N>.<формат>.gz
+# и пересчитывает сводку по всем частям.
+# Общие счётчики статистики (search_stats.py) при этом не меняются.
+#
+# Форматы архива:
+#   jsonl   — gzip JSON Lines, по записи журнала на строку;
+#   columns — gzip JSON Lines, где каждая строка — группа до batch_size записей по столбцам
+#             (timestamp, search_type, params.keyword, ...), как группы строк в Parquet:
+#             однотипные значения рядом сжимаются лучше и читаются по отдельным столбцам.
+#             Поле, которого нет у части записей группы, читается у них как null.
+#
+# Запуск из командной строки:
+#   python main.py retention run [--days 30] [--format columns] [--dry-run]
+#   python main.py retention status
+#   python main.py retention summary --days 14
+#   python main.py retention read log_archive/<коллекция>/2024/2024-05-01.jsonl.gz --limit 10
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import settings
+from lazy_import import lazy_import
+from logger import log_error
+from metrics import timed
+
+pymongo = lazy_import("pymongo")
+
+ARCHIVE_FORMATS = ("jsonl", "columns")
+TOP_VALUES = 100  # сколько популярных ключевых слов и жанров хранится в дневной сводке
+
+
+def daily_collection_name() -> str:
+    """Имя коллекции дневных сводок (<collection>_daily)."""
+    return f"{settings.MONGODB_SETTINGS['collection']}_daily"
+
+
+def archive_path(day: str, archive_format: str, archive_dir: str = None, part: int = 1) -> str:
+    """
+    Путь к файлу архива за сутки.
+
+    :param day: Дата в формате 'YYYY-MM-DD'.
+    :param archive_format: 'jsonl' или 'columns'.
+    :param archive_dir: Каталог архива (по умолчанию MONGO_LOG_RETENTION_SETTINGS['archive_dir']).
+    :param part: Номер части архива суток (вторая и следующие — записи, попавшие в сутки после выгрузки).
+    """
+    archive_dir = archive_dir or settings.MONGO_LOG_RETENTION_SETTINGS['archive_dir']
+    name = f"{day}.{archive_format}.gz" if part == 1 else f"{day}.part{part}.{archive_format}.gz"
+    return os.path.join(archive_dir, settings.MONGODB_SETTINGS['collection'], day[:4], name)
+
+
+def _day_range(day: datetime) -> dict:
+    return {"timestamp": {"$gte": day, "$lt": day + timedelta(days=1)}}
+
+
+def _to_json(entry: dict) -> dict:
+    """Запись журнала в виде, пригодном для JSON: _id — строка, timestamp — ISO 8601."""
+    entry = dict(entry)
+    entry["_id"] = str(entry["_id"])
+    timestamp = entry.get("timestamp")
+    if isinstance(timestamp, datetime):
+        entry["timestamp"] = timestamp.isoformat()
+    return entry
+
+
+def _from_json(entry: dict) -> dict:
+    timestamp = entry.get("timestamp")
+    if isinstance(timestamp, str):
+        try:
+            entry["timestamp"] = datetime.fromisoformat(timestamp)
+        except ValueError:
+            pass  # записи, созданные до перехода на даты BSON, хранят время строкой произвольного вида
+    return entry
+
+
+def _flatten(entry: dict) -> dict:
+    """Разворачивает вложенные params в столбцы 'params.<поле>'."""
+    row = {key: value for key, value in entry.items() if key != "params"}
+    for key, value in (entry.get("params") or {}).items():
+        row[f"params.{key}"] = value
+    return row
+
+
+def _unflatten(row: dict) -> dict:
+    entry, params = {}, {}
+    for key, value in row.items():
+        if key.startswith("params."):
+            params[key[len("params."):]] = value
+        else:
+            entry[key] = value
+    entry["params"] = params
+    return entry
+
+
+class ArchiveWriter:
+    """
+    Потоковая запись архива в файл: сначала во временный файл, который по close()
+    атомарно заменяет целевой, так что прерванная выгрузка не оставляет неполный архив.
+    """
+
+    def __init__(self, path: str, archive_format: str = "jsonl", group_size: int = 5000):
+        """
+        :param path: Путь к файлу архива.
+        :param archive_format: 'jsonl' или 'columns'.
+        :param group_size: Размер группы строк для формата 'columns'.
+        """
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"неизвестный формат архива: {archive_format}")
+        self.path = path
+        self.archive_format = archive_format
+        self.group_size = group_size
+        self.count = 0
+        self._group = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tmp_path = path + ".tmp"
+        self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+
+    def write(self, entry: dict) -> None:
+        entry = _to_json(entry)
+        self.count += 1
+        if self.archive_format == "jsonl":
+            self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            return
+        self._group.append(_flatten(entry))
+        if len(self._group) >= self.group_size:
+            self._write_group()
+
+    def _write_group(self) -> None:
+        names = sorted({name for row in self._group for name in row})
+        group = {"rows": len(self._group), "columns": {name: [row.get(name) for row in self._group] for name in names}}
+        self._file.write(json.dumps(group, ensure_ascii=False, default=str) + "\n")
+        self._group = []
+
+    def close(self) -> None:
+        """Дописывает последнюю группу и переименовывает временный файл в целевой."""
+        if self._group:
+            self._write_group()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        """Прерывает выгрузку и удаляет временный файл."""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def read_archive(path: str):
+    """
+    Читает файл архива любого формата.
+
+    :param path: Путь к файлу *.jsonl.gz или *.columns.gz.
+    :return: Генератор записей журнала (timestamp — datetime, _id — строка).
+    """
+    columnar = path.endswith(".columns.gz")
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not columnar:
+                yield _from_json(item)
+                continue
+            columns = item["columns"]
+            for index in range(item["rows"]):
+                yield _from_json(_unflatten({name: values[index] for name, values in columns.items()}))
+
+
+class DailyRollup:
+    """Сводка журнала за сутки, накапливаемая по мере чтения записей."""
+
+    def __init__(self, day: str):
+        self.day = day
+        self.total = 0
+        self.search_types = Counter()
+        self.zero_results = 0
+        self.results_sum = 0
+        self.keywords = Counter()
+        self.genres = Counter()
+        self.genre_names = {}
+        self.hours = Counter()
+
+    def add(self, entry: dict) -> None:
+        self.total += 1
+        self.search_types[entry.get("search_type") or "unknown"] += 1
+        results_count = entry.get("results_count") or 0
+        self.results_sum += results_count
+        if not results_count:
+            self.zero_results += 1
+        params = entry.get("params") or {}
+        if entry.get("search_type") == "keyword" and params.get("keyword") is not None:
+            self.keywords[str(params["keyword"]).lower()] += 1
+        elif entry.get("search_type") == "genre_year":
+            genre_ids, genre_names = params.get("genre_id"), params.get("genre_name")
+            if not isinstance(genre_ids, list):  # поиск по нескольким жанрам учитывается в каждом из них
+                genre_ids, genre_names = [genre_ids], [genre_names]
+            elif not isinstance(genre_names, list) or len(genre_names) != len(genre_ids):
+                genre_names = [None] * len(genre_ids)
+            for genre_id, genre_name in zip(genre_ids, genre_names):
+                if isinstance(genre_id, int):
+                    self.genres[genre_id] += 1
+                    if genre_name is not None or genre_id not in self.genre_names:
+                        self.genre_names[genre_id] = genre_name
+        timestamp = entry.get("timestamp")
+        if isinstance(timestamp, datetime):
+            self.hours[timestamp.hour] += 1
+
+    def to_document(self) -> dict:
+        return {
+            "_id": self.day,
+            "day": self.day,
+            "total": self.total,
+            "search_types": dict(self.search_types),
+            "zero_results": self.zero_results,
+            "avg_results": round(self.results_sum / self.total, 2) if self.total else 0,
+            "distinct_keywords": len(self.keywords),
+            "top_keywords": [{"keyword": keyword, "count": count}
+                             for keyword, count in self.keywords.most_common(TOP_VALUES)],
+            "top_genres": [{"genre_id": genre_id, "genre_name": self.genre_names.get(genre_id), "count": count}
+                           for genre_id, count in self.genres.most_common(TOP_VALUES)],
+            "hours": {str(hour): count for hour, count in sorted(self.hours.items())},
+        }
+
+
+def _delete_ids(collection, ids: list, batch_size: int) -> int:
+    """
+    Удаляет записи журнала с данными _id пакетами по batch_size, так что одна операция
+    не блокирует коллекцию надолго и не раздувает oplog.
+    """
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        deleted += collection.delete_many({"_id": {"$in": ids[start:start + batch_size]}}).deleted_count
+    return deleted
+
+
+def archive_day(db, collection, day: datetime, archive_format: str, batch_size: int,
+                archive_dir: str = None, dry_run: bool = False) -> dict:
+    """
+    Архивирует записи журнала за одни сутки: файл, дневная сводка, удаление из журнала.
+
+    Удаляются только записи, прочитанные при выгрузке (их _id держатся в памяти до удаления):
+    запись, попавшая в сутки во время выгрузки, останется в журнале до следующего запуска.
+
+    :param db: База данных MongoDB.
+    :param collection: Коллекция журнала запросов.
+    :param day: Начало суток (UTC).
+    :param archive_format: 'jsonl' или 'columns' (для уже выгруженных суток — формат их архива).
+    :param batch_size: Размер пакета чтения, группы строк и удаления.
+    :param archive_dir: Каталог архива.
+    :param dry_run: Только посчитать записи, ничего не записывая и не удаляя.
+    :return: Словарь с полями day, entries (выгружено записей), deleted, file.
+    """
+    day_str = day.strftime("%Y-%m-%d")
+    rollups = db[daily_collection_name()]
+    existing = rollups.find_one({"_id": day_str}, {"status": 1, "file": 1, "files": 1, "archive_format": 1})
+    rollup = DailyRollup(day_str)
+    files = []
+    archived_ids = set()
+    if existing is not None and existing.get("status") == "archived":
+        # сутки уже выгружены: записи из файлов архива только дочищаются, остальные выгружаются
+        # в следующую часть, а сводка пересчитывается по всем частям
+        files = existing.get("files") or [existing["file"]]
+        archive_format = existing.get("archive_format", archive_format)
+        for path in files:
+            for entry in read_archive(path):
+                rollup.add(entry)
+                archived_ids.add(entry["_id"])
+
+    path = archive_path(day_str, archive_format, archive_dir, part=len(files) + 1)
+    writer = None
+    ids = []
+    entries = 0
+    try:
+        for entry in collection.find(_day_range(day)).sort("_id", 1).batch_size(batch_size):
+            ids.append(entry["_id"])
+            if str(entry["_id"]) in archived_ids:
+                continue
+            entries += 1
+            rollup.add(entry)
+            if not dry_run:
+                if writer is None:
+                    writer = ArchiveWriter(path, archive_format, batch_size)
+                writer.write(entry)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if dry_run:
+        return {"day": day_str, "entries": entries, "deleted": 0, "file": None}
+
+    if writer is not None:
+        writer.close()
+        files.append(path)
+        document = rollup.to_document()
+        document.update(status="archived", file=files[0], files=files, archive_format=archive_format,
+                        archived_at=datetime.now(timezone.utc))
+        rollups.replace_one({"_id": day_str}, document, upsert=True)
+    deleted = _delete_ids(collection, ids, batch_size)
+    return {"day": day_str, "entries": entries, "deleted": deleted, "file": files[-1] if files else None}
+
+
+@timed("retention.run")
+def run_retention(days: int = None, archive_format: str = None, dry_run: bool = False, archive_dir: str = None) -> list:
+    """
+    Архивирует все полные сутки журнала старше days дней.
+
+    Записи со временем в виде строки (созданные до перехода на даты BSON) не затрагиваются.
+
+    :param days: Сколько последних суток оставить в журнале (по умолчанию archive_after_days).
+    :param archive_format: Формат архива (по умолчанию archive_format из настроек).
+    :param dry_run: Только показать, что будет заархивировано.
+    :param archive_dir: Каталог архива (по умолчанию archive_dir из настроек).
+    :return: Список результатов archive_day() по обработанным суткам.
+    """
+    from mongodb_connector import get_mongo_client
+
+    config = settings.MONGO_LOG_RETENTION_SETTINGS
+    days = config['archive_after_days'] if days is None else days
+    archive_format = archive_format or config['archive_format']
+    db = get_mongo_client()[settings.MONGODB_SETTINGS['db']]
+    collection = db[settings.MONGODB_SETTINGS['collection']]
+    db[daily_collection_name()].create_index("day")
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff = today - timedelta(days=days)
+    results = []
+    oldest = collection.find_one({"timestamp": {"$lt": cutoff}}, {"timestamp": 1}, sort=[("timestamp", 1)])
+    if oldest is None:
+        return results
+    day = oldest["timestamp"]
+    if day.tzinfo is None:
+        day = day.replace(tzinfo=timezone.utc)
+    day = day.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < cutoff:
+        if collection.find_one(_day_range(day), {"_id": 1}) is not None:
+            results.append(archive_day(db, collection, day, archive_format, config['batch_size'],
+                                       archive_dir, dry_run))
+        day += timedelta(days=1)
+    return results
+
+
+def daily_summaries(db, days: int = 30) -> list:
+    """
+    Возвращает дневные сводки за последние days суток, от новых к старым.
+
+    :param db: База данных MongoDB.
+    :param days: Количество суток.
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    return list(db[daily_collection_name()].find({"day": {"$gte": since}}).sort("day", -1))
+
+
+def retention_status(db) -> dict:
+    """
+    Состояние журнала и архива: число записей, самая старая запись, число дневных сводок и файлов.
+    """
+    collection = db[settings.MONGODB_SETTINGS['collection']]
+    oldest = collection.find_one({"timestamp": {"$type": "date"}}, {"timestamp": 1}, sort=[("timestamp", 1)])
+    archive_root = os.path.join(settings.MONGO_LOG_RETENTION_SETTINGS['archive_dir'],
+                                settings.MONGODB_SETTINGS['collection'])
+    files, size = 0, 0
+    for directory, _, names in os.walk(archive_root):
+        for name in names:
+            if name.endswith(".gz"):
+                files += 1
+                size += os.path.getsize(os.path.join(directory, name))
+    return {
+        "entries": collection.estimated_document_count(),
+        "oldest": oldest["timestamp"].isoformat() if oldest else None,
+        "daily_summaries": db[daily_collection_name()].count_documents({}),
+        "archive_files": files,
+        "archive_mb": round(size / 1024 / 1024, 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="main.py retention", description="Архивирование журнала поисковых запросов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="заархивировать и удалить из журнала старые записи")
+    run_parser.add_argument("--days", type=int, help="сколько последних суток оставить в журнале")
+    run_parser.add_argument("--format", choices=ARCHIVE_FORMATS, help="формат файлов архива")
+    run_parser.add_argument("--dry-run", action="store_true", help="только показать, что будет заархивировано")
+    subparsers.add_parser("status", help="показать размер журнала и архива")
+    summary_parser = subparsers.add_parser("summary", help="показать дневные сводки")
+    summary_parser.add_argument("--days", type=int, default=14)
+    read_parser = subparsers.add_parser("read", help="вывести записи файла архива в JSONL")
+    read_parser.add_argument("path")
+    read_parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "read":
+        for number, entry in enumerate(read_archive(args.path)):
+            if args.limit is not None and number >= args.limit:
+                break
+            print(json.dumps(_to_json(entry), ensure_ascii=False, default=str))
+        return 0
+
+    from mongodb_connector import get_mongo_client
+    try:
+        if args.command == "run":
+            results = run_retention(args.days, args.format, args.dry_run)
+            for item in results:
+                action = "будет заархивировано" if args.dry_run else f"заархивировано в {item['file']}, удалено"
+                print(f"{item['day']}: {item['entries']} записей {action}"
+                      + ("" if args.dry_run else f" {item['deleted']}"))
+            if not results:
+                print("Записей старше срока хранения нет.")
+            return 0
+
+        db = get_mongo_client()[settings.MONGODB_SETTINGS['db']]
+        if args.command == "status":
+            for key, value in retention_status(db).items():
+                print(f"{key}: {value}")
+        else:
+            for item in daily_summaries(db, args.days):
+                keywords = ", ".join(f"{k['keyword']} ({k['count']})" for k in item["top_keywords"][:5])
+                print(f"{item['day']}: {item['total']} запросов, без результатов {item['zero_results']}; {keywords}")
+        return 0
+    except (pymongo.errors.PyMongoError, OSError) as e:
+        msg = f"Ошибка архивирования журнала запросов: {e}"
+        print(msg)
+        log_error(msg, exc=e)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
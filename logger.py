@@ -1,27 +1,217 @@
-# Модуль логирования ошибок приложения в csv файл
+# Модуль логирования ошибок приложения.
+#
+# Запись в файлы выполняет фоновый поток (logging.handlers.QueueListener), поэтому
+# log_error не открывает файлов в вызывающем потоке. Поддерживаются два приёмника:
+#   csv   — прежний формат error_log.csv (timestamp, error_message);
+#   jsonl — структурированные записи (модуль, функция, тип исключения, задержка и т.д.).
+# Файлы ротируются по размеру или по времени, а одинаковые ошибки, повторяющиеся
+# чаще, чем раз в dedup_window секунд, подавляются и учитываются счётчиком повторов.
 
+import atexit
 import csv
+import io
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
+import settings
 
-def log_error(error_msg: str) -> None:
+_LOGGER_NAME = "films.errors"
+
+_setup_lock = threading.Lock()
+_listener = None
+_logger = None
+
+_dedup_lock = threading.Lock()
+_last_seen = {}   # ключ ошибки -> момент последней записи в файл
+_suppressed = {}  # ключ ошибки -> сколько повторов подавлено с тех пор
+
+
+class _CsvHeaderMixin:
     """
-    Сохраняет сообщение об ошибке в CSV-файл 'error_log.csv'.
+    Пишет заголовок CSV в начало каждого нового (в том числе после ротации) файла.
 
-    Каждая запись содержит временную метку и текст ошибки.
-    Если файл не существует, создается с заголовком.
-    
-    :param error_msg: Сообщение об ошибке для записи в журнал.
+    Заголовок пишется при открытии файла: обработчик открывает файл заново и после ротации,
+    и при отложенном открытии (delay=True), поэтому каждый файл начинается с заголовка.
+    """
+
+    header = "timestamp,error_message"
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write(self.header + self.terminator)
+        return stream
+
+
+class CsvRotatingFileHandler(_CsvHeaderMixin, logging.handlers.RotatingFileHandler):
+    """Приёмник CSV с ротацией по размеру файла."""
+
+
+class CsvTimedRotatingFileHandler(_CsvHeaderMixin, logging.handlers.TimedRotatingFileHandler):
+    """Приёмник CSV с ротацией по времени."""
+
+
+class CsvFormatter(logging.Formatter):
+    """Форматирует запись в строку CSV прежнего формата: timestamp, error_message."""
+
+    def format(self, record):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="").writerow([
+            datetime.fromtimestamp(record.created).isoformat(timespec='seconds'),
+            _message_with_repeats(record),
+        ])
+        return buffer.getvalue()
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну строку JSON со структурированными полями."""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "module": getattr(record, "caller_module", record.module),
+            "function": getattr(record, "caller_function", record.funcName),
+            "exception_type": getattr(record, "exception_type", None),
+            "latency_ms": getattr(record, "latency_ms", None),
+            "repeated": getattr(record, "repeated", 0),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler с ограниченной очередью: при переполнении запись отбрасывается, а не блокирует."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def _message_with_repeats(record) -> str:
+    message = record.getMessage()
+    repeated = getattr(record, "repeated", 0)
+    return f"{message} (повторялось ещё {repeated} раз)" if repeated else message
+
+
+def _make_file_handler(path: str, formatter: logging.Formatter, csv_sink: bool) -> logging.Handler:
+    when = settings.ERROR_LOG_SETTINGS['rotate_when']
+    if when:
+        handler_class = CsvTimedRotatingFileHandler if csv_sink else logging.handlers.TimedRotatingFileHandler
+        handler = handler_class(path, when=when, backupCount=settings.ERROR_LOG_SETTINGS['backup_count'],
+                                encoding='utf-8', delay=True)
+    else:
+        handler_class = CsvRotatingFileHandler if csv_sink else logging.handlers.RotatingFileHandler
+        handler = handler_class(path, maxBytes=settings.ERROR_LOG_SETTINGS['max_bytes'],
+                                backupCount=settings.ERROR_LOG_SETTINGS['backup_count'], encoding='utf-8', delay=True)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def _setup() -> logging.Logger:
+    """Создаёт приёмники и фоновый поток записи при первом обращении."""
+    global _listener, _logger
+    with _setup_lock:
+        if _logger is not None:
+            return _logger
+
+        directory = settings.ERROR_LOG_SETTINGS['directory'] or os.getcwd()
+        sinks = []
+        if 'csv' in settings.ERROR_LOG_SETTINGS['sinks']:
+            sinks.append(_make_file_handler(os.path.join(directory, "error_log.csv"), CsvFormatter(), True))
+        if 'jsonl' in settings.ERROR_LOG_SETTINGS['sinks']:
+            sinks.append(_make_file_handler(os.path.join(directory, "error_log.jsonl"), JsonFormatter(), False))
+
+        log_queue = queue.Queue(maxsize=settings.ERROR_LOG_SETTINGS['max_queue'])
+        _listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown)
+
+        logger = logging.getLogger(_LOGGER_NAME)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(_DroppingQueueHandler(log_queue))
+        _logger = logger
+        return logger
+
+
+def _should_write(key) -> int:
     """
-    log_file = os.path.join(os.getcwd(), "error_log.csv")
-    file_exists = os.path.isfile(log_file)
+    Решает, писать ли ошибку с этим ключом сейчас.
 
+    :return: -1, если запись подавляется как повтор; иначе число подавленных ранее повторов.
+    """
+    window = settings.ERROR_LOG_SETTINGS['dedup_window']
+    if window <= 0:
+        return 0
+    now = time.monotonic()
+    with _dedup_lock:
+        last = _last_seen.get(key)
+        if last is not None and now - last < window:
+            _suppressed[key] = _suppressed.get(key, 0) + 1
+            return -1
+        _last_seen[key] = now
+        if len(_last_seen) > 1000:  # не даём словарю расти бесконечно при множестве разных ошибок
+            for old_key in [k for k, t in _last_seen.items() if now - t >= window]:
+                _last_seen.pop(old_key, None)
+        return _suppressed.pop(key, 0)
+
+
+def log_error(error_msg: str, exc: BaseException = None, latency: float = None, **fields) -> None:
+    """
+    Сохраняет сообщение об ошибке в журнал ошибок ('error_log.csv' и/или 'error_log.jsonl').
+
+    Запись ставится в очередь и выполняется фоновым потоком. Повторы одной и той же
+    ошибки из одного места в пределах окна dedup_window подавляются, а их количество
+    добавляется к следующей записанной копии.
+
+    :param error_msg: Сообщение об ошибке для записи в журнал.
+    :param exc: Исключение, вызвавшее ошибку (для поля exception_type).
+    :param latency: Длительность неудачной операции в секундах (для поля latency_ms).
+    :param fields: Дополнительные структурированные поля для приёмника jsonl.
+    """
     try:
-        with open(log_file, mode='a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            if not file_exists:
-                writer.writerow(["timestamp", "error_message"])
-            writer.writerow([datetime.now().isoformat(timespec='seconds'), error_msg])
+        caller = sys._getframe(1)
+        module = caller.f_globals.get("__name__", "?")
+        function = caller.f_code.co_name
+        repeated = _should_write((module, function, error_msg))
+        if repeated < 0:
+            return
+
+        _setup().error(error_msg, extra={
+            "caller_module": module,
+            "caller_function": function,
+            "exception_type": type(exc).__name__ if exc is not None else None,
+            "latency_ms": round(latency * 1000, 3) if latency is not None else None,
+            "repeated": repeated,
+            "fields": fields,
+        })
     except Exception as file_error:
         print(f"[Ошибка логирования] {file_error}")
+
+
+def shutdown() -> None:
+    """Дописывает все ошибки из очереди в файлы и останавливает фоновый поток."""
+    global _listener, _logger
+    with _setup_lock:
+        listener, _listener = _listener, None
+        logger, _logger = _logger, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    if logger is not None:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
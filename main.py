@@ -1,6 +1,62 @@
 # Запускающий файл приложения
+#
+#   python main.py            — интерактивное меню
+#   python main.py batch ...  — пакетный поиск по файлу запросов (см. batch.py, python main.py batch --help)
+#   python main.py serve ...  — HTTP-сервис поиска (см. http_service.py, python main.py serve --help)
+#   python main.py retention ... — архивирование старых записей журнала (см. log_retention.py)
+#   python main.py replay ...  — воспроизведение журнала запросов для нагрузочного теста (см. replay.py)
+#
+# Драйверы баз данных и настройки загружаются лениво, поэтому меню появляется сразу,
+# а подключение к MySQL и MongoDB прогревается в фоновом потоке, пока пользователь выбирает пункт.
+
+import sys
+import threading
+
+
+def warm_up():
+     """
+     Прогревает приложение в фоне: загружает настройки и драйверы, открывает соединение
+     в пуле MySQL, подключается к MongoDB, создаёт индексы журнала запросов и строит индекс подсказок.
+     Используются только вызовы, которые ничего не выводят (strict, quiet): ошибки подключения
+     не появляются посреди меню, а записываются в журнал ошибок — пользователь увидит их при первом запросе.
+     """
+     import settings
+     from logger import log_error
+     from mysql_pool import get_pool
+     from mysql_connector import SearchError, get_all_genres, preload_genre_year_ranges
+     from mongodb_connector import ensure_indexes
+     from suggest import get_suggestion_index
+
+     try:
+          pool = get_pool()
+          pool.release(pool.acquire())
+          get_all_genres(strict=True)  # список жанров понадобится первым при поиске по жанру
+          if settings.PRELOAD_GENRE_YEAR_RANGES:
+               preload_genre_year_ranges(strict=True)  # один запрос вместо отдельного запроса на каждый выбор жанра
+     except SearchError:
+          pass  # ошибка уже записана в журнал
+     except Exception as e:
+          log_error(f"Прогрев соединения с MySQL не выполнен: {e}", exc=e)
+     else:
+          get_suggestion_index()  # подсказки понадобятся, если поиск по ключевому слову ничего не найдёт
+     ensure_indexes(quiet=True)  # недоступная MongoDB не задерживает появление меню
 
-from ui import run_menu
 
 if __name__ == "__main__":
+     if len(sys.argv) > 1 and sys.argv[1] == "batch":
+          import batch
+          sys.exit(batch.main(sys.argv[2:]))
+     if len(sys.argv) > 1 and sys.argv[1] == "serve":
+          import http_service
+          threading.Thread(target=warm_up, daemon=True, name="warm-up").start()
+          sys.exit(http_service.main(sys.argv[2:]))
+     if len(sys.argv) > 1 and sys.argv[1] == "retention":
+          import log_retention
+          sys.exit(log_retention.main(sys.argv[2:]))
+     if len(sys.argv) > 1 and sys.argv[1] == "replay":
+          import replay
+          sys.exit(replay.main(sys.argv[2:]))
+
+     from ui import run_menu  # модули приложения импортируются до запуска прогрева, чтобы не импортировать их из двух потоков
+     threading.Thread(target=warm_up, daemon=True, name="warm-up").start()
      run_menu()
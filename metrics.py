@@ -0,0 +1,168 @@
+# Модуль метрик производительности: время выполнения этапов (подключение, запрос, запись журнала,
+# вывод), число возвращённых строк и текущие показатели пулов и кэшей.
+# Метрики доступны в пункте меню «Производительность» и экспортируются в формате Prometheus или JSON.
+
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Распределение длительностей одного этапа.
+
+    Хранит общее количество и сумму наблюдений, а для расчёта перцентилей —
+    последние max_samples значений (скользящее окно), так что память ограничена.
+    """
+
+    def __init__(self, max_samples: int = 2048):
+        self._samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentiles(self, *quantiles: float) -> list:
+        """
+        Возвращает перцентили по последним наблюдениям (метод ближайшего ранга).
+
+        :param quantiles: Доли от 0 до 1, например 0.5, 0.95, 0.99.
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return [0.0 for _ in quantiles]
+        last = len(samples) - 1
+        return [samples[min(last, int(round(q * last)))] for q in quantiles]
+
+
+class MetricsRegistry:
+    """
+    Потокобезопасный реестр метрик: гистограммы длительностей этапов,
+    счётчики и «показатели» — функции, возвращающие текущее состояние (например, статистику пула).
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Добавляет наблюдение длительности этапа stage (в секундах)."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """Увеличивает счётчик name на value."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, func) -> None:
+        """
+        Регистрирует показатель: функцию без аргументов, возвращающую число
+        или словарь чисел (например, get_pool().stats()).
+        """
+        with self._lock:
+            self._gauges[name] = func
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Контекстный менеджер, измеряющий длительность блока как этап stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def timed(self, stage: str):
+        """Декоратор, измеряющий длительность каждого вызова функции как этап stage."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает текущее состояние всех метрик.
+
+        :return: Словарь {"stages": {этап: {count, sum, p50, p95, p99}}, "counters": {...}, "gauges": {...}};
+                 длительности — в секундах.
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._histograms.items()):
+                p50, p95, p99 = histogram.percentiles(*self.QUANTILES)
+                stages[stage] = {"count": histogram.count, "sum": histogram.total,
+                                 "p50": p50, "p95": p95, "p99": p99}
+            counters = dict(sorted(self._counters.items()))
+            gauge_funcs = dict(self._gauges)
+
+        gauges = {}
+        for name, func in sorted(gauge_funcs.items()):
+            try:
+                value = func()
+            except Exception:
+                continue  # недоступный показатель (например, база не настроена) просто пропускаем
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, (int, float)) and not isinstance(item, bool):
+                        gauges[f"{name}_{key}"] = item
+            elif isinstance(value, (int, float)):
+                gauges[name] = value
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def to_json(self) -> str:
+        """Экспортирует метрики в JSON."""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = "films") -> str:
+        """Экспортирует метрики в текстовом формате Prometheus."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Длительность этапов обработки запроса",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, stats in snapshot["stages"].items():
+            for quantile, key in zip(self.QUANTILES, ("p50", "p95", "p99")):
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for name, value in snapshot["counters"].items():
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in snapshot["gauges"].items():
+            metric = f"{prefix}_{_metric_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+# Общий реестр приложения и короткие имена для инструментирования модулей
+REGISTRY = MetricsRegistry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+register_gauge = REGISTRY.register_gauge
@@ -1,109 +1,618 @@
 # Модуль отвечающий за подключение к MongoDB и содержащий функции логирования запросов пользователя и статистики
 
-from pymongo import MongoClient, errors
-from settings import MONGODB_SETTINGS
-from datetime import datetime
+import atexit
+import sys
+import threading
+import settings
+from lazy_import import lazy_import
+from datetime import datetime, timedelta, timezone
 from logger import log_error # Функция логирования ошибок в файл
+from search_log_writer import SearchLogWriter
+from metrics import timed, timer, register_gauge
+from search_stats import record_search_stats, top_queries, keyword_counts, stats_built, mark_stats_built, \
+    stats_collection_name, clear_search_stats
+from resilience import guarded_call, get_breaker, CircuitOpenError
+
+pymongo = lazy_import("pymongo")  # драйвер загружается при первом обращении к MongoDB, а не при запуске
+
+# Значения pymongo.ASCENDING / pymongo.DESCENDING: описанию индексов не нужен сам драйвер
+ASCENDING, DESCENDING = 1, -1
+
+_client = None
+_log_writer = None
+_lock = threading.Lock()
+
+
+def get_mongo_client() -> "pymongo.MongoClient":
+    """
+    Возвращает общий для процесса клиент MongoDB, создавая его при первом обращении.
+
+    MongoClient сам держит пул соединений и потокобезопасен,
+    поэтому один экземпляр используется всеми функциями модуля.
+    Таймауты выбора сервера и сокета берутся из MONGODB_SETTINGS: без них
+    недоступная MongoDB задерживала бы каждое обращение на 30 секунд.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                # tz_aware: даты из MongoDB возвращаются с часовым поясом UTC
+                with timer("mongo.connect"):
+                    config = settings.MONGODB_SETTINGS
+                    _client = pymongo.MongoClient(
+                        config['uri'], tz_aware=True,
+                        serverSelectionTimeoutMS=config['server_selection_timeout_ms'],
+                        connectTimeoutMS=config['connect_timeout_ms'],
+                        socketTimeoutMS=config['socket_timeout_ms'],
+                    )
+    return _client
+
+
+def close_mongo_client() -> None:
+    """
+    Отправляет оставшиеся записи журнала и закрывает общий клиент MongoDB.
+
+    Вызывается автоматически при завершении процесса.
+    """
+    global _client, _log_writer
+    with _lock:
+        writer, _log_writer = _log_writer, None
+    if writer is not None:
+        writer.stop()
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close_mongo_client)
+
+
+def _is_mongo_failure(e: Exception) -> bool:
+    """Ошибка означает недоступность MongoDB (сеть, таймаут, отказ в доступе), а не ошибку запроса."""
+    if isinstance(e, pymongo.errors.ConnectionFailure):
+        return True
+    return isinstance(e, pymongo.errors.OperationFailure) and e.code in (13, 18)  # Unauthorized, AuthenticationFailed
+
+
+def _is_mongo_retryable(e: Exception) -> bool:
+    """
+    Временная ошибка (переключение primary, обрыв соединения), после которой чтение можно повторить.
+    Таймаут выбора сервера не повторяется: драйвер уже ждал сервер serverSelectionTimeoutMS.
+    """
+    return (isinstance(e, pymongo.errors.AutoReconnect)
+            and not isinstance(e, pymongo.errors.ServerSelectionTimeoutError))
+
+
+def mongo_call(func, retry: bool = True):
+    """
+    Выполняет обращение к MongoDB через общий автоматический выключатель 'mongo'.
+
+    :param func: Функция без аргументов, выполняющая операцию с MongoDB.
+    :param retry: Повторять ли операцию при временной ошибке. Для записей журнала не используется:
+                  повтор insert_many мог бы записать документы дважды, а повтор записи
+                  драйвер выполняет сам (retryWrites).
+    :return: Результат func().
+    :raises CircuitOpenError: если выключатель открыт после серии отказов MongoDB.
+    """
+    return guarded_call(get_breaker("mongo"), func, is_failure=_is_mongo_failure,
+                        retry_if=_is_mongo_retryable if retry else None)
 
 
 def connect_to_mongo():
     """
-    Устанавливает соединение с MongoDB и возвращает клиент и коллекцию.
+    Возвращает общий клиент MongoDB и коллекцию журнала запросов.
+
+    Клиент общий для всего процесса, закрывать его после использования не нужно.
+    Если выключатель 'mongo' открыт (MongoDB недавно была недоступна), сразу возвращается None.
 
     :return: Кортеж (client, collection) при успешном подключении,
              иначе None в случае ошибки.
     """
     try:
-        client = MongoClient(MONGODB_SETTINGS['uri'])
-        db = client[MONGODB_SETTINGS['db']]
-        collection = db[MONGODB_SETTINGS['collection']]
+        get_breaker("mongo").check()
+        client = get_mongo_client()
+        db = client[settings.MONGODB_SETTINGS['db']]
+        collection = db[settings.MONGODB_SETTINGS['collection']]
         return client, collection
-    except errors.ConnectionFailure as e:
+    except pymongo.errors.ConnectionFailure as e:
         msg = f"Ошибка подключения к MongoDB: {e}"
-        print(msg)
-        log_error(msg)
-    except errors.OperationFailure as e:
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+    except pymongo.errors.OperationFailure as e:
         msg = f"Ошибка авторизации или запроса в MongoDB: {e}"
-        print(msg)
-        log_error(msg)
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+    except CircuitOpenError as e:
+        print(f"MongoDB недоступна: {e}", file=sys.stderr)  # отказ уже записан в журнал ошибок при открытии выключателя
+
+
+register_gauge("mongo_log_writer", lambda: _log_writer.stats() if _log_writer is not None else {})
+
+
+def _get_database():
+    """Возвращает базу данных MongoDB приложения."""
+    return get_mongo_client()[settings.MONGODB_SETTINGS['db']]
+
+
+def _get_log_collection():
+    """Возвращает коллекцию журнала запросов (используется фоновым писателем)."""
+    return _get_database()[settings.MONGODB_SETTINGS['collection']]
+
+
+def _update_search_stats(batch: list) -> None:
+    """Обновляет сводные счётчики статистики по только что записанному пакету журнала."""
+    record_search_stats(_get_database(), batch)
+
+
+def get_log_writer() -> SearchLogWriter:
+    """
+    Возвращает общий фоновый писатель журнала запросов, создавая его при первом обращении.
+
+    Размер пакета, интервал сброса и размер очереди берутся из settings.MONGO_LOG_WRITER_SETTINGS.
+    """
+    global _log_writer
+    if _log_writer is None:
+        with _lock:
+            if _log_writer is None:
+                _log_writer = SearchLogWriter(_get_log_collection, on_written=_update_search_stats,
+                                              call=lambda func: mongo_call(func, retry=False),
+                                              **settings.MONGO_LOG_WRITER_SETTINGS)
+    return _log_writer
+
         
+@timed("mongo.log_search_to_mongo")
 def log_search_to_mongo(search_type: str, params: dict, results_count: int):
     """
-    Записывает информацию о поисковом запросе в коллекцию MongoDB.
+    Ставит информацию о поисковом запросе в очередь на запись в коллекцию MongoDB.
+
+    Запись выполняется фоновым писателем пакетами, поэтому вызов не ждёт MongoDB.
+    Если очередь переполнена, запись отбрасывается, а поиск продолжает работать.
 
     :param search_type: Тип поиска ('keyword' или 'genre_year').
     :param params: Параметры поиска (ключевое слово, жанр, годы и т.п.).
     :param results_count: Количество найденных результатов.
     """
-    client, collection = connect_to_mongo()
     log_entry = {
-        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "timestamp": datetime.now(timezone.utc),  # дата BSON: точная сортировка, диапазоны и TTL-индекс
         "search_type": search_type,
         "params": params,
         "results_count": results_count
     }
-    result = collection.insert_one(log_entry)
-    print(f"Log inserted with ID: {result.inserted_id}")
-    client.close()
+    get_log_writer().submit(log_entry)
+
+
+@timed("mongo.log_searches_to_mongo")
+def log_searches_to_mongo(searches: list) -> int:
+    """
+    Записывает в коллекцию MongoDB сразу много поисковых запросов одной операцией insert_many
+    (используется пакетным режимом, см. batch.py).
+
+    В отличие от log_search_to_mongo, запись выполняется синхронно и не зависит
+    от размера очереди фонового писателя, поэтому ни одна запись не отбрасывается.
+
+    :param searches: Список кортежей (search_type, params, results_count).
+    :return: Количество записанных документов (0 в случае ошибки).
+    """
+    if not searches:
+        return 0
+    now = datetime.now(timezone.utc)
+    entries = [{"timestamp": now, "search_type": search_type, "params": params, "results_count": results_count}
+               for search_type, params, results_count in searches]
+    try:
+        with timer("mongo.log_write"):
+            mongo_call(lambda: _get_log_collection().insert_many(entries, ordered=False), retry=False)
+    except CircuitOpenError as e:
+        print(f"Журнал запросов не записан ({len(entries)} записей): {e}", file=sys.stderr)
+        return 0
+    except pymongo.errors.PyMongoError as e:
+        msg = f"Ошибка записи журнала запросов в MongoDB ({len(entries)} записей): {e}"
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+        return 0
+    try:
+        with timer("mongo.stats_update"):
+            _update_search_stats(entries)
+    except Exception as e:  # статистика вторична: её сбой не отменяет записанный журнал
+        log_error(f"Ошибка обновления статистики запросов: {e}", exc=e)
+    return len(entries)
     
+def format_timestamp(timestamp) -> str:
+    """
+    Форматирует временную метку записи журнала для вывода в местном времени.
+
+    :param timestamp: datetime (UTC) или строка ISO из записей, созданных до перехода на даты BSON.
+    """
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.astimezone().strftime('%Y-%m-%d %H:%M:%S')
+    return str(timestamp)
+
+@timed("mongo.clear_log_collection")
 def clear_log_collection():
     """
     Очищает коллекцию MongoDB final_project_100125_stakun_elena, удаляя все документы.
 
-    Используется для удаления всей истории поисковых запросов.
+    Используется для удаления всей истории поисковых запросов: вместе с журналом очищаются
+    и сводные счётчики статистики, иначе топ запросов показывал бы удалённую историю.
     """
-    client, collection = connect_to_mongo()
-    result = collection.delete_many({})
+    get_log_writer().flush()
+    connection = connect_to_mongo()
+    if connection is None:
+        return
+    client, collection = connection
+    result = mongo_call(lambda: collection.delete_many({}), retry=False)
+    mongo_call(lambda: clear_search_stats(collection.database), retry=False)
     print(f"{result.deleted_count} documents deleted from the collection.")
-    client.close()
 
-def get_most_frequent_queries() -> None:
+@timed("mongo.most_frequent_queries")
+def most_frequent_queries(limit: int = 5):
     """
-    Выводит 5 наиболее частых поисковых запросов по ключевому слову из MongoDB.
+    Возвращает наиболее частые поисковые запросы по ключевому слову.
 
-    Использует агрегирующий pipeline для подсчета частоты запросов.
-    В случае ошибки выводит сообщение и записывает лог.
+    Берёт готовые счётчики из сводной коллекции статистики (см. search_stats.py),
+    поэтому время ответа не зависит от размера журнала. Пока счётчики не пересчитаны
+    по всему журналу (python search_stats.py rebuild), используется агрегирующий pipeline
+    по журналу: иначе записи, сделанные до появления статистики, выпали бы из топа.
+    Пустой журнал отмечается как пересчитанный сразу — все его будущие записи попадут в счётчики.
+
+    :param limit: Количество запросов в результате.
+    :return: Список словарей с полями keyword и count (по убыванию count)
+             или None, если MongoDB недоступна.
     """
-    client, collection = connect_to_mongo()  # type: (MongoClient, Collection)
+    get_log_writer().flush()
+    connection = connect_to_mongo()
+    if connection is None:
+        return None
+    client, collection = connection  # type: (MongoClient, Collection)
 
+    db = _get_database()
+    built = mongo_call(lambda: stats_built(db))
+    if not built and mongo_call(lambda: collection.find_one({}, {"_id": 1})) is None:
+        mongo_call(lambda: mark_stats_built(db))
+        built = True
+    if built:
+        return [{"keyword": item["value"], "count": item["count"]}
+                for item in mongo_call(lambda: top_queries(db, "keyword", limit=limit))]
     pipeline: list[dict] = [
         {"$match": {"search_type": "keyword"}},
         {"$group": {"_id": "$params.keyword", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}},
-        {"$limit": 5}
+        {"$limit": limit}
     ]
+    return [{"keyword": item["_id"], "count": item["count"]}
+            for item in mongo_call(lambda: list(collection.aggregate(pipeline)))]
+
+
+@timed("mongo.keyword_search_counts")
+def keyword_search_counts(since=None, limit: int = None):
+    """
+    Возвращает счётчики поисковых запросов по ключевым словам из сводной статистики (для подсказок, см. suggest.py).
 
-    results: list[dict] = list(collection.aggregate(pipeline))
-    client.close()
+    Вызывается в фоне, поэтому ошибки не выводятся, а только записываются в журнал ошибок.
+
+    :param since: Только слова, которые искали начиная с since (None — все).
+    :param limit: Количество самых частых слов (None — все).
+    :return: Словарь {ключевое слово: количество} или None, если MongoDB недоступна.
+    """
+    try:
+        db = _get_database()
+        items = mongo_call(lambda: keyword_counts(db, since, limit))
+    except CircuitOpenError:
+        return None  # отказ уже записан в журнал ошибок при открытии выключателя
+    except pymongo.errors.PyMongoError as e:
+        log_error(f"Ошибка чтения счётчиков запросов из MongoDB: {e}", exc=e)
+        return None
+    return {item["value"]: item["count"] for item in items if item.get("value")}
+
+
+@timed("mongo.get_most_frequent_queries")
+def get_most_frequent_queries() -> None:
+    """
+    Выводит 5 наиболее частых поисковых запросов по ключевому слову из MongoDB.
 
+    В случае ошибки выводит сообщение и записывает лог.
+    """
+    results = most_frequent_queries(limit=5)
+    if results is None:
+        return
     if not results:
         print("Нет популярных запросов.")
     else:
         print("Топ-5 популярных запросов по ключевым словам:")
         for entry in results:
-            print(f"- {entry['_id']} (встречается {entry['count']} раз)")
+            print(f"- {entry['keyword']} (встречается {entry['count']} раз)")
 
 
-def get_last_queries(limit: int = 5) -> None:
+@timed("mongo.last_queries")
+def last_queries(limit: int = 5):
     """
-    Выводит последние N поисковых запросов по ключевому слову из MongoDB.
+    Возвращает последние поисковые запросы по ключевому слову, от новых к старым.
 
-    :param limit: Количество последних записей для отображения (по умолчанию 5)
+    :param limit: Количество записей.
+    :return: Список документов журнала или None, если MongoDB недоступна.
     """
- 
-    client, collection = connect_to_mongo()  # type: (MongoClient, Collection)
+    get_log_writer().flush()
+    connection = connect_to_mongo()
+    if connection is None:
+        return None
+    client, collection = connection  # type: (MongoClient, Collection)
 
-    results: list[dict] = list(collection.find({"search_type": "keyword"})
-                               .sort("timestamp", -1)
-                               .limit(limit))
+    return mongo_call(lambda: list(collection.find({"search_type": "keyword"})
+                                   .sort("timestamp", -1)
+                                   .limit(limit)))
 
-    client.close()
 
+@timed("mongo.get_last_queries")
+def get_last_queries(limit: int = 5) -> None:
+    """
+    Выводит последние N поисковых запросов по ключевому слову из MongoDB.
+
+    :param limit: Количество последних записей для отображения (по умолчанию 5)
+    """
+    results = last_queries(limit)
+    if results is None:
+        return
     if not results:
         print("История пуста.")
     else:
         print(f"Последние {limit} запросов:")
         for entry in results:
             keyword: Optional[str] = entry.get("params", {}).get("keyword", "")
-            ts: Optional[str] = entry.get("timestamp", "")
-            print(f"- {keyword} (время: {ts})")
\ No newline at end of file
+            ts: Optional[str] = format_timestamp(entry.get("timestamp", ""))
+            print(f"- {keyword} (время: {ts})")
+
+@timed("mongo.get_logs_page")
+def get_logs_page(after=None, page_size: int = 10):
+    """
+    Возвращает одну страницу журнала запросов, от новых к старым.
+
+    Используется пагинация по ключу (timestamp, _id): следующая страница
+    запрашивается условием «раньше последней показанной записи»,
+    поэтому из MongoDB читается только показываемая страница.
+
+    :param after: Курсор (timestamp, _id) последней записи предыдущей страницы или None.
+    :param page_size: Количество записей на странице.
+    :return: Кортеж (docs, next_cursor); next_cursor равен None на последней странице
+             (и пустой список, если MongoDB недоступна).
+    """
+    connection = connect_to_mongo()
+    if connection is None:
+        return [], None
+    client, collection = connection
+
+    query = {}
+    if after is not None:
+        timestamp, last_id = after
+        query = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": last_id}},
+        ]}
+
+    try:
+        docs: list[dict] = mongo_call(lambda: list(collection.find(query)
+                                                   .sort([("timestamp", -1), ("_id", -1)])
+                                                   .limit(page_size + 1)))
+    except (pymongo.errors.PyMongoError, CircuitOpenError) as e:
+        msg = f"Ошибка чтения журнала запросов из MongoDB: {e}"
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+        return [], None
+
+    if len(docs) <= page_size:
+        return docs, None
+    docs = docs[:page_size]
+    return docs, (docs[-1].get("timestamp"), docs[-1]["_id"])
+
+
+# Индексы коллекции журнала запросов: каждый поддерживает конкретный запрос статистики,
+# чтобы он не просматривал всю коллекцию.
+LOG_INDEXES = [
+    # get_last_queries: фильтр по search_type, сортировка по timestamp
+    ([("search_type", ASCENDING), ("timestamp", DESCENDING)], "search_type_timestamp"),
+    # get_logs_page / show_recent_query_logs: сортировка по (timestamp, _id)
+    ([("timestamp", DESCENDING), ("_id", DESCENDING)], "timestamp_id"),
+    # get_most_frequent_queries (агрегация по журналу): фильтр по search_type, группировка по params.keyword
+    ([("search_type", ASCENDING), ("params.keyword", ASCENDING)], "search_type_keyword"),
+]
+
+
+def ensure_indexes(quiet: bool = False) -> bool:
+    """
+    Создаёт индексы коллекции журнала запросов (если их ещё нет) и применяет
+    настройки ограничения роста журнала из settings.MONGO_LOG_RETENTION_SETTINGS:
+    - capped_size_mb — создать журнал как capped-коллекцию заданного размера
+      (только если коллекция ещё не существует);
+    - ttl_days — TTL-индекс, удаляющий записи старше заданного числа дней
+      (работает только для записей, у которых timestamp хранится как дата BSON).
+
+    Вызывается при запуске приложения. Ошибки не прерывают работу, а записываются в журнал.
+
+    :param quiet: Не выводить сообщение об ошибке (вызов из фонового потока прогрева).
+    :return: True, если индексы созданы или уже существовали.
+    """
+    try:
+        db = _get_database()
+        name = settings.MONGODB_SETTINGS['collection']
+        capped_size_mb = settings.MONGO_LOG_RETENTION_SETTINGS['capped_size_mb']
+        if capped_size_mb and name not in db.list_collection_names():
+            db.create_collection(name, capped=True, size=capped_size_mb * 1024 * 1024)
+
+        collection = db[name]
+        for keys, index_name in LOG_INDEXES:
+            collection.create_index(keys, name=index_name)
+
+        ttl_days = settings.MONGO_LOG_RETENTION_SETTINGS['ttl_days']
+        if ttl_days:
+            collection.create_index("timestamp", name="timestamp_ttl",
+                                    expireAfterSeconds=int(ttl_days * 24 * 3600))
+        return True
+    except pymongo.errors.PyMongoError as e:
+        msg = f"Ошибка создания индексов MongoDB: {e}"
+        if not quiet:
+            print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+        return False
+
+
+def _find_values(document, key: str) -> list:
+    """Рекурсивно собирает все значения ключа key во вложенном документе explain."""
+    found = []
+    if isinstance(document, dict):
+        for name, value in document.items():
+            if name == key:
+                found.append(value)
+            found.extend(_find_values(value, key))
+    elif isinstance(document, list):
+        for item in document:
+            found.extend(_find_values(item, key))
+    return found
+
+
+def _summarize_explain(name: str, explain: dict) -> dict:
+    """Извлекает из результата explain план и количество просмотренных документов и ключей."""
+    return {
+        "query": name,
+        "stages": sorted(set(_find_values(_find_values(explain, "winningPlan"), "stage"))),
+        "indexes": sorted(set(_find_values(_find_values(explain, "winningPlan"), "indexName"))),
+        "docs_examined": sum(_find_values(explain, "totalDocsExamined")),
+        "keys_examined": sum(_find_values(explain, "totalKeysExamined")),
+        "returned": (_find_values(explain, "nReturned") or [0])[0],
+        "time_ms": max(_find_values(explain, "executionTimeMillis") or [0]),
+    }
+
+
+@timed("mongo.explain_stats_queries")
+def explain_stats_queries() -> list:
+    """
+    Выполняет explain (executionStats) для запросов статистики и возвращает сводку планов.
+
+    :return: Список словарей с полями query, stages, indexes, docs_examined,
+             keys_examined, returned, time_ms.
+    """
+    db = _get_database()
+    name = settings.MONGODB_SETTINGS['collection']
+
+    def explain_find(query_filter, sort, limit, collection_name=name):
+        return db.command("explain", {"find": collection_name, "filter": query_filter,
+                                      "sort": sort, "limit": limit},
+                          verbosity="executionStats")
+
+    def explain_aggregate(pipeline):
+        return db.command("explain", {"aggregate": name, "pipeline": pipeline, "cursor": {}},
+                          verbosity="executionStats")
+
+    return [
+        _summarize_explain("последние 5 поисков по ключевому слову",
+                           explain_find({"search_type": "keyword"}, {"timestamp": -1}, 5)),
+        _summarize_explain("страница списка всех запросов",
+                           explain_find({}, {"timestamp": -1, "_id": -1}, 11)),
+        _summarize_explain("топ-5 по журналу (агрегация)", explain_aggregate([
+            {"$match": {"search_type": "keyword"}},
+            {"$group": {"_id": "$params.keyword", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": 5},
+        ])),
+        _summarize_explain("топ-5 по сводным счётчикам",
+                           explain_find({"kind": "keyword"}, {"count": -1}, 5, stats_collection_name())),
+    ]
+
+
+
+def migrate_timestamps_to_dates(utc_offset: str = None, batch_size: int = 1000) -> int:
+    """
+    Переводит timestamp старых записей журнала из строк ISO в даты BSON.
+
+    Сначала выполняется одна серверная операция update_many с конвейером $dateFromString
+    (MongoDB 4.2+). Если сервер её не поддерживает, записи читаются и обновляются
+    на стороне клиента пакетами bulk_write по batch_size штук.
+
+    :param utc_offset: Смещение часового пояса, в котором писались строки, например '+03:00'.
+                       По умолчанию — текущее смещение местного времени этой машины.
+    :param batch_size: Размер пакета при обновлении на стороне клиента.
+    :return: Количество преобразованных записей.
+    """
+    if utc_offset is None:
+        offset = datetime.now().astimezone().utcoffset() or timedelta(0)
+        minutes = int(offset.total_seconds() // 60)
+        utc_offset = f"{'+' if minutes >= 0 else '-'}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+    collection = _get_log_collection()
+    string_filter = {"timestamp": {"$type": "string"}}
+    try:
+        result = collection.update_many(string_filter, [{"$set": {"timestamp": {
+            "$dateFromString": {"dateString": "$timestamp", "timezone": utc_offset}
+        }}}])
+        return result.modified_count
+    except (pymongo.errors.OperationFailure, NotImplementedError, TypeError):
+        pass  # старый сервер без обновлений через конвейер — преобразуем на стороне клиента
+
+    hours, minutes = utc_offset[1:].split(':')
+    delta = timedelta(hours=int(hours), minutes=int(minutes))
+    tz = timezone(delta if utc_offset[0] == '+' else -delta)
+
+    converted = 0
+    batch = []
+    for doc in collection.find(string_filter, {"timestamp": 1}).batch_size(batch_size):
+        try:
+            value = datetime.fromisoformat(doc["timestamp"])
+        except ValueError:
+            continue  # нераспознанную строку оставляем как есть
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=tz)
+        batch.append(pymongo.UpdateOne({"_id": doc["_id"]}, {"$set": {"timestamp": value}}))
+        if len(batch) >= batch_size:
+            converted += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        converted += collection.bulk_write(batch, ordered=False).modified_count
+    return converted
+
+
+@timed("mongo.get_searches_per_period")
+def get_searches_per_period(unit: str = "hour", periods: int = 24) -> list:
+    """
+    Считает количество поисковых запросов по часам или дням за последние periods интервалов.
+
+    Группировка выполняется на сервере по полю timestamp (дата BSON) в местном часовом поясе.
+
+    :param unit: 'hour' или 'day'.
+    :param periods: Сколько последних интервалов учитывать.
+    :return: Список словарей с полями period (начало интервала строкой), total, keyword, genre_year,
+             по возрастанию времени.
+    """
+    get_log_writer().flush()
+    step = timedelta(hours=1) if unit == "hour" else timedelta(days=1)
+    date_format = "%Y-%m-%d %H:00" if unit == "hour" else "%Y-%m-%d"
+    since = datetime.now(timezone.utc) - step * periods
+    local_offset = datetime.now().astimezone().strftime('%z')
+
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": since}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": date_format, "date": "$timestamp", "timezone": local_offset}},
+            "total": {"$sum": 1},
+            "keyword": {"$sum": {"$cond": [{"$eq": ["$search_type", "keyword"]}, 1, 0]}},
+            "genre_year": {"$sum": {"$cond": [{"$eq": ["$search_type", "genre_year"]}, 1, 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "period": "$_id", "total": 1, "keyword": 1, "genre_year": 1}},
+    ]
+    return list(_get_log_collection().aggregate(pipeline))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Обслуживание журнала запросов MongoDB")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate-timestamps",
+                                           help="перевести timestamp из строк ISO в даты BSON")
+    migrate_parser.add_argument("--utc-offset", default=None,
+                                help="часовой пояс старых записей, например +03:00 (по умолчанию местный)")
+    args = parser.parse_args()
+
+    if args.command == "migrate-timestamps":
+        count = migrate_timestamps_to_dates(args.utc_offset)
+        print(f"Преобразовано записей: {count}")
@@ -1,148 +1,1002 @@
 # Модуль отвечающий за подключение к MySQL и содержащий функции поиска
  
-import pymysql
-from pymysql.cursors import DictCursor
-from settings import MYSQL_SETTINGS
+import sys
+import threading
+import time
+from itertools import islice
+import settings
+from lazy_import import lazy_import
+from mysql_pool import get_pool, PoolTimeoutError, is_transient_error
+from resilience import CircuitOpenError
+from cache import TTLCache
+from result_cache import ResultCache, SQLiteResultStore
+from trigram_index import TrigramIndex
+from film_row import FilmRow, compact_rows
+from catalog_snapshot import get_snapshot
 from logger import log_error # Функция логирования ошибок в файл
+from metrics import timed, observe, inc, register_gauge
+from query_registry import QUERIES, register_query
 
-def connect_to_db():
+pymysql = lazy_import("pymysql")  # драйвер загружается при первом запросе, а не при запуске приложения
+
+# Запросы модуля (см. query_registry.py): каждый зарегистрирован под именем, по которому
+# в метриках учитываются число выполнений и суммарное время (этапы sql.<имя>).
+# Запросы, собираемые из частей (страницы с курсором, потоковое чтение, поиск по жанрам),
+# регистрируются при первом вызове каждой формы через QUERIES.variant().
+
+KEYWORD_LIKE_QUERY = register_query("keyword_like", '''
+    SELECT film_id, title, description, release_year
+    FROM film
+    WHERE title LIKE CONCAT('%%', %s, '%%')
+    ORDER BY title;
+''')
+
+KEYWORD_COUNT_QUERY = register_query("keyword_count", '''
+    SELECT COUNT(*) AS total
+    FROM film
+    WHERE title LIKE CONCAT('%%', %s, '%%');
+''')
+
+KEYWORD_FULLTEXT_QUERY = register_query("keyword_fulltext", '''
+    SELECT film_id, title, description, release_year,
+           MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) AS relevance
+    FROM film
+    WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY relevance DESC, title;
+''')
+
+KEYWORD_FULLTEXT_PAGE_QUERY = register_query("keyword_fulltext_page", '''
+    SELECT film_id, title, description, release_year,
+           MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) AS relevance
+    FROM film
+    WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY relevance DESC, title, film_id
+    LIMIT %s OFFSET %s;
+''')
+
+KEYWORD_FULLTEXT_COUNT_QUERY = register_query("keyword_fulltext_count", '''
+    SELECT COUNT(*) AS total
+    FROM film
+    WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE);
+''')
+
+ALL_FILMS_QUERY = register_query("all_films", '''
+    SELECT film_id, title, description, release_year
+    FROM film;
+''')
+
+FILM_TITLES_QUERY = register_query("film_titles", '''
+    SELECT film_id, title
+    FROM film
+    WHERE film_id > %s
+    ORDER BY film_id;
+''')
+
+ALL_GENRES_QUERY = register_query("all_genres", '''
+    SELECT category_id, name
+    FROM category
+    ORDER BY name;
+''')
+
+GENRE_YEAR_RANGE_QUERY = register_query("genre_year_range", '''
+    SELECT MIN(f.release_year) AS min_year, MAX(f.release_year) AS max_year
+    FROM film f
+    JOIN film_category fc ON f.film_id = fc.film_id
+    WHERE fc.category_id = %s;
+''')
+
+GENRE_YEAR_RANGES_QUERY = register_query("genre_year_ranges", '''
+    SELECT fc.category_id, MIN(f.release_year) AS min_year, MAX(f.release_year) AS max_year
+    FROM film f
+    JOIN film_category fc ON f.film_id = fc.film_id
+    GROUP BY fc.category_id;
+''')
+
+GENRE_YEARS_QUERY = register_query("genre_years", '''
+    SELECT f.film_id, f.title, f.description, f.release_year
+    FROM film f
+    JOIN film_category fc ON f.film_id = fc.film_id
+    WHERE fc.category_id = %s
+    AND f.release_year BETWEEN %s AND %s
+    ORDER BY f.title;
+''')
+
+GENRE_YEARS_COUNT_QUERY = register_query("genre_years_count", '''
+    SELECT COUNT(*) AS total
+    FROM film f
+    JOIN film_category fc ON f.film_id = fc.film_id
+    WHERE fc.category_id = %s
+    AND f.release_year BETWEEN %s AND %s;
+''')
+
+# Части запросов страниц и потокового чтения, упорядоченных по (title, film_id)
+KEYWORD_SELECT_SQL = "SELECT f.film_id, f.title, f.description, f.release_year FROM film f"
+KEYWORD_WHERE_SQL = "f.title LIKE CONCAT('%%', %s, '%%')"
+GENRE_YEARS_SELECT_SQL = ("SELECT f.film_id, f.title, f.description, f.release_year "
+                          "FROM film f JOIN film_category fc ON f.film_id = fc.film_id")
+GENRE_YEARS_WHERE_SQL = "fc.category_id = %s AND f.release_year BETWEEN %s AND %s"
+
+class SearchError(Exception):
+    """
+    Запрос не выполнен из-за ошибки базы данных (функции поиска с strict=True).
+
+    Ошибка уже записана в журнал, но не выведена: вызывающий код (пакетный режим, HTTP-сервис)
+    сам сообщает о ней и не принимает пустой результат за «ничего не найдено».
+    """
+
+def connect_to_db(strict=False):
     """
-    Устанавливает соединение с базой данных MySQL (sakila)
-    с использованием настроек из переменных среды.
+    Выдаёт соединение с базой данных MySQL (sakila) из общего пула соединений.
+
+    Новое подключение открывается только если в пуле нет свободного соединения.
+    После использования соединение нужно вернуть через release_connection().
+    Сообщения об ошибках выводятся в stderr: stdout пакетного режима занят результатами.
 
+    :param strict: При ошибке выбросить исключение, ничего не выводя.
     :return: объект соединения pymysql или None в случае ошибки.
+    :raises CircuitOpenError: при strict, если выключатель 'mysql' открыт.
+    :raises SearchError: при strict, если соединение получить не удалось.
     """
     try:
-        connection = pymysql.connect(**MYSQL_SETTINGS, cursorclass=DictCursor)
+        connection = get_pool().acquire()
         #print("Подключение к базе данных успешно.")
         return connection
-    except pymysql.MySQLError as e:
+    except (pymysql.MySQLError, PoolTimeoutError, CircuitOpenError) as e:
         # print(f"Ошибка подключения к базе данных: {e}")
-        msg = "Ошибка подключения к базе данных: {e}"
-        print(msg)
-        log_error(msg)
+        msg = f"Ошибка подключения к базе данных: {e}"
+        log_error(msg, exc=e)
+        if strict:
+            if isinstance(e, CircuitOpenError):
+                raise
+            raise SearchError(msg) from e
+        print(msg, file=sys.stderr)
         return None
+
+def release_connection(connection, broken=False):
+    """
+    Возвращает соединение в пул.
+
+    :param connection: Соединение, полученное через connect_to_db().
+    :param broken: True, если при работе с соединением произошла ошибка MySQL —
+                   такое соединение закрывается, а не переиспользуется.
+    """
+    get_pool().release(connection, broken=broken)
         
-def search_by_keyword(keyword):
+# Кэш результатов поиска: популярные запросы повторяются часто,
+# поэтому их результаты сохраняются по ключу из нормализованных параметров поиска.
+# Справочные данные (жанры и диапазоны годов по жанрам) меняются крайне редко,
+# поэтому запросы к ним проходят через кэш с TTL и LRU-вытеснением.
+# Оба кэша создаются при первом обращении, когда загружаются настройки.
+_result_cache = None
+_reference_cache = None
+_caches_ready = False
+_caches_lock = threading.Lock()
+
+def _init_caches():
+    """Создаёт кэш результатов и кэш справочных данных по настройкам приложения."""
+    global _result_cache, _reference_cache, _caches_ready
+    with _caches_lock:
+        if _caches_ready:
+            return
+        cache_settings = settings.RESULT_CACHE_SETTINGS
+        if cache_settings['enabled']:
+            _result_cache = ResultCache(
+                max_bytes=cache_settings['max_bytes'],
+                ttl=cache_settings['ttl'],
+                max_entry_bytes=cache_settings['max_entry_bytes'],
+                shared_store=(SQLiteResultStore(cache_settings['shared_path'], cache_settings['shared_max_bytes'])
+                              if cache_settings['shared_path'] else None),
+            )
+        _reference_cache = TTLCache(**settings.REFERENCE_CACHE_SETTINGS)
+        _caches_ready = True
+
+def _get_result_cache():
+    """Возвращает кэш результатов поиска или None, если он отключён."""
+    if not _caches_ready:
+        _init_caches()
+    return _result_cache
+
+def _get_reference_cache():
+    """Возвращает кэш справочных данных."""
+    if not _caches_ready:
+        _init_caches()
+    return _reference_cache
+
+register_gauge("mysql_pool", lambda: get_pool().stats())
+register_gauge("result_cache", lambda: _result_cache.stats() if _result_cache is not None else {})
+register_gauge("reference_cache", lambda: _reference_cache.stats() if _reference_cache is not None else {})
+
+def _normalize_keyword(keyword):
+    """Приводит ключевое слово к виду для ключа кэша (LIKE в sakila не различает регистр)."""
+    return keyword.casefold()
+
+def get_result_cache_stats():
+    """
+    Возвращает статистику кэша результатов поиска или None, если кэш отключён.
+    """
+    cache = _get_result_cache()
+    return cache.stats() if cache is not None else None
+
+def invalidate_result_cache():
+    """Очищает кэш результатов поиска (например, после изменения каталога фильмов)."""
+    cache = _get_result_cache()
+    if cache is not None:
+        cache.invalidate()
+
+def _is_compact(row_format):
+    """Нужен ли компактный формат строк (FilmRow) для значения row_format (None — settings.ROW_FORMAT)."""
+    return (row_format or settings.ROW_FORMAT) == 'compact'
+
+def _in_format(rows, compact):
+    """Приводит список строк фильмов к нужному формату: FilmRow при compact, иначе словари."""
+    if compact:
+        return compact_rows(rows)
+    if rows and isinstance(rows[0], FilmRow):
+        return [row.to_dict() for row in rows]
+    return rows
+
+def _fetch_rows(query, params, error_text, one=False, cache_key=None, local=False, compact=False, strict=False):
+    """
+    Выполняет запрос на соединении из пула.
+
+    :param query: Запрос из реестра (Query, см. query_registry.py).
+    :param params: Параметры запроса.
+    :param error_text: Начало сообщения об ошибке для вывода и журнала.
+    :param one: Вернуть одну строку (fetchone) вместо списка.
+    :param cache_key: Кортеж нормализованных параметров поиска; если указан,
+                      результат берётся из кэша результатов или сохраняется в него.
+    :param local: Запрос совместим с SQLite и может выполняться по локальному снимку каталога
+                  (см. catalog_snapshot.py), если снимок включён и актуален.
+    :param compact: Вернуть строки фильмов как FilmRow (см. film_row.py) вместо словарей;
+                    в кэше результатов тогда тоже хранятся компактные строки.
+    :param strict: При ошибке выбросить SearchError (или CircuitOpenError) вместо возврата None.
+    :return: Результат запроса или None в случае ошибки.
     """
-    Выполняет поиск фильмов по части названия (ключевому слову) в базе MySQL.
+    if local:
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            result = snapshot.query(query.sql, params, one=one)
+            if result is not None:  # иначе (ошибка SQLite) запрос выполняется в MySQL
+                inc("snapshot.hits")
+                return compact_rows(result) if compact and not one else result
+
+    result_cache = _get_result_cache() if cache_key is not None else None
+    if result_cache is not None:
+        result = result_cache.get_or_load(
+            ResultCache.make_key(*cache_key, *(("compact",) if compact else ())),
+            lambda: _fetch_rows(query, params, error_text, one=one, compact=compact, strict=strict),
+        )
+        # из общего хранилища кэша строки возвращаются словарями
+        return compact_rows(result) if compact and result and not one else result
+
+    connection = connect_to_db(strict)
+    if connection is None:
+        return None
+
+    broken = False
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            result = query.run(cursor, params, one=one)
+        observe("mysql.query", time.perf_counter() - started)
+        inc("mysql.rows_returned", (1 if result else 0) if one else len(result))
+        return compact_rows(result) if compact and not one else result
+    except pymysql.MySQLError as e:
+        broken = True
+        msg = f"{error_text}: {e}"
+        log_error(msg, exc=e, latency=time.perf_counter() - started)
+        if strict:
+            raise SearchError(msg) from e
+        print(msg, file=sys.stderr)
+        return None
+    finally:
+        release_connection(connection, broken)
+
+@timed("mysql.search_by_keyword")
+def search_by_keyword(keyword, mode=None, row_format=None, strict=False):
+    """
+    Выполняет поиск фильмов по части названия (ключевому слову).
+
+    Режим поиска задаётся параметром mode или настройкой KEYWORD_SEARCH_MODE:
+    - 'like' — LIKE '%слово%' по названию в MySQL (полный просмотр таблицы film),
+      результаты упорядочены по названию;
+    - 'fulltext' — FULLTEXT-индекс с парсером ngram по названию и описанию
+      (см. sql/fulltext_index.sql), результаты упорядочены по релевантности;
+    - 'trigram' — локальный триграммный индекс в памяти процесса,
+      построенный по таблице film, результаты упорядочены по релевантности.
 
     :param keyword: Ключевое слово для поиска в названии фильма.
+    :param mode: Режим поиска ('like', 'fulltext' или 'trigram'); по умолчанию KEYWORD_SEARCH_MODE.
+    :param row_format: Формат строк: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :param strict: При ошибке базы данных выбросить SearchError (или CircuitOpenError),
+                   а не вернуть пустой список.
     :return: Список словарей с информацией о фильмах (film_id, title, description, release_year).
              Если возникает ошибка — возвращается пустой список.
     """
-    connection = connect_to_db()
+    mode = mode or settings.KEYWORD_SEARCH_MODE
+    compact = _is_compact(row_format)
+    if mode == 'fulltext':
+        return _search_by_keyword_fulltext(keyword, compact, strict)
+    if mode == 'trigram':
+        return _search_by_keyword_trigram(keyword, compact, strict)
+    return _search_by_keyword_like(keyword, compact, strict)
+
+def _search_by_keyword_like(keyword, compact=False, strict=False):
+    """
+    Поиск по части названия через LIKE '%слово%'.
+
+    :param keyword: Ключевое слово для поиска в названии фильма.
+    :param compact: Вернуть строки как FilmRow.
+    :param strict: При ошибке выбросить SearchError.
+    :return: Список словарей с информацией о фильмах или пустой список при ошибке.
+    """
+    results = _fetch_rows(KEYWORD_LIKE_QUERY, (keyword,), "Ошибка при выполнении запроса",
+        cache_key=("keyword", _normalize_keyword(keyword)), local=True, compact=compact, strict=strict)
+    return results or []  # возвращаем список результатов
+
+def _fulltext_phrase(keyword):
+    """Превращает ключевое слово во фразу для MATCH ... AGAINST (пустая строка, если слово пустое)."""
+    keyword = keyword.replace('"', ' ').strip()
+    return f'"{keyword}"' if keyword else ''
+
+def _search_by_keyword_fulltext(keyword, compact=False, strict=False):
+    """
+    Поиск по названию и описанию через FULLTEXT-индекс с парсером ngram.
+
+    Ключевое слово передаётся как фраза в BOOLEAN MODE: парсер ngram разбивает
+    её на n-граммы, поэтому находятся и фрагменты слов, как при LIKE.
+
+    :param keyword: Ключевое слово для поиска.
+    :param compact: Вернуть строки как FilmRow (без поля relevance).
+    :param strict: При ошибке выбросить SearchError.
+    :return: Список словарей с информацией о фильмах (с дополнительным полем relevance),
+             отсортированный по убыванию релевантности, или пустой список при ошибке.
+    """
+    phrase = _fulltext_phrase(keyword)
+    if not phrase:
+        return _search_by_keyword_like(keyword, compact, strict)
+
+    connection = connect_to_db(strict)
     if connection is None:
         return []
 
+    broken = False
     try:
         with connection.cursor() as cursor:
-            sql = '''
-                SELECT film_id, title, description, release_year
-                FROM film
-                WHERE title LIKE CONCAT('%%', %s, '%%')
-                ORDER BY title;
-            '''
-            cursor.execute(sql, (keyword,))
-            results = cursor.fetchall()
-            return results  # возвращаем список результатов
+            return _in_format(KEYWORD_FULLTEXT_QUERY.run(cursor, (phrase, phrase)), compact)
     except pymysql.MySQLError as e:
-        #print(f"Ошибка при выполнении запроса: {e}")
-        msg = "Ошибка при выполнении запроса: {e}"
-        print(msg)
-        log_error(msg)        
+        broken = True
+        msg = f"Ошибка при полнотекстовом поиске: {e}"
+        log_error(msg, exc=e)
+        if strict:
+            raise SearchError(msg) from e
+        print(msg, file=sys.stderr)
         return []
     finally:
-        connection.close()
+        release_connection(connection, broken)
+
+_trigram_index = None
+_trigram_lock = threading.Lock()
 
-def get_all_genres():
+def get_trigram_index():
     """
-    Получает список всех жанров из таблицы category базы данных MySQL.
+    Возвращает локальный триграммный индекс по таблице film, строя его при первом обращении.
 
+    :return: Объект TrigramIndex или None, если каталог не удалось загрузить.
+    """
+    global _trigram_index
+    if _trigram_index is None:
+        with _trigram_lock:
+            if _trigram_index is None:
+                _trigram_index = refresh_trigram_index()
+    return _trigram_index
+
+@timed("mysql.refresh_trigram_index")
+def refresh_trigram_index():
+    """
+    Перечитывает таблицу film и строит триграммный индекс заново.
+
+    :return: Новый объект TrigramIndex или None в случае ошибки.
+    """
+    global _trigram_index
+    connection = connect_to_db()
+    if connection is None:
+        return None
+
+    broken = False
+    try:
+        with connection.cursor() as cursor:
+            rows = ALL_FILMS_QUERY.run(cursor)
+            # индекс держит в памяти строки всего каталога — в компактном формате они занимают меньше
+            _trigram_index = TrigramIndex(compact_rows(rows) if _is_compact(None) else rows)
+            return _trigram_index
+    except pymysql.MySQLError as e:
+        broken = True
+        msg = f"Ошибка при построении индекса фильмов: {e}"
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+        return None
+    finally:
+        release_connection(connection, broken)
+
+def _search_by_keyword_trigram(keyword, compact=False, strict=False):
+    """
+    Поиск по названию и описанию через локальный триграммный индекс.
+
+    :param keyword: Ключевое слово для поиска.
+    :param compact: Вернуть строки как FilmRow.
+    :param strict: При ошибке резервного поиска через LIKE выбросить SearchError.
+    :return: Список словарей с информацией о фильмах, отсортированный по релевантности.
+             Если индекс построить не удалось — выполняется обычный поиск через LIKE.
+    """
+    index = get_trigram_index()
+    if index is None:
+        return _search_by_keyword_like(keyword, compact, strict)
+    return _in_format(index.search(keyword), compact)
+
+@timed("mysql.load_film_titles")
+def load_film_titles(after_id=0, strict=False):
+    """
+    Читает названия фильмов (для индекса подсказок, см. suggest.py).
+
+    :param after_id: Читать только фильмы с film_id больше after_id (0 — все).
+    :param strict: При ошибке выбросить SearchError, ничего не выводя (вызов из фонового потока).
+    :return: Список словарей с полями film_id и title или None в случае ошибки.
+    """
+    return _fetch_rows(FILM_TITLES_QUERY, (after_id,), "Ошибка при чтении названий фильмов", local=True,
+                       strict=strict)
+
+@timed("mysql.get_all_genres")
+def get_all_genres(strict=False):
+    """
+    Получает список всех жанров из таблицы category базы данных MySQL (через кэш).
+
+    :param strict: При ошибке базы данных выбросить SearchError (или CircuitOpenError),
+                   а не вернуть пустой список.
     :return: Список словарей с полями 'category_id' и 'name'.
              В случае ошибки — пустой список.
     """
-    connection = connect_to_db()
+    return _get_reference_cache().get_or_load("genres", lambda: _load_all_genres(strict), cache_if=bool)
+
+def _load_all_genres(strict=False):
+    """Читает список жанров из базы (или из локального снимка каталога), минуя кэш."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        genres = snapshot.query(ALL_GENRES_QUERY.sql)
+        if genres:
+            return genres
+
+    connection = connect_to_db(strict)
     if connection is None:
         return []
 
+    broken = False
     try:
         with connection.cursor() as cursor:
-            cursor.execute('''
-                SELECT category_id, name
-                FROM category
-                ORDER BY name;
-            ''')
-            return cursor.fetchall()
+            return ALL_GENRES_QUERY.run(cursor)
     except pymysql.MySQLError as e:
+        broken = True
         #print(f"Ошибка при получении жанров: {e}")
-        msg = "Ошибка при получении жанров: {e}"
-        print(msg)
-        log_error(msg)           
+        msg = f"Ошибка при получении жанров: {e}"
+        log_error(msg, exc=e)
+        if strict:
+            raise SearchError(msg) from e
+        print(msg, file=sys.stderr)
         return []
     finally:
-        connection.close()
+        release_connection(connection, broken)
 
+@timed("mysql.get_year_range_for_genre")
 def get_year_range_for_genre(category_id):
     """
-    Возвращает минимальный и максимальный год выпуска фильмов для указанного жанра.
+    Возвращает минимальный и максимальный год выпуска фильмов для указанного жанра (через кэш).
 
     :param category_id: Идентификатор жанра (категории).
     :return: Кортеж (min_year, max_year) или (None, None) в случае ошибки или отсутствия данных.
     """
+    return _get_reference_cache().get_or_load(
+        ("year_range", category_id),
+        lambda: _load_year_range_for_genre(category_id),
+        cache_if=lambda year_range: year_range[0] is not None,
+    )
+
+def _load_year_range_for_genre(category_id):
+    """Читает диапазон годов жанра из базы (или из локального снимка каталога), минуя кэш."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        row = snapshot.query(GENRE_YEAR_RANGE_QUERY.sql, (category_id,), one=True)
+        if row is not None:
+            return row['min_year'], row['max_year']
+
     connection = connect_to_db()
     if connection is None:
         return None, None
 
+    broken = False
     try:
         with connection.cursor() as cursor:
-            cursor.execute('''
-                SELECT MIN(f.release_year), MAX(f.release_year)
-                FROM film f
-                JOIN film_category fc ON f.film_id = fc.film_id
-                WHERE fc.category_id = %s;
-            ''', (category_id,))
-            result = cursor.fetchone()
-            return result['MIN(f.release_year)'], result['MAX(f.release_year)']
+            result = GENRE_YEAR_RANGE_QUERY.run(cursor, (category_id,), one=True)
+            return result['min_year'], result['max_year']
     except pymysql.MySQLError as e:
+        broken = True
         #print(f"Ошибка при получении диапазона годов: {e}")
-        msg = "Ошибка при получении диапазона годов: {e}"
-        print(msg)
-        log_error(msg)              
+        msg = f"Ошибка при получении диапазона годов: {e}"
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
         return None, None
     finally:
-        connection.close()
+        release_connection(connection, broken)
+
+@timed("mysql.preload_genre_year_ranges")
+def preload_genre_year_ranges(strict=False):
+    """
+    Загружает в кэш диапазоны годов сразу для всех жанров одним запросом с GROUP BY.
+
+    :param strict: При ошибке выбросить SearchError, ничего не выводя (вызов из фонового потока).
+    :return: Количество жанров, для которых диапазон помещён в кэш (0 в случае ошибки).
+    """
+    rows = _fetch_rows(GENRE_YEAR_RANGES_QUERY, (), "Ошибка при получении диапазонов годов", local=True,
+                       strict=strict)
+    for row in rows or []:
+        _get_reference_cache().set(("year_range", row['category_id']), (row['min_year'], row['max_year']))
+    return len(rows or [])
+
+def invalidate_reference_cache(category_id=None):
+    """
+    Сбрасывает кэш справочных данных.
+
+    :param category_id: Если указан — сбрасывается только диапазон годов этого жанра,
+                        иначе очищается весь кэш (жанры и все диапазоны).
+    """
+    if category_id is None:
+        _get_reference_cache().invalidate()
+    else:
+        _get_reference_cache().invalidate(("year_range", category_id))
+
+def get_reference_cache_stats():
+    """
+    Возвращает счётчики кэша справочных данных (hits, misses, evictions, size и т.д.).
+    """
+    return _get_reference_cache().stats()
 
-def search_by_genre_and_years(category_id, year_from, year_to):
+@timed("mysql.search_by_genre_and_years")
+def search_by_genre_and_years(category_id, year_from, year_to, row_format=None, strict=False):
     """
     Выполняет поиск фильмов по жанру и диапазону годов выпуска.
 
     :param category_id: Идентификатор жанра.
     :param year_from: Начальный год диапазона.
     :param year_to: Конечный год диапазона.
+    :param row_format: Формат строк: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :param strict: При ошибке базы данных выбросить SearchError (или CircuitOpenError),
+                   а не вернуть пустой список.
     :return: Список фильмов в формате словарей (film_id, title, description, release_year).
              В случае ошибки — пустой список.
     """
-    connection = connect_to_db()
-    if connection is None:
-        return []
+    results = _fetch_rows(GENRE_YEARS_QUERY, (category_id, year_from, year_to), "Ошибка при поиске фильмов",
+        cache_key=("genre_year", int(category_id), int(year_from), int(year_to)), local=True,
+        compact=_is_compact(row_format), strict=strict)
+    return results or []
 
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute('''
-                SELECT f.film_id, f.title, f.description, f.release_year
-                FROM film f
-                JOIN film_category fc ON f.film_id = fc.film_id
-                WHERE fc.category_id = %s
-                AND f.release_year BETWEEN %s AND %s
-                ORDER BY f.title;
-            ''', (category_id, year_from, year_to))
-            return cursor.fetchall()
-    except pymysql.MySQLError as e:
-        #print(f"Ошибка при поиске фильмов: {e}")
-        msg = "Ошибка при поиске фильмов: {e}"
-        print(msg)
-        log_error(msg)        
-        return []
-    finally:
-        connection.close()
+# Постраничный доступ к результатам поиска.
+# Для запросов, упорядоченных по названию, используется пагинация по ключу (title, film_id):
+# следующая страница запрашивается условием (title, film_id) > (последний title, последний film_id),
+# поэтому из базы читается только показываемая страница, а не весь результат.
+
+PAGE_SIZE = 10
+
+def _keyset_page(name, select_sql, where_sql, params, after, page_size, error_text, cache_key, compact=False,
+                 strict=False):
+    """
+    Читает одну страницу результатов, упорядоченных по (title, film_id).
+
+    :param name: Имя запроса в реестре (см. query_registry.py).
+    :param select_sql: Часть запроса SELECT ... FROM ... (псевдоним таблицы film — f).
+    :param where_sql: Условие WHERE без учёта курсора.
+    :param params: Параметры условия WHERE.
+    :param after: Курсор (title, film_id) последней строки предыдущей страницы или None.
+    :param page_size: Размер страницы.
+    :param error_text: Начало сообщения об ошибке.
+    :param cache_key: Нормализованные параметры поиска для кэша результатов (без курсора).
+    :param compact: Вернуть строки как FilmRow.
+    :param strict: При ошибке выбросить SearchError.
+    :return: Кортеж (rows, next_cursor); next_cursor равен None, если страниц больше нет.
+    """
+    params = list(params)
+    if after is not None:
+        params.extend(after)
+    params.append(page_size + 1)  # одна лишняя строка показывает, есть ли следующая страница
+    query = QUERIES.variant(name, (after is not None,), lambda: (
+        f"{select_sql} WHERE {where_sql}"
+        f"{' AND (f.title, f.film_id) > (%s, %s)' if after is not None else ''}"
+        f" ORDER BY f.title, f.film_id LIMIT %s"))
+
+    rows = _fetch_rows(query, params, error_text,
+                       cache_key=cache_key + ("page", after and tuple(after), page_size), local=True,
+                       compact=compact, strict=strict)
+    if not rows:
+        return [], None
+    if len(rows) <= page_size:
+        return list(rows), None
+    rows = list(rows[:page_size])
+    last = rows[-1]
+    return rows, (last['title'], last['film_id'])
+
+def _offset_page(rows, after, page_size):
+    """
+    Возвращает страницу из уже ранжированного списка; курсор — позиция следующей страницы.
+    """
+    start = after or 0
+    page = rows[start:start + page_size]
+    next_cursor = start + page_size if start + page_size < len(rows) else None
+    return page, next_cursor
+
+def keyword_page_uses_offset(keyword, mode=None):
+    """
+    Определяет вид курсора search_by_keyword_page для ключевого слова.
+
+    :return: True — курсор является позицией в результате (целое число, режимы 'fulltext' и 'trigram');
+             False — курсор (title, film_id) последней строки страницы.
+    """
+    mode = mode or settings.KEYWORD_SEARCH_MODE
+    return mode == 'trigram' or (mode == 'fulltext' and bool(_fulltext_phrase(keyword)))
+
+@timed("mysql.search_by_keyword_page")
+def search_by_keyword_page(keyword, after=None, page_size=PAGE_SIZE, mode=None, row_format=None, strict=False):
+    """
+    Возвращает одну страницу результатов поиска по ключевому слову.
+
+    В режиме 'like' используется пагинация по ключу (title, film_id).
+    Режимы 'fulltext' и 'trigram' упорядочены по релевантности,
+    поэтому курсором служит позиция в результате.
+
+    :param keyword: Ключевое слово для поиска в названии фильма.
+    :param after: Курсор, полученный с предыдущей страницей (None — первая страница).
+    :param page_size: Количество фильмов на странице.
+    :param mode: Режим поиска; по умолчанию KEYWORD_SEARCH_MODE.
+    :param row_format: Формат строк: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :param strict: При ошибке базы данных выбросить SearchError (или CircuitOpenError),
+                   а не вернуть пустую страницу.
+    :return: Кортеж (rows, next_cursor); next_cursor равен None на последней странице.
+    """
+    mode = mode or settings.KEYWORD_SEARCH_MODE
+    compact = _is_compact(row_format)
+    if mode == 'trigram':
+        return _offset_page(search_by_keyword(keyword, mode=mode, row_format=row_format, strict=strict),
+                            after, page_size)
+    if mode == 'fulltext':
+        phrase = _fulltext_phrase(keyword)
+        if phrase:
+            rows = _fetch_rows(KEYWORD_FULLTEXT_PAGE_QUERY, (phrase, phrase, page_size + 1, after or 0),
+                "Ошибка при полнотекстовом поиске",
+                cache_key=("fulltext", _normalize_keyword(keyword), "page", after or 0, page_size),
+                compact=compact, strict=strict)
+            rows = list(rows or [])
+            start = after or 0
+            next_cursor = start + page_size if len(rows) > page_size else None
+            return rows[:page_size], next_cursor
+
+    return _keyset_page(
+        "keyword_page", KEYWORD_SELECT_SQL, KEYWORD_WHERE_SQL,
+        (keyword,), after, page_size, "Ошибка при выполнении запроса",
+        ("keyword", _normalize_keyword(keyword)), compact, strict,
+    )
+
+@timed("mysql.count_by_keyword")
+def count_by_keyword(keyword, mode=None, strict=False):
+    """
+    Возвращает количество фильмов, найденных по ключевому слову, не загружая сами строки.
+
+    :param keyword: Ключевое слово для поиска.
+    :param mode: Режим поиска; по умолчанию KEYWORD_SEARCH_MODE.
+    :param strict: При ошибке базы данных выбросить SearchError (или CircuitOpenError), а не вернуть 0.
+    :return: Количество найденных фильмов (0 в случае ошибки).
+    """
+    mode = mode or settings.KEYWORD_SEARCH_MODE
+    if mode == 'trigram':
+        return len(search_by_keyword(keyword, mode=mode, strict=strict))
+    if mode == 'fulltext':
+        phrase = _fulltext_phrase(keyword)
+        if phrase:
+            row = _fetch_rows(KEYWORD_FULLTEXT_COUNT_QUERY, (phrase,), "Ошибка при полнотекстовом поиске",
+                one=True, cache_key=("fulltext", _normalize_keyword(keyword), "count"), strict=strict)
+            return row['total'] if row else 0
+
+    row = _fetch_rows(KEYWORD_COUNT_QUERY, (keyword,), "Ошибка при выполнении запроса", one=True,
+        cache_key=("keyword", _normalize_keyword(keyword), "count"), local=True, strict=strict)
+    return row['total'] if row else 0
+
+@timed("mysql.search_by_genre_and_years_page")
+def search_by_genre_and_years_page(category_id, year_from, year_to, after=None, page_size=PAGE_SIZE,
+                                  row_format=None):
+    """
+    Возвращает одну страницу результатов поиска по жанру и диапазону годов.
+
+    :param category_id: Идентификатор жанра.
+    :param year_from: Начальный год диапазона.
+    :param year_to: Конечный год диапазона.
+    :param after: Курсор (title, film_id), полученный с предыдущей страницей (None — первая страница).
+    :param page_size: Количество фильмов на странице.
+    :param row_format: Формат строк: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :return: Кортеж (rows, next_cursor); next_cursor равен None на последней странице.
+    """
+    return _keyset_page(
+        "genre_years_page", GENRE_YEARS_SELECT_SQL, GENRE_YEARS_WHERE_SQL,
+        (category_id, year_from, year_to), after, page_size, "Ошибка при поиске фильмов",
+        ("genre_year", int(category_id), int(year_from), int(year_to)), _is_compact(row_format),
+    )
+
+# Потоковое чтение результатов.
+# Небуферизованный курсор SSDictCursor отдаёт строки по мере их получения от сервера:
+# первый фильм выводится сразу, а в памяти держится не больше STREAM_FETCH_SIZE строк,
+# сколько бы фильмов ни нашлось (например, по ключевому слову из одной буквы).
+# Строки упорядочены по (title, film_id), поэтому если соединение оборвалось посреди чтения
+# (сервер закрывает его по net_write_timeout, пока пользователь долго читает страницу),
+# чтение продолжается новым запросом с позиции после последней выданной строки.
+
+
+class StreamError(SearchError):
+    """
+    Потоковое чтение результата прервано ошибкой базы данных.
+
+    Сообщение об ошибке уже выведено и записано в журнал; вызывающий код только
+    не должен считать прочитанные строки полным результатом.
+    """
+
+
+def _stream_rows(name, select_sql, where_sql, params, error_text, after=None, local=False, compact=False):
+    """
+    Генератор строк запроса, упорядоченного по (title, film_id), без загрузки всего результата в память.
+
+    Если генератор закрыт до конца результата, соединение закрывается, а не возвращается в пул:
+    дочитывать оставшиеся строки небуферизованного запроса дольше, чем открыть новое соединение.
+    В статистике запроса name учитывается время до получения первых строк: дальше строки
+    читаются в темпе потребителя (например, пока пользователь листает страницы).
+
+    :param name: Имя запроса в реестре (см. query_registry.py).
+    :param select_sql: Часть запроса SELECT ... FROM ... (псевдоним таблицы film — f).
+    :param where_sql: Условие WHERE.
+    :param params: Параметры условия WHERE.
+    :param error_text: Начало сообщения об ошибке для вывода и журнала.
+    :param after: Курсор (title, film_id): читать строки после него (например, после уже показанной страницы).
+    :param local: Запрос совместим с SQLite и может читаться из локального снимка каталога.
+    :param compact: Отдавать строки как FilmRow.
+    :return: Генератор словарей.
+    :raises StreamError: если чтение прервано ошибкой базы данных (сообщение уже выведено).
+    """
+    cursor_sql = " AND (f.title, f.film_id) > (%s, %s)"
+    order_sql = " ORDER BY f.title, f.film_id"
+    if local:
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            sql = f"{select_sql} WHERE {where_sql}{cursor_sql if after is not None else ''}{order_sql}"
+            rows = snapshot.stream(sql, list(params) + list(after or ()), settings.STREAM_FETCH_SIZE)
+            if rows is not None:
+                inc("snapshot.hits")
+                yield from (map(FilmRow.from_mapping, rows) if compact else rows)
+                return
+
+    # after — (title, film_id) последней выданной строки
+    while True:
+        query_params = list(params)
+        if after is not None:
+            query_params.extend(after)
+        resumed = after is not None
+        query = QUERIES.variant(name, (resumed,), lambda: (
+            f"{select_sql} WHERE {where_sql}{cursor_sql if resumed else ''}{order_sql}"))
+        resumed_from = after
+
+        connection = connect_to_db()
+        if connection is None:
+            raise StreamError(f"{error_text}: нет соединения с MySQL")
+        broken = True  # пока результат не дочитан, соединение нельзя вернуть в пул
+        executed = False
+        started = time.perf_counter()
+        try:
+            cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(query.sql, query_params)
+            query.record(time.perf_counter() - started)
+            executed = True
+            while True:
+                rows = cursor.fetchmany(settings.STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                inc("mysql.rows_returned", len(rows))
+                for row in rows:
+                    after = (row['title'], row['film_id'])
+                    yield FilmRow.from_mapping(row) if compact else row
+            cursor.close()
+            broken = False
+            observe("mysql.stream", time.perf_counter() - started)
+            return
+        except pymysql.MySQLError as e:
+            if not executed:
+                query.record(time.perf_counter() - started, error=True)
+            if is_transient_error(e) and after != resumed_from:  # соединение оборвалось, но чтение продвинулось
+                inc("mysql.stream_resumed")
+                continue
+            msg = f"{error_text}: {e}"
+            print(msg, file=sys.stderr)
+            log_error(msg, exc=e, latency=time.perf_counter() - started)
+            raise StreamError(msg) from e
+        finally:
+            release_connection(connection, broken)
+
+def stream_by_keyword(keyword, after=None, mode=None, row_format=None):
+    """
+    Потоковый поиск фильмов по части названия: строки отдаются по мере чтения из базы.
+
+    В режимах 'fulltext' и 'trigram' результат упорядочен по релевантности и ограничен
+    найденными совпадениями, поэтому он читается целиком через search_by_keyword().
+
+    :param keyword: Ключевое слово для поиска в названии фильма.
+    :param after: Курсор страницы из search_by_keyword_page: читать строки после уже показанных.
+    :param mode: Режим поиска; по умолчанию KEYWORD_SEARCH_MODE.
+    :param row_format: Формат строк: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :return: Генератор словарей (film_id, title, description, release_year).
+    :raises StreamError: если чтение прервано ошибкой базы данных.
+    """
+    mode = mode or settings.KEYWORD_SEARCH_MODE
+    if keyword_page_uses_offset(keyword, mode):
+        yield from islice(search_by_keyword(keyword, mode=mode, row_format=row_format), after or 0, None)
+        return
+    yield from _stream_rows(
+        "keyword_stream", KEYWORD_SELECT_SQL, KEYWORD_WHERE_SQL,
+        (keyword,), "Ошибка при выполнении запроса", after=after, local=True, compact=_is_compact(row_format),
+    )
+
+def stream_by_genre_and_years(category_id, year_from, year_to, after=None, row_format=None):
+    """
+    Потоковый поиск фильмов по жанру и диапазону годов: строки отдаются по мере чтения из базы.
+
+    :param category_id: Идентификатор жанра.
+    :param year_from: Начальный год диапазона.
+    :param year_to: Конечный год диапазона.
+    :param after: Курсор (title, film_id) из search_by_genres или search_by_genre_and_years_page:
+                  читать строки после уже показанных.
+    :param row_format: Формат строк: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :return: Генератор словарей (film_id, title, description, release_year), упорядоченных по названию.
+    :raises StreamError: если чтение прервано ошибкой базы данных.
+    """
+    yield from _stream_rows(
+        "genre_years_stream", GENRE_YEARS_SELECT_SQL, GENRE_YEARS_WHERE_SQL,
+        (category_id, year_from, year_to), "Ошибка при поиске фильмов", after=after, local=True,
+        compact=_is_compact(row_format),
+    )
+
+@timed("mysql.count_by_genre_and_years")
+def count_by_genre_and_years(category_id, year_from, year_to):
+    """
+    Возвращает количество фильмов жанра в диапазоне годов, не загружая сами строки.
+
+    :return: Количество найденных фильмов (0 в случае ошибки).
+    """
+    row = _fetch_rows(GENRE_YEARS_COUNT_QUERY, (category_id, year_from, year_to), "Ошибка при поиске фильмов",
+        one=True, cache_key=("genre_year", int(category_id), int(year_from), int(year_to), "count"), local=True)
+    return row['total'] if row else 0
+
+# Сводный поиск по жанрам: границы годов, количество и первая страница результатов
+# возвращаются одним запросом вместо отдельных обращений get_year_range_for_genre,
+# count_by_genre_and_years и search_by_genre_and_years_page.
+# Рекомендуемые индексы — sql/genre_indexes.sql.
+
+@timed("mysql.search_by_genres")
+def search_by_genres(category_ids, year_from=None, year_to=None, keyword=None,
+                     min_length=None, max_length=None, ratings=None, after=None, page_size=PAGE_SIZE,
+                     row_format=None, strict=False):
+    """
+    Выполняет поиск фильмов по одному или нескольким жанрам с дополнительными фильтрами
+    за один запрос к базе.
+
+    Границы годов (min_year, max_year) считаются по всем фильмам выбранных жанров,
+    удовлетворяющим фильтрам keyword/length/rating, но без учёта диапазона годов,
+    чтобы их можно было показать как допустимый диапазон. Количество (total) и страница
+    результатов учитывают все фильтры, включая годы.
+
+    :param category_ids: Идентификатор жанра или список идентификаторов (фильм подходит, если входит хотя бы в один).
+    :param year_from: Начальный год диапазона (None — без ограничения снизу).
+    :param year_to: Конечный год диапазона (None — без ограничения сверху).
+    :param keyword: Часть названия фильма (None — без фильтра).
+    :param min_length: Минимальная длительность фильма в минутах.
+    :param max_length: Максимальная длительность фильма в минутах.
+    :param ratings: Список допустимых рейтингов (например, ['G', 'PG']).
+    :param after: Курсор (title, film_id) последней строки предыдущей страницы или None.
+    :param page_size: Количество фильмов на странице.
+    :param row_format: Формат строк страницы: 'dict' или 'compact' (FilmRow); по умолчанию ROW_FORMAT.
+    :param strict: При ошибке базы данных выбросить SearchError (или CircuitOpenError),
+                   а не вернуть пустой результат.
+    :return: Словарь с полями min_year, max_year, total, rows, next_cursor.
+             В случае ошибки — пустой результат (min_year и max_year равны None).
+    """
+    if isinstance(category_ids, int):
+        category_ids = [category_ids]
+    category_ids = sorted({int(category_id) for category_id in category_ids})
+    # числовые фильтры приводятся к int сразу: '2005' и 2005 — один и тот же ключ кэша
+    year_from, year_to, min_length, max_length = (None if value is None else int(value)
+                                                  for value in (year_from, year_to, min_length, max_length))
+    ratings = sorted(set(ratings)) if ratings else []
+    result = {"min_year": None, "max_year": None, "total": 0, "rows": [], "next_cursor": None}
+    if not category_ids:
+        return result
+
+    # фильтры, общие для границ годов и страницы
+    conditions = [f"f.film_id IN (SELECT fc.film_id FROM film_category fc "
+                  f"WHERE fc.category_id IN ({', '.join(['%s'] * len(category_ids))}))"]
+    params = list(category_ids)
+    if keyword:
+        conditions.append("f.title LIKE CONCAT('%%', %s, '%%')")
+        params.append(keyword)
+    if min_length is not None:
+        conditions.append("f.length >= %s")
+        params.append(min_length)
+    if max_length is not None:
+        conditions.append("f.length <= %s")
+        params.append(max_length)
+    if ratings:
+        conditions.append(f"f.rating IN ({', '.join(['%s'] * len(ratings))})")
+        params.extend(ratings)
+
+    # диапазон годов — только для количества и страницы
+    years_sql = "1 = 1"
+    years_params = []
+    if year_from is not None:
+        years_sql += " AND release_year >= %s"
+        years_params.append(year_from)
+    if year_to is not None:
+        years_sql += " AND release_year <= %s"
+        years_params.append(year_to)
+
+    page_sql = years_sql
+    page_params = list(years_params)
+    if after is not None:
+        page_sql += " AND (title, film_id) > (%s, %s)"
+        page_params.extend(after)
+
+    # LEFT JOIN к странице сохраняет строку с границами, даже если в диапазон годов ничего не попало.
+    # Текст зависит только от набора фильтров, поэтому собирается один раз для каждой их комбинации.
+    shape = (len(category_ids), bool(keyword), min_length is not None, max_length is not None, len(ratings),
+             year_from is not None, year_to is not None, after is not None)
+    query = QUERIES.variant("genres_summary", shape, lambda: f'''
+        WITH matched AS (
+            SELECT f.film_id, f.title, f.description, f.release_year
+            FROM film f
+            WHERE {' AND '.join(conditions)}
+        ), bounds AS (
+            SELECT MIN(release_year) AS min_year, MAX(release_year) AS max_year,
+                   COUNT(CASE WHEN {years_sql} THEN 1 END) AS total
+            FROM matched
+        ), page AS (
+            SELECT film_id, title, description, release_year
+            FROM matched
+            WHERE {page_sql}
+            ORDER BY title, film_id
+            LIMIT %s
+        )
+        SELECT b.min_year, b.max_year, b.total, p.film_id, p.title, p.description, p.release_year
+        FROM bounds b
+        LEFT JOIN page p ON 1 = 1
+        ORDER BY p.title, p.film_id;
+    ''')
+    rows = _fetch_rows(query, params + years_params + page_params + [page_size + 1], "Ошибка при поиске фильмов",
+                       cache_key=("genres", tuple(category_ids), year_from, year_to,
+                                  _normalize_keyword(keyword) if keyword else None,
+                                  min_length, max_length, tuple(ratings), after and tuple(after), page_size),
+                       local=True, strict=strict)
+    if not rows:
+        return result
+
+    first = rows[0]
+    result.update(min_year=first['min_year'], max_year=first['max_year'], total=int(first['total'] or 0))
+    films = [{key: row[key] for key in ('film_id', 'title', 'description', 'release_year')}
+             for row in rows if row['film_id'] is not None]
+    films = _in_format(films, _is_compact(row_format))
+    if len(films) > page_size:
+        films = films[:page_size]
+        result["next_cursor"] = (films[-1]['title'], films[-1]['film_id'])
+    result["rows"] = films
+
+    # границы одного жанра без дополнительных фильтров — это и есть его диапазон годов
+    if len(category_ids) == 1 and not (keyword or ratings) and min_length is None and max_length is None \
+            and first['min_year'] is not None:
+        _get_reference_cache().set(("year_range", category_ids[0]), (first['min_year'], first['max_year']))
+    return result
@@ -0,0 +1,275 @@
+# Модуль пула соединений с MySQL: повторное использование соединений вместо нового подключения на каждый запрос
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import settings
+from lazy_import import lazy_import
+from metrics import timer, observe
+from resilience import guarded_call, get_breaker
+
+pymysql = lazy_import("pymysql")  # драйвер загружается при открытии первого соединения
+
+# Коды ошибок клиента MySQL, при которых имеет смысл повторить подключение:
+# сервер недоступен (2003), соединение потеряно (2006, 2013, 2055)
+TRANSIENT_ERROR_CODES = (2003, 2006, 2013, 2055)
+
+
+def is_transient_error(e: Exception) -> bool:
+    """Проверяет, что ошибка MySQL временная (сеть, перезапуск сервера) и подключение можно повторить."""
+    return isinstance(e, pymysql.err.OperationalError) and bool(e.args) and e.args[0] in TRANSIENT_ERROR_CODES
+
+
+def is_connection_failure(e: Exception) -> bool:
+    """Проверяет, что ошибка означает недоступность MySQL (в том числе отказ в доступе), а не ошибку запроса."""
+    return isinstance(e, (pymysql.err.OperationalError, OSError))
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведённое время."""
+
+
+class MySQLConnectionPool:
+    """
+    Ограниченный потокобезопасный пул соединений pymysql.
+
+    Соединения создаются по требованию, но не больше max_size одновременно.
+    Перед выдачей соединение, простоявшее без дела дольше max_idle,
+    закрывается, а простоявшее дольше health_check_interval — проверяется
+    через ping(reconnect=True), так что «протухшее» соединение
+    переподключается прозрачно для вызывающего кода.
+
+    Открытие соединения идёт через автоматический выключатель (resilience.py):
+    временные ошибки повторяются с задержкой, а после серии отказов пул сразу
+    отвечает CircuitOpenError, не дожидаясь таймаута подключения.
+    """
+
+    def __init__(self, connect_kwargs: dict, max_size: int = 5, max_idle: float = 300.0,
+                 health_check_interval: float = 30.0, acquire_timeout: float = 10.0,
+                 connect_func=None, breaker=None):
+        """
+        :param connect_kwargs: Параметры для pymysql.connect.
+        :param max_size: Максимальное число соединений в пуле.
+        :param max_idle: Через сколько секунд простоя соединение закрывается.
+        :param health_check_interval: Через сколько секунд простоя соединение проверяется ping.
+        :param acquire_timeout: Сколько секунд ждать свободного соединения.
+        :param connect_func: Функция открытия соединения (по умолчанию pymysql.connect);
+                             позволяет подставить совместимую замену, например в бенчмарках.
+        :param breaker: Автоматический выключатель (CircuitBreaker) или None.
+        """
+        self._connect_kwargs = dict(connect_kwargs)
+        self._connect_kwargs.setdefault('cursorclass', pymysql.cursors.DictCursor)
+        self._connect_func = connect_func or pymysql.connect
+        self._breaker = breaker
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = deque()  # элементы: (connection, время возврата в пул)
+        self._size = 0        # сколько соединений сейчас открыто (выданных и свободных)
+        self._cond = threading.Condition()
+
+        self.checkouts = 0    # сколько раз соединение выдавалось из пула
+        self.waits = 0        # сколько раз приходилось ждать освобождения соединения
+        self.handshakes = 0   # сколько раз открывалось новое соединение (или переподключалось)
+
+    def _open(self):
+        """Открывает новое физическое соединение (с повтором временных ошибок)."""
+        with timer("mysql.connect"):
+            connection = guarded_call(self._breaker, lambda: self._connect_func(**self._connect_kwargs),
+                                      is_failure=is_connection_failure, retry_if=is_transient_error)
+        with self._cond:
+            self.handshakes += 1
+        return connection
+
+    def _is_usable(self, connection, idle_for: float) -> bool:
+        """Проверяет соединение, долго пролежавшее в пуле. Переподключение считается рукопожатием."""
+        if idle_for > self.max_idle:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            thread_id = connection.thread_id()
+            connection.ping(reconnect=True)
+            if connection.thread_id() != thread_id:
+                with self._cond:
+                    self.handshakes += 1
+            return True
+        except pymysql.MySQLError:
+            return False
+
+    @staticmethod
+    def _close_quietly(connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: float = None):
+        """
+        Выдаёт соединение из пула, при необходимости открывая новое.
+
+        :param timeout: Сколько секунд ждать свободного соединения (по умолчанию acquire_timeout).
+        :return: Объект соединения pymysql.
+        :raises PoolTimeoutError: если соединение не освободилось за timeout.
+        :raises CircuitOpenError: если выключатель открыт после серии отказов MySQL.
+        :raises pymysql.MySQLError: если не удалось открыть новое соединение.
+        """
+        if self._breaker is not None:
+            self._breaker.check()
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Нет свободных соединений MySQL ({self.max_size}) за {timeout} с"
+                        )
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                else:
+                    connection, released_at = None, None
+                    self._size += 1  # резервируем место до открытия соединения
+
+            if connection is None:
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                break
+
+            if self._is_usable(connection, time.monotonic() - released_at):
+                break
+            self._discard(connection)
+
+        with self._cond:
+            self.checkouts += 1
+        observe("mysql.acquire", time.perf_counter() - started)
+        return connection
+
+    def release(self, connection, broken: bool = False) -> None:
+        """
+        Возвращает соединение в пул.
+
+        :param connection: Соединение, полученное через acquire().
+        :param broken: True, если соединение могло прийти в негодность (ошибка запроса) —
+                       тогда оно закрывается, а не возвращается в пул.
+        """
+        if broken or not connection.open:
+            if not connection.open and self._breaker is not None:
+                self._breaker.record_failure()  # соединение оборвалось во время запроса
+            self._discard(connection)
+            return
+        try:
+            connection.rollback()  # сбрасываем незавершённую транзакцию, чтобы не видеть старый снимок данных
+        except pymysql.MySQLError:
+            self._discard(connection)
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, connection) -> None:
+        self._close_quietly(connection)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Контекстный менеджер: выдаёт соединение и возвращает его в пул по выходу.
+
+        При исключении pymysql.MySQLError соединение считается испорченным и закрывается.
+        """
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except pymysql.MySQLError:
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken=broken)
+
+    def close(self) -> None:
+        """Закрывает все свободные соединения пула."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self) -> dict:
+        """
+        Возвращает метрики пула.
+
+        :return: Словарь с полями size, idle, max_size, checkouts, waits, handshakes.
+        """
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "handshakes": self.handshakes,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> MySQLConnectionPool:
+    """
+    Возвращает общий для процесса пул соединений, создавая его при первом обращении.
+
+    Размер пула и таймауты берутся из MYSQL_POOL_SETTINGS.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MySQLConnectionPool(settings.MYSQL_SETTINGS, breaker=get_breaker("mysql"),
+                                            **settings.MYSQL_POOL_SETTINGS)
+    return _pool
+
+
+def set_pool(pool: MySQLConnectionPool) -> None:
+    """
+    Подменяет общий пул (например, пулом соединений с локальной заменой MySQL в бенчмарках).
+    Прежний пул закрывается.
+    """
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None:
+        old.close()
+
+
+def close_pool() -> None:
+    """Закрывает общий пул (например, при выходе из приложения)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
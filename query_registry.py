@@ -0,0 +1,167 @@
+# Реестр SQL-запросов приложения: каждый запрос MySQL зарегистрирован под именем,
+# а столбцы результата — под псевдонимами (AS min_year), так что код обращается к строкам
+# по стабильным ключам, а не по тексту выражения (result['MIN(f.release_year)']).
+#
+# Текст запроса приводится к одной строке один раз при регистрации: отступы и переводы строк
+# многострочных литералов не отправляются серверу при каждом вызове. Запросы, собираемые
+# из частей (страницы с курсором, поиск по нескольким жанрам), кэшируются по «форме» —
+# набору частей, от которого зависит текст, — и собираются только при первом вызове такой формы.
+#
+# pymysql не поддерживает серверные подготовленные выражения (COM_STMT_PREPARE):
+# параметры всегда подставляются в текст на стороне клиента. Подготовка через SQL
+# (PREPARE / SET @p / EXECUTE) потребовала бы лишних обращений к серверу на каждый вызов,
+# поэтому реестр кэширует только готовый текст запросов.
+#
+# Для каждого имени запроса в общем реестре метрик (metrics.py) учитываются число выполнений
+# и суммарное время (этап sql.<имя>), число возвращённых строк и ошибок (счётчики sql.<имя>.rows
+# и sql.<имя>.errors). query_stats() сортирует запросы по суммарному времени —
+# так видно, какие запросы стоит оптимизировать в первую очередь.
+
+import threading
+import time
+
+from metrics import REGISTRY, observe, inc
+
+STAGE_PREFIX = "sql."
+MAX_VARIANTS = 256  # сколько собранных вариантов составных запросов хранится в реестре
+
+
+def compact_sql(sql: str) -> str:
+    """
+    Приводит текст запроса к одной строке, заменяя последовательности пробельных символов одним пробелом.
+
+    Строковые литералы запросов приложения не содержат значимых повторяющихся пробелов.
+    """
+    return " ".join(sql.split())
+
+
+class Query:
+    """Зарегистрированный запрос: имя для статистики и готовый текст."""
+
+    __slots__ = ("name", "sql", "stage")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = compact_sql(sql)
+        self.stage = STAGE_PREFIX + name
+
+    def record(self, seconds: float, rows: int = None, error: bool = False) -> None:
+        """
+        Учитывает одно выполнение запроса.
+
+        :param seconds: Длительность выполнения.
+        :param rows: Число возвращённых строк (None — не учитывать).
+        :param error: Выполнение завершилось ошибкой.
+        """
+        observe(self.stage, seconds)
+        if rows:
+            inc(self.stage + ".rows", rows)
+        if error:
+            inc(self.stage + ".errors")
+
+    def run(self, cursor, params=(), one: bool = False):
+        """
+        Выполняет запрос на курсоре и читает результат, учитывая время и число строк.
+
+        :param cursor: Курсор pymysql.
+        :param params: Параметры запроса.
+        :param one: Вернуть одну строку (fetchone) вместо списка.
+        :return: Строка или список строк.
+        :raises pymysql.MySQLError: ошибка выполнения (учитывается в счётчике ошибок).
+        """
+        started = time.perf_counter()
+        try:
+            cursor.execute(self.sql, params)
+            result = cursor.fetchone() if one else cursor.fetchall()
+        except Exception:
+            self.record(time.perf_counter() - started, error=True)
+            raise
+        self.record(time.perf_counter() - started, (1 if result else 0) if one else len(result))
+        return result
+
+    def __repr__(self):
+        return f"Query({self.name!r})"
+
+
+class QueryRegistry:
+    """Потокобезопасный реестр именованных запросов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._variants = {}
+
+    def register(self, name: str, sql: str) -> Query:
+        """
+        Регистрирует запрос под именем.
+
+        :raises ValueError: если под этим именем уже зарегистрирован другой текст.
+        """
+        query = Query(name, sql)
+        with self._lock:
+            existing = self._queries.setdefault(name, query)
+        if existing.sql != query.sql:
+            raise ValueError(f"запрос {name} уже зарегистрирован с другим текстом")
+        return existing
+
+    def get(self, name: str) -> Query:
+        """
+        Возвращает зарегистрированный запрос.
+
+        :raises KeyError: если запроса с таким именем нет.
+        """
+        return self._queries[name]
+
+    def variant(self, name: str, shape: tuple, build) -> Query:
+        """
+        Возвращает составной запрос данной формы, собирая его текст только при первом обращении.
+
+        Все формы учитываются в статистике под одним именем name.
+
+        :param name: Имя запроса.
+        :param shape: Кортеж, однозначно определяющий текст (например, наличие курсора, число жанров).
+        :param build: Функция без аргументов, возвращающая текст запроса.
+        """
+        key = (name, shape)
+        query = self._variants.get(key)
+        if query is None:
+            query = Query(name, build())
+            with self._lock:
+                if len(self._variants) >= MAX_VARIANTS:
+                    self._variants.clear()  # формы ограничены параметрами поиска, переполнение маловероятно
+                query = self._variants.setdefault(key, query)
+        return query
+
+    def names(self) -> list:
+        """Имена зарегистрированных запросов (без составных)."""
+        return sorted(self._queries)
+
+    def stats(self) -> list:
+        """
+        Статистика выполнения запросов, от наибольшего суммарного времени к наименьшему.
+
+        :return: Список словарей: name, calls, total_ms, avg_ms, p95_ms, rows, errors.
+        """
+        snapshot = REGISTRY.snapshot()
+        counters = snapshot["counters"]
+        result = []
+        for stage, item in snapshot["stages"].items():
+            if not stage.startswith(STAGE_PREFIX):
+                continue
+            result.append({
+                "name": stage[len(STAGE_PREFIX):],
+                "calls": item["count"],
+                "total_ms": round(item["sum"] * 1000, 3),
+                "avg_ms": round(item["sum"] / item["count"] * 1000, 3) if item["count"] else 0.0,
+                "p95_ms": round(item["p95"] * 1000, 3),
+                "rows": counters.get(stage + ".rows", 0),
+                "errors": counters.get(stage + ".errors", 0),
+            })
+        result.sort(key=lambda item: item["total_ms"], reverse=True)
+        return result
+
+
+# Общий реестр запросов приложения
+QUERIES = QueryRegistry()
+register_query = QUERIES.register
+query_stats = QUERIES.stats
@@ -0,0 +1,283 @@
+# Воспроизведение журнала поисковых запросов для нагрузочного тестирования.
+#
+# Запросы читаются из журнала MongoDB или из файлов архива (см. log_retention.py) и выполняются
+# заново через search_by_keyword / search_by_genre_and_years (запросы по нескольким жанрам —
+# через search_by_genres) в порядке и с интервалами, с которыми они поступали от пользователей.
+# Так изменения пула соединений, кэшей или индексов проверяются на нагрузке реальной формы,
+# а не на синтетической смеси запросов.
+#
+# --speed ускоряет воспроизведение (2 — вдвое быстрее, 0 — без пауз, с максимальной скоростью),
+# --concurrency ограничивает число одновременно выполняемых запросов. Если система не успевает,
+# запросы начинают выполняться позже расписания — это видно по задержке относительно расписания (lag).
+# Число найденных фильмов сравнивается с results_count из журнала; расхождения попадают в отчёт.
+# Воспроизведённые запросы в журнал не записываются.
+#
+# Запуск:
+#   python main.py replay --since 2024-05-01 --until 2024-05-02 --speed 10 --concurrency 16
+#   python main.py replay log_archive/<коллекция>/2024/2024-05-*.gz --speed 0 --report replay.json
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+
+import mysql_connector
+import settings
+from lazy_import import lazy_import
+from logger import log_error
+from metrics import Histogram
+
+pymongo = lazy_import("pymongo")
+
+MAX_SAMPLES = 100000  # наблюдений на гистограмму задержек: перцентили считаются по последним MAX_SAMPLES запросам
+MISMATCH_EXAMPLES = 20
+
+
+def _parse_day(text: str) -> datetime:
+    """Разбирает дату или дату со временем ISO 8601 (без часового пояса — UTC)."""
+    value = datetime.fromisoformat(text)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _in_range(entry: dict, since: datetime, until: datetime) -> bool:
+    timestamp = entry.get("timestamp")
+    if not isinstance(timestamp, datetime):
+        return since is None and until is None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (since is None or timestamp >= since) and (until is None or timestamp < until)
+
+
+def read_mongo_log(since: datetime = None, until: datetime = None, limit: int = None):
+    """
+    Читает записи журнала запросов из MongoDB в порядке времени.
+
+    :param since: Начало периода (включительно) или None.
+    :param until: Конец периода (не включительно) или None.
+    :param limit: Максимальное число записей или None.
+    :return: Генератор записей журнала.
+    """
+    from mongodb_connector import get_mongo_client
+
+    collection = get_mongo_client()[settings.MONGODB_SETTINGS['db']][settings.MONGODB_SETTINGS['collection']]
+    query = {}
+    if since is not None or until is not None:
+        query["timestamp"] = {key: value for key, value in (("$gte", since), ("$lt", until)) if value is not None}
+    cursor = collection.find(query, {"search_type": 1, "params": 1, "results_count": 1, "timestamp": 1})
+    cursor = cursor.sort([("timestamp", 1), ("_id", 1)]).batch_size(1000)
+    if limit:
+        cursor = cursor.limit(limit)
+    yield from cursor
+
+
+def read_archives(paths: list, since: datetime = None, until: datetime = None, limit: int = None):
+    """
+    Читает записи журнала из файлов архива (в порядке файлов, внутри файла — в порядке записи).
+
+    :param paths: Пути к файлам архива; упорядочиваются по имени, т.е. по дате.
+    :return: Генератор записей журнала.
+    """
+    from log_retention import read_archive
+
+    count = 0
+    for path in sorted(paths):
+        for entry in read_archive(path):
+            if not _in_range(entry, since, until):
+                continue
+            if limit and count >= limit:
+                return
+            count += 1
+            yield entry
+
+
+def replay_call(entry: dict, mode: str = None):
+    """
+    Возвращает функцию, повторяющую поиск из записи журнала, или None, если запись не воспроизводима.
+
+    Функция возвращает число найденных фильмов. Поиск выполняется с strict=True: ошибка базы данных
+    выбрасывается как исключение и учитывается в отчёте как ошибка, а не как расхождение с пустым результатом.
+    """
+    params = entry.get("params") or {}
+    search_type = entry.get("search_type")
+    if search_type == "keyword" and params.get("keyword"):
+        return lambda: len(mysql_connector.search_by_keyword(params["keyword"], mode=mode, strict=True))
+    if search_type != "genre_year" or params.get("genre_id") is None:
+        return None
+    genre_id, year_from, year_to = params["genre_id"], params.get("year_from"), params.get("year_to")
+    if isinstance(genre_id, list) or year_from is None or year_to is None:
+        # запросы HTTP-сервиса по нескольким жанрам или без границ годов
+        return lambda: mysql_connector.search_by_genres(genre_id, year_from, year_to, page_size=1, strict=True)["total"]
+    return lambda: len(mysql_connector.search_by_genre_and_years(genre_id, year_from, year_to, strict=True))
+
+
+class ReplayReport:
+    """Результаты воспроизведения: число запросов, задержки по типам поиска и расхождения."""
+
+    def __init__(self):
+        self.total = 0
+        self.replayed = 0
+        self.skipped = 0
+        self.checked = 0
+        self.mismatches = 0
+        self.errors = 0
+        self.examples = []
+        self.latency = {}
+        self.lag = Histogram(MAX_SAMPLES)
+        self.seconds = 0.0
+
+    def add(self, result: dict) -> None:
+        self.replayed += 1
+        self.lag.observe(result["lag"])
+        if result.get("error"):
+            self.errors += 1
+            if len(self.examples) < MISMATCH_EXAMPLES:
+                self.examples.append(result)
+            return
+        self.latency.setdefault(result["search_type"], Histogram(MAX_SAMPLES)).observe(result["latency"])
+        if result["expected"] is None:
+            return
+        self.checked += 1
+        if result["actual"] != result["expected"]:
+            self.mismatches += 1
+            if len(self.examples) < MISMATCH_EXAMPLES:
+                self.examples.append(result)
+
+    def to_dict(self) -> dict:
+        def distribution(histogram: Histogram) -> dict:
+            p50, p95, p99, p100 = histogram.percentiles(0.5, 0.95, 0.99, 1.0)
+            return {"count": histogram.count, "avg_ms": round(histogram.total / histogram.count * 1000, 3)
+                    if histogram.count else 0.0, "p50_ms": round(p50 * 1000, 3), "p95_ms": round(p95 * 1000, 3),
+                    "p99_ms": round(p99 * 1000, 3), "max_ms": round(p100 * 1000, 3)}
+
+        return {
+            "total": self.total, "replayed": self.replayed, "skipped": self.skipped,
+            "checked": self.checked, "mismatches": self.mismatches, "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "queries_per_second": round(self.replayed / self.seconds, 1) if self.seconds else 0.0,
+            "latency": {name: distribution(histogram) for name, histogram in sorted(self.latency.items())},
+            "schedule_lag": distribution(self.lag),
+            "examples": self.examples,
+        }
+
+
+def run_replay(entries, speed: float = 1.0, concurrency: int = None, mode: str = None) -> ReplayReport:
+    """
+    Воспроизводит записи журнала с исходными интервалами, делёнными на speed.
+
+    Одновременно выполняется не больше concurrency запросов; записи читаются потоково,
+    поэтому журнал любого размера не загружается в память целиком.
+
+    :param entries: Итерируемый объект записей журнала в порядке времени.
+    :param speed: Множитель скорости (0 — без пауз между запросами).
+    :param concurrency: Число потоков (по умолчанию BATCH_SETTINGS['workers']).
+    :param mode: Режим поиска по ключевому слову (по умолчанию KEYWORD_SEARCH_MODE).
+    :return: ReplayReport.
+    """
+    concurrency = concurrency or settings.BATCH_SETTINGS['workers']
+    report = ReplayReport()
+    started = time.perf_counter()
+    first_timestamp = None
+    offset = 0.0
+
+    def execute(entry, call, due):
+        call_started = time.perf_counter()
+        result = {"search_type": entry.get("search_type"), "params": entry.get("params"),
+                  "timestamp": entry.get("timestamp"), "expected": entry.get("results_count"),
+                  "lag": max(0.0, call_started - due)}
+        try:
+            result["actual"] = call()
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency"] = time.perf_counter() - call_started
+        return result
+
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as executor:
+        for entry in entries:
+            report.total += 1
+            call = replay_call(entry, mode)
+            if call is None:
+                report.skipped += 1
+                continue
+            timestamp = entry.get("timestamp")
+            if speed and isinstance(timestamp, datetime):
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                offset = max(offset, (timestamp - first_timestamp).total_seconds() / speed)
+            due = started + offset if speed else 0.0
+            # ожидание момента отправки совмещено со сбором завершившихся запросов;
+            # при concurrency запросов в работе новые ждут, как в очереди к перегруженному сервису
+            while in_flight and (len(in_flight) >= concurrency or time.perf_counter() < due):
+                timeout = None if len(in_flight) >= concurrency else max(0.0, due - time.perf_counter())
+                done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report.add(future.result())
+            if time.perf_counter() < due:
+                time.sleep(due - time.perf_counter())
+            if not speed:
+                due = time.perf_counter()  # без расписания lag — ожидание свободного потока
+            in_flight.add(executor.submit(execute, entry, call, due))
+        for future in wait(in_flight).done:
+            report.add(future.result())
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"Записей: {report['total']}, воспроизведено: {report['replayed']}, пропущено: {report['skipped']}, "
+          f"{report['seconds']} с, {report['queries_per_second']} запросов/с")
+    print(f"Проверено results_count: {report['checked']}, расхождений: {report['mismatches']}, "
+          f"ошибок: {report['errors']}")
+    for name, item in list(report["latency"].items()) + [("lag", report["schedule_lag"])]:
+        print(f"  {name:<11} avg {item['avg_ms']:.2f} мс, p50 {item['p50_ms']:.2f} мс, p95 {item['p95_ms']:.2f} мс, "
+              f"p99 {item['p99_ms']:.2f} мс, max {item['max_ms']:.2f} мс")
+    for example in report["examples"]:
+        outcome = f"ошибка: {example['error']}" if example.get("error") else \
+            f"в журнале {example['expected']}, сейчас {example['actual']}"
+        print(f"  {example['search_type']} {json.dumps(example['params'], ensure_ascii=False, default=str)}: "
+              f"{outcome}")
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа: python main.py replay ... или python replay.py ...
+
+    :return: Код завершения: 0 — расхождений нет, 1 — были расхождения или ошибки, 2 — журнал недоступен.
+    """
+    parser = argparse.ArgumentParser(prog="main.py replay", description="Воспроизведение журнала поисковых запросов")
+    parser.add_argument("archives", nargs="*", help="файлы архива журнала (не указаны — журнал MongoDB)")
+    parser.add_argument("--since", type=_parse_day, help="начало периода, например 2024-05-01 (UTC)")
+    parser.add_argument("--until", type=_parse_day, help="конец периода (не включительно)")
+    parser.add_argument("--limit", type=int, help="максимальное число записей")
+    parser.add_argument("--speed", type=float, default=1.0, help="множитель скорости (0 — без пауз)")
+    parser.add_argument("-c", "--concurrency", type=int, default=settings.BATCH_SETTINGS['workers'],
+                        help="число одновременно выполняемых запросов")
+    parser.add_argument("--mode", choices=["like", "fulltext", "trigram"],
+                        help="режим поиска по ключевому слову (по умолчанию KEYWORD_SEARCH_MODE)")
+    parser.add_argument("--report", help="файл для отчёта в JSON")
+    args = parser.parse_args(argv)
+
+    if args.archives:
+        entries = read_archives(args.archives, args.since, args.until, args.limit)
+    else:
+        entries = read_mongo_log(args.since, args.until, args.limit)
+    try:
+        report = run_replay(entries, args.speed, args.concurrency, args.mode).to_dict()
+    except (pymongo.errors.PyMongoError, OSError, ValueError) as e:
+        msg = f"Ошибка чтения журнала запросов для воспроизведения: {e}"
+        print(msg, file=sys.stderr)
+        log_error(msg, exc=e)
+        return 2
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2, default=str)
+        print(f"Отчёт сохранён в {args.report}")
+    return 1 if report["mismatches"] or report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# Общий слой устойчивости подключений к MySQL и MongoDB:
+#   - повтор временных ошибок с экспоненциальной задержкой и случайным разбросом (jitter);
+#   - автоматический выключатель (circuit breaker): после серии отказов обращения к базе
+#     сразу завершаются ошибкой CircuitOpenError в течение reset_timeout секунд,
+#     а не ждут таймаута драйвера при каждом запросе.
+# Состояние выключателей видно в метриках: breaker_<имя>_state (0 — закрыт, 1 — открыт, 2 — пробный запрос).
+
+import random
+import threading
+import time
+
+import settings
+from metrics import register_gauge, inc
+
+
+class CircuitOpenError(Exception):
+    """Обращение отклонено: выключатель открыт после серии отказов базы данных."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} временно недоступна, повторная попытка через {retry_in:.0f} с")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель.
+
+    - closed: обращения выполняются; после failure_threshold отказов подряд выключатель открывается;
+    - open: обращения сразу отклоняются, пока не пройдёт reset_timeout секунд;
+    - half_open: пропускается один пробный вызов; успех закрывает выключатель, отказ — снова открывает.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _STATE_CODES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        :param name: Имя защищаемой системы (для сообщений и метрик).
+        :param failure_threshold: Сколько отказов подряд открывают выключатель.
+        :param reset_timeout: Сколько секунд выключатель остаётся открытым.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0          # отказов подряд
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened = 0             # сколько раз выключатель открывался
+        self.rejected = 0           # сколько обращений отклонено
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def retry_in(self) -> float:
+        """Сколько секунд осталось до пробного обращения (0, если выключатель не открыт)."""
+        with self._lock:
+            return self._retry_in() if self._state == self.OPEN else 0.0
+
+    def check(self) -> None:
+        """
+        Проверяет, не открыт ли выключатель, не занимая пробный вызов.
+
+        :raises CircuitOpenError: если выключатель открыт и время ожидания не истекло.
+        """
+        with self._lock:
+            if self._state == self.OPEN and self._retry_in() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self._retry_in())
+
+    def allow(self) -> bool:
+        """Решает, можно ли выполнить обращение сейчас (в состоянии half_open — только одно)."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._retry_in() <= 0:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED
+                                                 and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние выключателя для метрик.
+
+        :return: Словарь с полями state (0/1/2), failures, opened, rejected.
+        """
+        with self._lock:
+            return {"state": self._STATE_CODES[self._state], "failures": self._failures,
+                    "opened": self.opened, "rejected": self.rejected}
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Задержка перед повтором номер attempt (с 0): случайное значение от 0 до base_delay * 2**attempt,
+    но не больше max_delay («full jitter» — повторы разных клиентов не совпадают по времени).
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def guarded_call(breaker, func, is_failure, retry_if=None, retries: int = None):
+    """
+    Выполняет func() через выключатель с ограниченным числом повторов временных ошибок.
+
+    :param breaker: CircuitBreaker или None (тогда выполняются только повторы).
+    :param func: Функция без аргументов.
+    :param is_failure: Предикат исключения: считать ли его отказом базы (для выключателя).
+    :param retry_if: Предикат исключения: имеет ли смысл повторить вызов (по умолчанию — не повторять).
+    :param retries: Сколько раз повторять (по умолчанию RESILIENCE_SETTINGS['retries']).
+    :return: Результат func().
+    :raises CircuitOpenError: если выключатель открыт.
+    """
+    config = settings.RESILIENCE_SETTINGS
+    retries = config['retries'] if retries is None else retries
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(breaker.name, breaker.retry_in())
+
+    attempt = 0
+    while True:
+        try:
+            result = func()
+        except Exception as e:
+            if retry_if is not None and retry_if(e) and attempt < retries:
+                inc(f"retries.{breaker.name if breaker is not None else 'call'}")
+                time.sleep(backoff_delay(attempt, config['backoff_base'], config['backoff_max']))
+                attempt += 1
+                continue
+            if breaker is not None:
+                if is_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()  # ошибка запроса, а не недоступность базы
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Возвращает общий для процесса выключатель с именем name ('mysql', 'mongo'),
+    создавая его с параметрами из RESILIENCE_SETTINGS и регистрируя в метриках.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                config = settings.RESILIENCE_SETTINGS
+                breaker = CircuitBreaker(name, config['breaker_failure_threshold'], config['breaker_reset_timeout'])
+                _breakers[name] = breaker
+                register_gauge(f"breaker_{name}", breaker.stats)
+    return breaker
@@ -0,0 +1,224 @@
+# Модуль кэша результатов поисковых запросов: ограничение по объёму в байтах, TTL и общее хранилище на диске
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from film_row import row_to_json
+
+_MISSING = object()
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=row_to_json).encode('utf-8')
+
+
+class SQLiteResultStore:
+    """
+    Общее для нескольких процессов хранилище результатов в файле SQLite.
+
+    Несколько экземпляров приложения, указывающих на один файл, видят
+    результаты друг друга. Объём хранилища ограничен max_bytes: при превышении
+    удаляются записи, к которым дольше всего не обращались.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        :param path: Путь к файлу базы SQLite (создаётся при необходимости).
+        :param max_bytes: Максимальный суммарный объём сохранённых значений в байтах.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # соединение SQLite нельзя делить между потоками, поэтому у каждого потока своё
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def get(self, key: str):
+        """Возвращает закодированное значение или None, если записи нет или она устарела."""
+        now = time.time()
+        with self._connection() as db:
+            row = db.execute('SELECT value, expires_at FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                db.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+            db.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+            return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Сохраняет закодированное значение и вытесняет старые записи сверх max_bytes."""
+        now = time.time()
+        with self._connection() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO results (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now + ttl, now),
+            )
+            db.execute('DELETE FROM results WHERE expires_at <= ?', (now,))
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in db.execute('SELECT key, size FROM results ORDER BY accessed_at').fetchall():
+                    db.execute('DELETE FROM results WHERE key = ?', (old_key,))
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+
+    def clear(self) -> None:
+        """Удаляет все записи хранилища."""
+        with self._connection() as db:
+            db.execute('DELETE FROM results')
+
+
+class ResultCache:
+    """
+    Двухуровневый кэш результатов поиска.
+
+    Первый уровень — в памяти процесса (LRU с ограничением по суммарному объёму
+    значений в байтах и TTL), второй — необязательное общее хранилище SQLiteResultStore.
+    Значения должны сериализоваться в JSON (списки и словари из строк и чисел, строки FilmRow);
+    строки FilmRow из общего хранилища возвращаются словарями.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = 300.0,
+                 max_entry_bytes: int = 1024 * 1024, shared_store: SQLiteResultStore = None):
+        """
+        :param max_bytes: Максимальный объём кэша в памяти (в байтах сериализованных значений).
+        :param ttl: Время жизни записи в секундах.
+        :param max_entry_bytes: Значения крупнее этого размера не кэшируются.
+        :param shared_store: Общее хранилище второго уровня или None.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.shared_store = shared_store
+        self._data = OrderedDict()  # ключ -> (значение, размер, момент устаревания)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Строит строковый ключ из нормализованных параметров запроса."""
+        return json.dumps(parts, ensure_ascii=False, default=str)
+
+    def _get_local(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        value, size, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self._bytes -= size
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value, size: int) -> None:
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._data[key] = (value, size, time.monotonic() + self.ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._data:
+            _, (_, old_size, _) = self._data.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+
+    def get_or_load(self, key: str, loader):
+        """
+        Возвращает результат из кэша, а при промахе вызывает loader() и сохраняет результат.
+
+        Результат None (ошибка запроса) не кэшируется.
+
+        :param key: Ключ, построенный через make_key().
+        :param loader: Функция без аргументов, выполняющая запрос.
+        """
+        with self._lock:
+            value = self._get_local(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+
+        if self.shared_store is not None:
+            try:
+                encoded = self.shared_store.get(key)
+            except sqlite3.Error:
+                encoded = None
+            if encoded is not None:
+                value = json.loads(encoded)
+                with self._lock:
+                    self.shared_hits += 1
+                    self._set_local(key, value, len(encoded))
+                return value
+
+        with self._lock:
+            self.misses += 1
+        value = loader()
+        if value is None:
+            return value
+
+        encoded = _encode(value)
+        if len(encoded) > self.max_entry_bytes:
+            return value
+        with self._lock:
+            self._set_local(key, value, len(encoded))
+        if self.shared_store is not None:
+            try:
+                self.shared_store.set(key, encoded, self.ttl)
+            except sqlite3.Error:
+                pass  # общее хранилище — лишь ускорение, его сбой не должен ломать поиск
+        return value
+
+    def invalidate(self) -> None:
+        """Очищает кэш в памяти и общее хранилище."""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+        if self.shared_store is not None:
+            self.shared_store.clear()
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        :return: Словарь с полями entries, bytes, max_bytes, hits, shared_hits, misses, evictions, hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
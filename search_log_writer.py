@@ -0,0 +1,166 @@
+# Модуль фоновой пакетной записи журнала поисковых запросов в MongoDB
+
+import queue
+import threading
+import time
+
+from logger import log_error # Функция логирования ошибок в файл
+from metrics import timer
+from resilience import CircuitOpenError
+
+
+class SearchLogWriter:
+    """
+    Фоновый писатель журнала поисковых запросов.
+
+    Записи складываются в ограниченную очередь в памяти и сбрасываются
+    в MongoDB одним insert_many — когда набирается batch_size записей
+    или проходит flush_interval секунд. Поиск никогда не ждёт MongoDB:
+    если очередь переполнена (MongoDB медленная или недоступна),
+    новая запись отбрасывается и учитывается в счётчике dropped.
+    Пока автоматический выключатель MongoDB открыт, пакеты не отправляются
+    и сразу учитываются в счётчике failed, без записи в журнал ошибок.
+    """
+
+    def __init__(self, get_collection, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_queue: int = 10000, on_written=None, call=None):
+        """
+        :param get_collection: Функция без аргументов, возвращающая коллекцию MongoDB.
+        :param batch_size: Максимальный размер пакета для insert_many.
+        :param flush_interval: Максимальное время (в секундах) хранения записи в очереди.
+        :param max_queue: Максимальное число записей, ожидающих отправки.
+        :param on_written: Необязательная функция, вызываемая с каждым успешно записанным пакетом
+                           (например, для обновления сводной статистики).
+        :param call: Необязательная обёртка обращения к MongoDB: получает функцию без аргументов
+                     и выполняет её (например, через автоматический выключатель, см. mongo_call).
+        """
+        self._get_collection = get_collection
+        self._call = call or (lambda func: func())
+        self._on_written = on_written
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._thread = None
+        self._pending = 0  # принятые, но ещё не обработанные записи
+
+        self.written = 0  # сколько записей успешно записано
+        self.dropped = 0  # сколько записей отброшено из-за переполнения очереди
+        self.failed = 0   # сколько записей потеряно из-за ошибок записи
+        self.batches = 0  # сколько вызовов insert_many выполнено
+
+    def start(self) -> None:
+        """Запускает фоновый поток, если он ещё не запущен."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="search-log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, entry: dict) -> bool:
+        """
+        Ставит запись в очередь на отправку. Никогда не блокирует вызывающий код.
+
+        :param entry: Документ журнала.
+        :return: True, если запись принята, False — если очередь переполнена.
+        """
+        self.start()
+        with self._lock:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending += 1
+        return True
+
+    def _run(self) -> None:
+        batch = []
+        deadline = None
+        while True:
+            timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                entry = self._queue.get(timeout=timeout)
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(entry)
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            expired = deadline is not None and time.monotonic() >= deadline
+            if batch and (len(batch) >= self.batch_size or expired or stopping):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+            if stopping and self._queue.empty() and not batch:
+                break
+
+    def _write(self, batch: list) -> None:
+        try:
+            with timer("mongo.log_write"):
+                self._call(lambda: self._get_collection().insert_many(batch, ordered=False))
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        except CircuitOpenError:
+            with self._lock:
+                self.failed += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            log_error(f"Ошибка записи журнала запросов в MongoDB ({len(batch)} записей): {e}", exc=e)
+        else:
+            if self._on_written is not None:
+                try:
+                    with timer("mongo.stats_update"):
+                        self._on_written(batch)
+                except Exception as e:
+                    log_error(f"Ошибка обновления статистики запросов: {e}", exc=e)
+        with self._flushed:
+            self._pending -= len(batch)
+            self._flushed.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Ждёт, пока все записи из очереди будут отправлены (не дольше timeout секунд).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._flushed.wait(remaining)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Останавливает фоновый поток, предварительно отправив всё, что осталось в очереди.
+
+        :param timeout: Сколько секунд ждать завершения отправки.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики писателя.
+
+        :return: Словарь с полями queued, written, dropped, failed, batches.
+        """
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
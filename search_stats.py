@@ -0,0 +1,288 @@
+# Модуль предварительно агрегированной статистики поисковых запросов.
+#
+# Вместо агрегации по всему журналу при каждом открытии статистики счётчики
+# обновляются при записи журнала ($inc с upsert) в двух сводных коллекциях:
+#   <collection>_stats        — общий счётчик по каждому ключевому слову и жанру;
+#   <collection>_stats_hourly — счётчики по часам для статистики за период.
+#
+# Счётчики отражают весь журнал только после пересчёта (rebuild): журнал, записанный до появления
+# статистики, в них не попал. Пересчёт оставляет в коллекции <collection>_stats документ-отметку
+# (_id 'meta:built'); пока её нет, топ запросов строится агрегацией по журналу (см. stats_built).
+#
+# Запуск из командной строки:
+#   python search_stats.py rebuild                 — пересчитать счётчики по существующему журналу
+#   python search_stats.py top --kind genre --hours 24
+
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import settings
+from lazy_import import lazy_import
+
+pymongo = lazy_import("pymongo")
+
+BUILT_MARKER_ID = "meta:built"
+
+_indexes_ready = False
+
+
+def stats_collection_name() -> str:
+    """Имя коллекции общих счётчиков (<collection>_stats)."""
+    return f"{settings.MONGODB_SETTINGS['collection']}_stats"
+
+
+def hourly_collection_name() -> str:
+    """Имя коллекции почасовых счётчиков (<collection>_stats_hourly)."""
+    return f"{settings.MONGODB_SETTINGS['collection']}_stats_hourly"
+
+
+def _ensure_indexes(db) -> None:
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    db[stats_collection_name()].create_index([("kind", pymongo.ASCENDING), ("count", pymongo.DESCENDING)])
+    db[hourly_collection_name()].create_index([("kind", pymongo.ASCENDING), ("hour", pymongo.ASCENDING)])
+    _indexes_ready = True
+
+
+def hour_key(timestamp) -> str:
+    """
+    Возвращает ключ часа вида 'YYYY-MM-DDTHH' для временной метки записи журнала.
+
+    :param timestamp: datetime или строка в формате ISO.
+    """
+    if isinstance(timestamp, datetime):
+        return timestamp.strftime('%Y-%m-%dT%H')
+    return str(timestamp)[:13]
+
+
+def _as_utc(timestamp):
+    """
+    Приводит временную метку записи журнала к datetime в UTC.
+
+    Строки ISO остались от записей, сделанных до перехода на даты BSON, и без смещения
+    означают местное время (как в migrate_timestamps_to_dates); дата BSON без часового пояса — UTC.
+
+    :return: datetime с часовым поясом UTC или None, если метка не распознана.
+    """
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            return None
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.astimezone()
+    elif isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+    else:
+        return None
+    return timestamp.astimezone(timezone.utc)
+
+
+def _stat_keys(entry: dict) -> list:
+    """
+    Определяет, по каким значениям считается запись журнала.
+
+    Запрос HTTP-сервиса по нескольким жанрам (genre_id — список) учитывается в счётчике каждого жанра.
+
+    :return: Список кортежей (kind, value, label); пустой, если запись не относится к статистике.
+    """
+    params = entry.get("params") or {}
+    if entry.get("search_type") == "keyword":
+        keyword = params.get("keyword")
+        return [("keyword", keyword, keyword)] if keyword is not None else []
+    if entry.get("search_type") == "genre_year":
+        genre_id, genre_name = params.get("genre_id"), params.get("genre_name")
+        if isinstance(genre_id, list):
+            names = genre_name if isinstance(genre_name, list) and len(genre_name) == len(genre_id) \
+                else [None] * len(genre_id)
+            return [("genre", value, label) for value, label in zip(genre_id, names) if value is not None]
+        return [("genre", genre_id, genre_name)] if genre_id is not None else []
+    return []
+
+
+def _count_entries(entries):
+    totals = Counter()
+    hourly = Counter()
+    labels = {}
+    last_seen = {}
+    for entry in entries:
+        # до преобразования журнала (migrate_timestamps_to_dates) в нём встречаются и строки, и даты BSON
+        timestamp = _as_utc(entry.get("timestamp"))
+        hour = hour_key(timestamp if timestamp is not None else entry.get("timestamp"))
+        for kind, value, label in _stat_keys(entry):
+            totals[(kind, value)] += 1
+            hourly[(kind, value, hour)] += 1
+            if label is not None or (kind, value) not in labels:
+                labels[(kind, value)] = label
+            if timestamp is not None:
+                previous = last_seen.get((kind, value))
+                if previous is None or timestamp > previous:
+                    last_seen[(kind, value)] = timestamp
+    return totals, hourly, labels, last_seen
+
+
+def _doc_id(kind, value, hour=None) -> str:
+    return f"{kind}:{value}" if hour is None else f"{kind}:{value}:{hour}"
+
+
+def record_search_stats(db, entries) -> None:
+    """
+    Увеличивает счётчики статистики по пакету записей журнала.
+
+    Одинаковые запросы внутри пакета суммируются, поэтому на пакет приходится
+    не больше одной операции $inc на каждое значение и час.
+
+    :param db: База данных MongoDB.
+    :param entries: Список записей журнала (как в log_search_to_mongo).
+    """
+    totals, hourly, labels, last_seen = _count_entries(entries)
+    if not totals:
+        return
+    _ensure_indexes(db)
+
+    updates = []
+    for (kind, value), count in totals.items():
+        update = {
+            "$inc": {"count": count},
+            "$set": {"kind": kind, "value": value, "label": labels[(kind, value)]},
+        }
+        if (kind, value) in last_seen:
+            update["$max"] = {"last_seen": last_seen[(kind, value)]}
+        updates.append(pymongo.UpdateOne({"_id": _doc_id(kind, value)}, update, upsert=True))
+    db[stats_collection_name()].bulk_write(updates, ordered=False)
+
+    db[hourly_collection_name()].bulk_write([
+        pymongo.UpdateOne(
+            {"_id": _doc_id(kind, value, hour)},
+            {"$inc": {"count": count}, "$set": {"kind": kind, "value": value, "hour": hour,
+                                               "label": labels[(kind, value)]}},
+            upsert=True,
+        )
+        for (kind, value, hour), count in hourly.items()
+    ], ordered=False)
+
+
+def top_queries(db, kind: str = "keyword", limit: int = 5, hours: int = None) -> list:
+    """
+    Возвращает самые частые запросы по сводным счётчикам.
+
+    :param db: База данных MongoDB.
+    :param kind: 'keyword' (ключевые слова) или 'genre' (жанры).
+    :param limit: Количество записей в результате.
+    :param hours: Если указано — учитываются только запросы за последние hours часов.
+    :return: Список словарей с полями value, label, count (по убыванию count).
+    """
+    if hours is None:
+        cursor = (db[stats_collection_name()].find({"kind": kind}, {"_id": 0, "value": 1, "label": 1, "count": 1})
+                  .sort("count", pymongo.DESCENDING)
+                  .limit(limit))
+        return list(cursor)
+
+    since = hour_key(datetime.now(timezone.utc) - timedelta(hours=hours))
+    pipeline = [
+        {"$match": {"kind": kind, "hour": {"$gte": since}}},
+        {"$group": {"_id": "$value", "label": {"$last": "$label"}, "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "value": "$_id", "label": 1, "count": 1}},
+    ]
+    return list(db[hourly_collection_name()].aggregate(pipeline))
+
+
+def keyword_counts(db, since=None, limit: int = None) -> list:
+    """
+    Возвращает общие счётчики ключевых слов.
+
+    :param db: База данных MongoDB.
+    :param since: Если указано — только слова, которые искали начиная с since (по last_seen).
+    :param limit: Количество самых частых слов (None — все).
+    :return: Список словарей с полями value и count (по убыванию count).
+    """
+    query = {"kind": "keyword"}
+    if since is not None:
+        query["last_seen"] = {"$gte": since}
+    cursor = db[stats_collection_name()].find(query, {"_id": 0, "value": 1, "count": 1}).sort("count", pymongo.DESCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+
+def stats_built(db) -> bool:
+    """Проверяет, построены ли счётчики по всему журналу (есть ли отметка пересчёта)."""
+    return db[stats_collection_name()].find_one({"_id": BUILT_MARKER_ID}, {"_id": 1}) is not None
+
+
+def mark_stats_built(db) -> None:
+    """Записывает отметку о том, что счётчики отражают весь журнал."""
+    db[stats_collection_name()].update_one(
+        {"_id": BUILT_MARKER_ID},
+        {"$set": {"kind": "meta", "built_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+def clear_search_stats(db) -> None:
+    """
+    Удаляет все счётчики статистики (после очистки журнала запросов).
+
+    Пустому журналу соответствуют пустые счётчики, поэтому сразу записывается отметка пересчёта:
+    иначе топ запросов строился бы по журналу, который дополняется уже без старой истории.
+    """
+    db[stats_collection_name()].delete_many({})
+    db[hourly_collection_name()].delete_many({})
+    mark_stats_built(db)
+
+
+def rebuild_search_stats(db, log_collection, batch_size: int = 5000) -> int:
+    """
+    Пересчитывает сводные счётчики заново по всему журналу запросов.
+
+    Сводные коллекции очищаются, затем журнал читается потоком пакетами по batch_size записей;
+    по окончании записывается отметка пересчёта.
+
+    :param db: База данных MongoDB.
+    :param log_collection: Коллекция журнала запросов.
+    :param batch_size: Размер пакета чтения.
+    :return: Количество обработанных записей журнала.
+    """
+    db[stats_collection_name()].delete_many({})
+    db[hourly_collection_name()].delete_many({})
+
+    processed = 0
+    batch = []
+    projection = {"_id": 0, "timestamp": 1, "search_type": 1, "params": 1}
+    for entry in log_collection.find({}, projection).batch_size(batch_size):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            record_search_stats(db, batch)
+            processed += len(batch)
+            batch = []
+    if batch:
+        record_search_stats(db, batch)
+        processed += len(batch)
+    mark_stats_built(db)
+    return processed
+
+
+if __name__ == "__main__":
+    from mongodb_connector import get_mongo_client
+
+    parser = argparse.ArgumentParser(description="Сводная статистика поисковых запросов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="пересчитать счётчики по существующему журналу")
+    top_parser = subparsers.add_parser("top", help="показать самые частые запросы")
+    top_parser.add_argument("--kind", choices=["keyword", "genre"], default="keyword")
+    top_parser.add_argument("--limit", type=int, default=5)
+    top_parser.add_argument("--hours", type=int, default=None, help="учитывать только последние N часов")
+    args = parser.parse_args()
+
+    database = get_mongo_client()[settings.MONGODB_SETTINGS['db']]
+    if args.command == "rebuild":
+        count = rebuild_search_stats(database, database[settings.MONGODB_SETTINGS['collection']])
+        print(f"Статистика пересчитана по {count} записям журнала.")
+    else:
+        for item in top_queries(database, args.kind, args.limit, args.hours):
+            print(f"- {item['label']} (встречается {item['count']} раз)")
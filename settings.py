@@ -1,28 +1,185 @@
-# Модуль, хранящий настройки приложения
+# Модуль, хранящий настройки приложения.
+#
+# Настройки читаются лениво: файл .env загружается, а словари настроек строятся
+# при первом обращении к любой из них (settings.MYSQL_SETTINGS и т.п.), а не при импорте модуля.
+# Поэтому модули приложения импортируют сам модуль (import settings) и обращаются
+# к настройкам в момент использования.
 
-
-from dotenv import load_dotenv
 import os
+import threading
+
+_lock = threading.Lock()
+_loaded = False
+
+
+def _load() -> dict:
+    """Загружает переменные среды из файла .env и строит все настройки приложения."""
+    from dotenv import load_dotenv
+    load_dotenv()  # Загружаем переменные среды из файла .env
+
+    MYSQL_SETTINGS = {
+        'host': os.getenv('MYSQL_HOST'),
+        'user': os.getenv('MYSQL_USER'),
+        'password': os.getenv('MYSQL_PASSWORD'),
+        'database': os.getenv('MYSQL_DATABASE'),
+        'charset': 'utf8mb4',
+        # явные таймауты (секунды): недоступный сервер не задерживает запрос на время таймаута ОС
+        'connect_timeout': int(os.getenv('MYSQL_CONNECT_TIMEOUT', '5')),
+        'read_timeout': int(os.getenv('MYSQL_READ_TIMEOUT', '30')),
+        'write_timeout': int(os.getenv('MYSQL_WRITE_TIMEOUT', '30')),
+    }
+
+    # Журнал ошибок (см. logger.py)
+    ERROR_LOG_SETTINGS = {
+        'directory': os.getenv('ERROR_LOG_DIR', ''),           # пусто — текущий каталог
+        'sinks': os.getenv('ERROR_LOG_SINKS', 'csv,jsonl').split(','),
+        'max_bytes': int(os.getenv('ERROR_LOG_MAX_BYTES', str(5 * 1024 * 1024))),
+        'rotate_when': os.getenv('ERROR_LOG_ROTATE_WHEN', ''),  # например 'midnight'; пусто — ротация по размеру
+        'backup_count': int(os.getenv('ERROR_LOG_BACKUP_COUNT', '5')),
+        'dedup_window': float(os.getenv('ERROR_LOG_DEDUP_WINDOW', '60')),
+        'max_queue': int(os.getenv('ERROR_LOG_MAX_QUEUE', '10000')),
+    }
+
+    # Параметры пула соединений MySQL (см. mysql_pool.py)
+    MYSQL_POOL_SETTINGS = {
+        'max_size': int(os.getenv('MYSQL_POOL_SIZE', '5')),
+        'max_idle': float(os.getenv('MYSQL_POOL_MAX_IDLE', '300')),
+        'health_check_interval': float(os.getenv('MYSQL_POOL_HEALTH_CHECK', '30')),
+        'acquire_timeout': float(os.getenv('MYSQL_POOL_ACQUIRE_TIMEOUT', '10')),
+    }
+
+    # Режим поиска по ключевому слову: 'like', 'fulltext' или 'trigram' (см. mysql_connector.search_by_keyword)
+    KEYWORD_SEARCH_MODE = os.getenv('KEYWORD_SEARCH_MODE', 'like')
+
+    # Сколько строк за раз читается из небуферизованного курсора при потоковом выводе результатов
+    # (см. mysql_connector.stream_by_keyword): столько строк, не больше, одновременно держится в памяти
+    STREAM_FETCH_SIZE = int(os.getenv('STREAM_FETCH_SIZE', '100'))
+
+    # Формат строк результатов поиска: 'dict' (словари DictCursor) или 'compact' (объекты FilmRow
+    # с __slots__, в несколько раз меньше в памяти, см. film_row.py); доступ film['title'] работает в обоих
+    ROW_FORMAT = os.getenv('ROW_FORMAT', 'dict')
+
+    # Кэш справочных данных MySQL: жанры и диапазоны годов по жанрам (см. cache.py)
+    REFERENCE_CACHE_SETTINGS = {
+        'maxsize': int(os.getenv('REFERENCE_CACHE_SIZE', '256')),
+        'ttl': float(os.getenv('REFERENCE_CACHE_TTL', '3600')),
+    }
+    # Загружать ли диапазоны годов всех жанров одним запросом при запуске приложения
+    PRELOAD_GENRE_YEAR_RANGES = os.getenv('PRELOAD_GENRE_YEAR_RANGES', '0') == '1'
+
+    # Кэш результатов поиска (см. result_cache.py).
+    # RESULT_CACHE_PATH — файл общего хранилища, через которое несколько процессов приложения
+    # используют результаты друг друга; пустое значение — только кэш в памяти процесса.
+    RESULT_CACHE_SETTINGS = {
+        'enabled': os.getenv('RESULT_CACHE_ENABLED', '1') == '1',
+        'max_bytes': int(os.getenv('RESULT_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+        'max_entry_bytes': int(os.getenv('RESULT_CACHE_MAX_ENTRY_BYTES', str(1024 * 1024))),
+        'ttl': float(os.getenv('RESULT_CACHE_TTL', '300')),
+        'shared_path': os.getenv('RESULT_CACHE_PATH', ''),
+        'shared_max_bytes': int(os.getenv('RESULT_CACHE_SHARED_MAX_BYTES', str(128 * 1024 * 1024))),
+    }
+
+    MONGODB_SETTINGS = {
+        'user': os.getenv('MONGO_USER'),
+        'password': os.getenv('MONGO_PASSWORD'),
+        'host': os.getenv('MONGO_HOST'),
+        'db': os.getenv('MONGO_DB'),
+        'collection': os.getenv('MONGO_COLLECTION'),
+        'uri': (
+            f"mongodb://{os.getenv('MONGO_USER')}:{os.getenv('MONGO_PASSWORD')}"
+            f"@{os.getenv('MONGO_HOST')}/?authSource={os.getenv('MONGO_DB')}"
+            f"&readPreference=primary&ssl=false&authMechanism=DEFAULT"
+        ),
+        # таймауты клиента (миллисекунды): выбор сервера, установка соединения и ожидание ответа
+        'server_selection_timeout_ms': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '3000')),
+        'connect_timeout_ms': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '3000')),
+        'socket_timeout_ms': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000')),
+    }
+
+    # Параметры фоновой записи журнала запросов в MongoDB (см. search_log_writer.py)
+    MONGO_LOG_WRITER_SETTINGS = {
+        'batch_size': int(os.getenv('MONGO_LOG_BATCH_SIZE', '100')),
+        'flush_interval': float(os.getenv('MONGO_LOG_FLUSH_INTERVAL', '1.0')),
+        'max_queue': int(os.getenv('MONGO_LOG_MAX_QUEUE', '10000')),
+    }
+
+    # Ограничение роста журнала запросов в MongoDB (см. mongodb_connector.ensure_indexes).
+    # 0 — без ограничения.
+    # archive_* — архивирование старых записей (см. log_retention.py): записи старше archive_after_days дней
+    # сворачиваются в дневные сводки, выгружаются в сжатые файлы в archive_dir и удаляются из журнала
+    # пакетами по batch_size. TTL-индекс (ttl_days) удаляет записи без архива, поэтому при архивировании
+    # ttl_days стоит оставить 0 или сделать больше archive_after_days.
+    MONGO_LOG_RETENTION_SETTINGS = {
+        'ttl_days': float(os.getenv('MONGO_LOG_TTL_DAYS', '0')),
+        'capped_size_mb': int(os.getenv('MONGO_LOG_CAPPED_SIZE_MB', '0')),
+        'archive_after_days': int(os.getenv('MONGO_LOG_ARCHIVE_AFTER_DAYS', '30')),
+        'archive_dir': os.getenv('MONGO_LOG_ARCHIVE_DIR', 'log_archive'),
+        'archive_format': os.getenv('MONGO_LOG_ARCHIVE_FORMAT', 'jsonl'),  # 'jsonl' или 'columns'
+        'batch_size': int(os.getenv('MONGO_LOG_ARCHIVE_BATCH_SIZE', '5000')),
+    }
+
+    # Параметры асинхронного слоя и сервера сессий (см. async_api.py)
+    ASYNC_SETTINGS = {
+        'workers': int(os.getenv('ASYNC_WORKERS', '8')),
+        'request_timeout': float(os.getenv('ASYNC_REQUEST_TIMEOUT', '15')),
+    }
+
+    # HTTP-сервис поиска (см. http_service.py).
+    # workers — сколько запросов одновременно выполняется в базах (имеет смысл согласовать с MYSQL_POOL_SIZE),
+    # request_timeout — сколько секунд запрос ждёт результата, прежде чем клиент получит 504.
+    HTTP_SETTINGS = {
+        'host': os.getenv('HTTP_HOST', '127.0.0.1'),
+        'port': int(os.getenv('HTTP_PORT', '8080')),
+        'workers': int(os.getenv('HTTP_WORKERS', os.getenv('MYSQL_POOL_SIZE', '5'))),
+        'request_timeout': float(os.getenv('HTTP_REQUEST_TIMEOUT', '10')),
+        'max_page_size': int(os.getenv('HTTP_MAX_PAGE_SIZE', '100')),
+    }
+
+    # Пакетный режим поиска (см. batch.py).
+    # Число потоков имеет смысл согласовать с MYSQL_POOL_SIZE: лишние потоки будут ждать соединения.
+    BATCH_SETTINGS = {
+        'workers': int(os.getenv('BATCH_WORKERS', os.getenv('MYSQL_POOL_SIZE', '5'))),
+        'log_batch_size': int(os.getenv('BATCH_LOG_BATCH_SIZE', '500')),
+    }
+
+    # Локальный снимок каталога фильмов (см. catalog_snapshot.py).
+    # Пустой путь — снимок не используется, все запросы выполняются в MySQL.
+    CATALOG_SNAPSHOT_SETTINGS = {
+        'path': os.getenv('CATALOG_SNAPSHOT_PATH', ''),
+        'max_age': float(os.getenv('CATALOG_SNAPSHOT_MAX_AGE', '0')),              # секунд; 0 — без ограничения
+        'check_interval': float(os.getenv('CATALOG_SNAPSHOT_CHECK_INTERVAL', '300')),  # сверка версии с MySQL
+        'auto_refresh': os.getenv('CATALOG_SNAPSHOT_AUTO_REFRESH', '0') == '1',
+    }
+
+    # Повторы и автоматические выключатели подключений к MySQL и MongoDB (см. resilience.py)
+    RESILIENCE_SETTINGS = {
+        'retries': int(os.getenv('DB_RETRIES', '2')),                     # повторов временной ошибки
+        'backoff_base': float(os.getenv('DB_BACKOFF_BASE', '0.1')),       # секунд, удваивается с каждым повтором
+        'backoff_max': float(os.getenv('DB_BACKOFF_MAX', '2')),
+        'breaker_failure_threshold': int(os.getenv('DB_BREAKER_THRESHOLD', '3')),
+        'breaker_reset_timeout': float(os.getenv('DB_BREAKER_RESET_TIMEOUT', '30')),
+    }
+
+    # Подсказки названий фильмов по началу слова (см. suggest.py)
+    SUGGEST_SETTINGS = {
+        'enabled': os.getenv('SUGGEST_ENABLED', '1') == '1',
+        'limit': int(os.getenv('SUGGEST_LIMIT', '5')),                           # подсказок на запрос
+        'prefix_depth': int(os.getenv('SUGGEST_PREFIX_DEPTH', '3')),             # префиксы до этой длины считаются заранее
+        'refresh_interval': float(os.getenv('SUGGEST_REFRESH_INTERVAL', '300')), # секунд между дозагрузками
+        'max_keywords': int(os.getenv('SUGGEST_MAX_KEYWORDS', '5000')),          # популярных запросов для весов
+    }
+
+    return {name: value for name, value in locals().items() if name.isupper()}
+
 
-load_dotenv()  # Загружаем переменные среды из файла .env
-
-MYSQL_SETTINGS = {
-    'host': os.getenv('MYSQL_HOST'),
-    'user': os.getenv('MYSQL_USER'),
-    'password': os.getenv('MYSQL_PASSWORD'),
-    'database': os.getenv('MYSQL_DATABASE'),
-    'charset': 'utf8mb4',
-}
-
-MONGODB_SETTINGS = {
-    'user': os.getenv('MONGO_USER'),
-    'password': os.getenv('MONGO_PASSWORD'),
-    'host': os.getenv('MONGO_HOST'),
-    'db': os.getenv('MONGO_DB'),
-    'collection': os.getenv('MONGO_COLLECTION'),
-    'uri': (
-        f"mongodb://{os.getenv('MONGO_USER')}:{os.getenv('MONGO_PASSWORD')}"
-        f"@{os.getenv('MONGO_HOST')}/?authSource={os.getenv('MONGO_DB')}"
-        f"&readPreference=primary&ssl=false&authMechanism=DEFAULT"
-    )
-}
\ No newline at end of file
+def __getattr__(name):
+    """Строит все настройки при первом обращении к любой из них."""
+    global _loaded
+    if not _loaded and not name.startswith('__'):
+        with _lock:
+            if not _loaded:
+                globals().update(_load())
+                _loaded = True
+    if name in globals():
+        return globals()[name]
+    raise AttributeError(f"module 'settings' has no attribute '{name}'")
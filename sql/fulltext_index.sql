@@ -0,0 +1,7 @@
+-- Полнотекстовый индекс для режима поиска KEYWORD_SEARCH_MODE=fulltext.
+-- Парсер ngram индексирует n-граммы (по умолчанию ngram_token_size=2),
+-- поэтому фраза из фрагмента слова находится так же, как при LIKE '%слово%',
+-- но без полного просмотра таблицы film.
+
+ALTER TABLE film
+    ADD FULLTEXT INDEX ft_film_title_description (title, description) WITH PARSER ngram;
@@ -0,0 +1,15 @@
+-- Индексы для сводного поиска по жанрам (mysql_connector.search_by_genres).
+--
+-- film_category(category_id, film_id): подзапрос «фильмы выбранных жанров» читается
+-- только из индекса, без обращения к строкам таблицы. В стандартной схеме sakila его
+-- роль уже выполняет idx_fk_category_id (InnoDB добавляет к вторичному индексу первичный
+-- ключ film_id), поэтому отдельный индекс нужен только если idx_fk_category_id удалён или изменён.
+--
+-- film(release_year, title): отбор по диапазону годов и порядок страницы по названию
+-- для жанров с большим количеством фильмов.
+
+ALTER TABLE film_category
+    ADD INDEX idx_film_category_category_film (category_id, film_id);
+
+ALTER TABLE film
+    ADD INDEX idx_film_release_year_title (release_year, title);
@@ -0,0 +1,290 @@
+# Подсказки названий фильмов по началу слова (автодополнение ключевого слова).
+#
+# Индекс строится в памяти по таблице film и счётчикам поисковых запросов MongoDB (search_stats.py).
+# Каждое название хранится под ключами, начинающимися с каждого его слова
+# («ace casablanca», «casablanca»), в отсортированном списке: все названия с данным началом слова
+# лежат в нём подряд и находятся двоичным поиском. Для коротких префиксов (до prefix_depth символов),
+# под которые подходит большая часть каталога, лучшие подсказки посчитаны заранее, поэтому
+# ответ на любой префикс — это поиск в словаре или просмотр короткого участка списка (микросекунды).
+#
+# Порядок подсказок — по популярности: счётчик каждого ключевого слова из журнала запросов
+# делится поровну между названиями, начало слова которых с ним совпадает.
+# Индекс дополняется без перестроения: из MySQL читаются только фильмы с film_id больше
+# уже известных, из MongoDB — счётчики слов, которые искали после прошлой дозагрузки.
+# Переименованные фильмы учитываются при полном перестроении (refresh_suggestions(full=True)).
+
+import bisect
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import settings
+from logger import log_error
+from metrics import timer, register_gauge
+
+MATCH_LIMIT = 1000                      # слово, подходящее к большему числу названий, не влияет на их вес
+SCAN_LIMIT = 64                         # длинный префикс с большим числом ключей запоминается после первого подсчёта
+MAX_CACHED = 10000                      # сколько таких префиксов хранится
+SINCE_MARGIN = timedelta(minutes=5)     # запас на записи журнала, отправленные в MongoDB с задержкой
+_KEY_END = "\uffff"                     # больше любого символа названия: граница диапазона ключей с префиксом
+
+
+def normalize_prefix(text: str) -> str:
+    """Приводит введённый фрагмент к виду ключа: нижний регистр, одиночные пробелы."""
+    return " ".join(text.lower().split())
+
+
+def title_keys(title: str) -> list:
+    """
+    Ключи названия: хвосты названия, начинающиеся с каждого слова, в нижнем регистре.
+
+    :param title: Название фильма.
+    :return: Список ключей, например ['ace casablanca', 'casablanca'].
+    """
+    text = normalize_prefix(title or "")
+    return [text[i:] for i, ch in enumerate(text) if ch.isalnum() and (i == 0 or not text[i - 1].isalnum())]
+
+
+class SuggestionIndex:
+    """
+    Индекс подсказок: отсортированный список ключей (ключ, film_id), веса популярности названий
+    и заранее посчитанные лучшие подсказки для коротких префиксов.
+    """
+
+    def __init__(self, limit: int = 5, prefix_depth: int = 3):
+        """
+        :param limit: Сколько подсказок считать заранее для коротких префиксов.
+        :param prefix_depth: До какой длины префиксы считаются заранее.
+        """
+        self.limit = limit
+        self.prefix_depth = prefix_depth
+        self.max_film_id = 0
+        self._lock = threading.Lock()
+        self._keys = []      # отсортированные пары (ключ, film_id)
+        self._titles = {}    # film_id -> название
+        self._weights = {}   # film_id -> вес популярности
+        self._applied = {}   # ключевое слово -> уже учтённый счётчик
+        self._top = {}       # короткий префикс -> список film_id лучших подсказок
+        self._cached = {}    # (длинный префикс, limit) -> список film_id; сбрасывается при любом изменении индекса
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def _range(self, prefix: str) -> tuple:
+        return (bisect.bisect_left(self._keys, (prefix,)),
+                bisect.bisect_left(self._keys, (prefix + _KEY_END,)))
+
+    def _best(self, lo: int, hi: int, limit: int) -> list:
+        film_ids = {film_id for _, film_id in self._keys[lo:hi]}
+        return heapq.nsmallest(limit, film_ids, key=lambda film_id: (-self._weights.get(film_id, 0.0),
+                                                                    self._titles[film_id]))
+
+    def _prefixes(self, film_id: int) -> set:
+        return {key[:length] for key in title_keys(self._titles[film_id])
+                for length in range(1, min(self.prefix_depth, len(key)) + 1)}
+
+    def _recompute(self, prefixes) -> None:
+        self._cached.clear()
+        for prefix in prefixes:
+            lo, hi = self._range(prefix)
+            if lo < hi:
+                self._top[prefix] = self._best(lo, hi, self.limit)
+            else:
+                self._top.pop(prefix, None)
+
+    def add_films(self, rows) -> int:
+        """
+        Добавляет фильмы в индекс (фильм с уже известным film_id заменяется).
+
+        :param rows: Строки с полями film_id и title.
+        :return: Количество добавленных или изменённых фильмов.
+        """
+        changed = 0
+        with self._lock:
+            dirty = set()
+            new_keys = []
+            for row in rows:
+                film_id, title = row['film_id'], row['title'] or ""
+                old_title = self._titles.get(film_id)
+                if old_title == title:
+                    continue
+                if old_title is not None:
+                    dirty |= self._prefixes(film_id)
+                    for key in title_keys(old_title):
+                        position = bisect.bisect_left(self._keys, (key, film_id))
+                        if position < len(self._keys) and self._keys[position] == (key, film_id):
+                            del self._keys[position]
+                self._titles[film_id] = title
+                new_keys.extend((key, film_id) for key in title_keys(title))
+                dirty |= self._prefixes(film_id)
+                self.max_film_id = max(self.max_film_id, film_id)
+                changed += 1
+            if len(new_keys) > 64:
+                self._keys.extend(new_keys)
+                self._keys.sort()  # сортировка слиянием уже упорядоченных участков
+            else:
+                for key in new_keys:
+                    bisect.insort(self._keys, key)
+            self._recompute(dirty)
+        return changed
+
+    def apply_keyword_counts(self, counts: dict) -> int:
+        """
+        Учитывает накопленные счётчики ключевых слов: прирост счётчика с прошлого вызова
+        делится между названиями, слово которых начинается с ключевого слова.
+
+        :param counts: Словарь {ключевое слово: общий счётчик}; повторная передача того же счётчика ничего не меняет.
+        :return: Количество слов, изменивших веса.
+        """
+        applied = 0
+        with self._lock:
+            dirty = set()
+            for keyword, count in counts.items():
+                delta = count - self._applied.get(keyword, 0)
+                if delta <= 0:
+                    continue
+                self._applied[keyword] = count
+                prefix = normalize_prefix(str(keyword))
+                if not prefix:
+                    continue
+                lo, hi = self._range(prefix)
+                film_ids = {film_id for _, film_id in self._keys[lo:hi]}
+                if not film_ids or len(film_ids) > MATCH_LIMIT:
+                    continue
+                share = delta / len(film_ids)
+                for film_id in film_ids:
+                    self._weights[film_id] = self._weights.get(film_id, 0.0) + share
+                    dirty |= self._prefixes(film_id)
+                applied += 1
+            self._recompute(dirty)
+        return applied
+
+    def lookup(self, prefix: str, limit: int = None, shorten: bool = False) -> list:
+        """
+        Возвращает лучшие названия, слово которых начинается с prefix.
+
+        :param prefix: Введённый фрагмент.
+        :param limit: Количество подсказок (по умолчанию self.limit).
+        :param shorten: Если для фрагмента подсказок нет — отбрасывать символы с конца
+                        (до двух оставшихся), пока подсказки не найдутся: помогает при опечатке в конце слова.
+        :return: Список словарей film_id, title.
+        """
+        limit = limit or self.limit
+        prefix = normalize_prefix(prefix)
+        with self._lock:
+            while prefix:
+                if len(prefix) <= self.prefix_depth and limit <= self.limit:
+                    film_ids = self._top.get(prefix, [])[:limit]
+                elif (prefix, limit) in self._cached:
+                    film_ids = self._cached[(prefix, limit)]
+                else:
+                    lo, hi = self._range(prefix)
+                    film_ids = self._best(lo, hi, limit) if lo < hi else []
+                    if hi - lo > SCAN_LIMIT:
+                        if len(self._cached) >= MAX_CACHED:
+                            self._cached.clear()
+                        self._cached[(prefix, limit)] = film_ids
+                if film_ids or not shorten or len(prefix) <= 2:
+                    return [{"film_id": film_id, "title": self._titles[film_id]} for film_id in film_ids]
+                prefix = prefix[:-1].rstrip()
+        return []
+
+    def stats(self) -> dict:
+        return {"films": len(self._titles), "keys": len(self._keys), "prefixes": len(self._top),
+                "keywords": len(self._applied)}
+
+
+_index = None
+_refreshed_at = None      # время последней попытки построения или дозагрузки (time.monotonic)
+_keywords_since = None    # с какого момента запрашивать счётчики при следующей дозагрузке
+_state_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+register_gauge("suggest", lambda: _index.stats() if _index is not None else {})
+
+
+def refresh_suggestions(background: bool = False, full: bool = False) -> bool:
+    """
+    Дозагружает в индекс новые фильмы и счётчики запросов (или строит индекс заново).
+
+    Недоступная MongoDB не мешает подсказкам: названия остаются с прежними весами.
+
+    :param background: Выполнить в фоновом потоке и сразу вернуть управление.
+    :param full: Построить индекс заново (учитывает и переименованные фильмы).
+    :return: True, если индекс обновлён (для background — если обновление запущено).
+    """
+    global _index, _refreshed_at, _keywords_since
+    import mysql_connector
+    import mongodb_connector
+
+    if background:
+        if _refresh_lock.locked():
+            return False
+        threading.Thread(target=refresh_suggestions, kwargs={"full": full}, daemon=True, name="suggest").start()
+        return True
+
+    if not _refresh_lock.acquire(blocking=False):
+        return False  # обновление уже выполняет другой поток
+    try:
+        _refreshed_at = time.monotonic()
+        rebuild = full or _index is None
+        index = SuggestionIndex(settings.SUGGEST_SETTINGS['limit'], settings.SUGGEST_SETTINGS['prefix_depth']) \
+            if rebuild else _index
+        with timer("suggest.refresh"):
+            # обновление идёт в фоне: ошибка не выводится посреди меню, а записывается в журнал (см. except)
+            rows = mysql_connector.load_film_titles(0 if rebuild else index.max_film_id, strict=True)
+            index.add_films(rows)
+
+            started = datetime.now(timezone.utc)
+            since = None if rebuild else _keywords_since
+            counts = mongodb_connector.keyword_search_counts(
+                since, limit=settings.SUGGEST_SETTINGS['max_keywords'] if since is None else None)
+            if counts is not None:
+                index.apply_keyword_counts(counts)
+        with _state_lock:
+            _index = index
+            if counts is not None:
+                _keywords_since = started - SINCE_MARGIN
+        return True
+    except Exception as e:
+        log_error(f"Ошибка обновления подсказок: {e}", exc=e)
+        return False
+    finally:
+        _refresh_lock.release()
+
+
+def get_suggestion_index():
+    """
+    Возвращает индекс подсказок, строя его при первом обращении.
+
+    :return: SuggestionIndex или None, если подсказки отключены или каталог не удалось прочитать
+             (следующая попытка — не раньше чем через refresh_interval).
+    """
+    if not settings.SUGGEST_SETTINGS['enabled']:
+        return None
+    if _index is None and (_refreshed_at is None
+                           or time.monotonic() - _refreshed_at >= settings.SUGGEST_SETTINGS['refresh_interval']):
+        refresh_suggestions()
+    return _index
+
+
+def suggest(prefix: str, limit: int = None, shorten: bool = False) -> list:
+    """
+    Возвращает подсказки названий фильмов для введённого фрагмента.
+
+    Если с прошлой дозагрузки прошло больше refresh_interval, индекс дополняется в фоновом потоке,
+    а ответ строится по текущему индексу.
+
+    :param prefix: Введённый фрагмент.
+    :param limit: Количество подсказок (по умолчанию SUGGEST_SETTINGS['limit']).
+    :param shorten: Укорачивать фрагмент, пока не найдутся подсказки (см. SuggestionIndex.lookup).
+    :return: Список словарей film_id, title (пустой, если подсказок нет или они отключены).
+    """
+    index = get_suggestion_index()
+    if index is None:
+        return []
+    if time.monotonic() - _refreshed_at >= settings.SUGGEST_SETTINGS['refresh_interval']:
+        refresh_suggestions(background=True)
+    with timer("suggest.lookup"):
+        return index.lookup(prefix, limit, shorten=shorten)
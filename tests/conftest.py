@@ -0,0 +1,55 @@
+# Общие настройки тестов: модули приложения лежат в корне репозитория;
+# настройки задаются переменными среды до первого обращения к settings,
+# журнал ошибок пишется во временный каталог.
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("RESULT_CACHE_ENABLED", "0")
+os.environ.setdefault("MONGO_DB", "test_db")
+os.environ.setdefault("MONGO_COLLECTION", "search_log")
+os.environ.setdefault("ERROR_LOG_DIR", tempfile.mkdtemp(prefix="error_log_"))
+
+
+@pytest.fixture(scope="session")
+def catalog_path(tmp_path_factory):
+    """Файл SQLite с синтетическим каталогом sakila (локальная замена MySQL, см. benchmarks/sqlite_shim.py)."""
+    from benchmarks.sqlite_shim import build_catalog
+    return build_catalog(str(tmp_path_factory.mktemp("catalog") / "catalog.sqlite"), 300)
+
+
+@pytest.fixture
+def mysql_catalog(catalog_path, monkeypatch):
+    """Подменяет общий пул MySQL пулом соединений с синтетическим каталогом."""
+    import mysql_pool
+    from benchmarks.sqlite_shim import connect_factory
+
+    pool = mysql_pool.MySQLConnectionPool({}, connect_func=connect_factory(catalog_path))
+    monkeypatch.setattr(mysql_pool, "_pool", pool)
+    yield catalog_path
+    pool.close()
+
+
+@pytest.fixture
+def mysql_down(monkeypatch):
+    """
+    Подменяет общий пул MySQL пулом, который не может открыть ни одного соединения
+    (кэш справочных данных очищается, чтобы жанры не читались из него).
+    """
+    import pymysql
+    import mysql_connector
+    import mysql_pool
+
+    def refuse(**kwargs):
+        raise pymysql.err.OperationalError(1045, "Access denied for user 'test'")
+
+    pool = mysql_pool.MySQLConnectionPool({}, connect_func=refuse)
+    monkeypatch.setattr(mysql_pool, "_pool", pool)
+    mysql_connector.invalidate_reference_cache()
+    yield pool
+    pool.close()
@@ -0,0 +1,71 @@
+# Тесты пакетного режима (batch.py) на синтетическом каталоге вместо MySQL.
+
+import io
+import json
+
+import pytest
+
+import batch
+import mysql_connector
+
+
+def _run(lines, monkeypatch, genres=None):
+    logged = []
+    monkeypatch.setattr(batch.mongodb_connector, "log_searches_to_mongo",
+                        lambda searches: logged.extend(searches) or len(searches))
+    if genres is not None:
+        monkeypatch.setattr(batch, "_genre_names", lambda: genres)
+    stream = io.StringIO()
+    summary = batch.run_batch(batch.read_queries(io.StringIO("\n".join(lines))),
+                              batch._Output(stream, "jsonl", counts_only=True), workers=2)
+    results = sorted((json.loads(line) for line in stream.getvalue().splitlines()), key=lambda item: item["line"])
+    return summary, results, logged
+
+
+def test_batch_searches(mysql_catalog, monkeypatch):
+    summary, results, logged = _run(['{"keyword": "a"}', '{"genre_id": 1, "year_from": 1990, "year_to": 2030}',
+                                     '{"type": "genre_year", "genre_id": 999, "year_from": 2000}', 'not json'],
+                                    monkeypatch)
+    assert (summary["total"], summary["succeeded"], summary["failed"], summary["logged"]) == (4, 2, 2, 2)
+    assert results[0]["results_count"] > 0 and results[0]["error"] is None
+    assert results[2]["error"] == "такого жанра нет"
+    assert sorted(search_type for search_type, _, _ in logged) == ["genre_year", "keyword"]
+
+
+def test_database_failure_is_an_error_not_an_empty_result(mysql_down, monkeypatch, capsys):
+    summary, results, logged = _run(['{"keyword": "a"}', '{"genre_id": 1, "year_from": 2000}'],
+                                    monkeypatch, genres={1: "Action"})
+    assert (summary["succeeded"], summary["failed"], summary["logged"]) == (0, 2, 0)
+    assert all(result["results_count"] is None and "Access denied" in result["error"] for result in results)
+    assert logged == []
+    assert capsys.readouterr().out == ""  # stdout пакетного режима — только результаты
+
+
+def test_unexpected_error_fails_only_its_line(mysql_catalog, monkeypatch):
+    real_run_query = batch.run_query
+
+    def run_query(search_type, params):
+        if params["keyword"] == "boom":
+            raise RuntimeError("boom")
+        return real_run_query(search_type, params)
+
+    monkeypatch.setattr(batch, "run_query", run_query)
+    summary, results, logged = _run(['{"keyword": "boom"}', '{"keyword": "a"}'], monkeypatch)
+    assert (summary["succeeded"], summary["failed"]) == (1, 1)
+    assert "boom" in results[0]["error"]
+    assert len(logged) == 1
+
+
+def test_genre_list_unavailable_stops_batch(mysql_down, monkeypatch, capsys, tmp_path):
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text('{"keyword": "a"}\n', encoding="utf-8")
+    assert batch.main([str(queries), "-o", str(tmp_path / "out.jsonl"), "--no-log"]) == 2
+    assert "список жанров не загружен" in capsys.readouterr().err
+
+
+def test_strict_search_raises(mysql_down):
+    assert mysql_connector.search_by_keyword("a") == []
+    with pytest.raises(mysql_connector.SearchError):
+        mysql_connector.search_by_keyword("a", strict=True)
+    with pytest.raises(mysql_connector.SearchError):
+        mysql_connector.search_by_genre_and_years(1, 2000, 2005, strict=True)
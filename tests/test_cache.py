@@ -0,0 +1,62 @@
+# Тесты кэша с TTL и LRU-вытеснением (cache.py).
+
+import cache
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    store = TTLCache(maxsize=10, ttl=5)
+    store.set("a", 1)
+    clock.now += 4.9
+    assert store.get("a") == 1
+    clock.now += 0.2
+    assert store.get("a") is None
+    assert store.stats()["size"] == 0
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_lru_eviction():
+    store = TTLCache(maxsize=2, ttl=60)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.get("a")          # «a» использовалась недавно — вытесняется «b»
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert store.evictions == 1
+
+
+def test_get_or_load_and_cache_if():
+    store = TTLCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return []
+
+    assert store.get_or_load("k", loader, cache_if=bool) == []
+    assert store.get_or_load("k", loader, cache_if=bool) == []
+    assert len(calls) == 2  # пустой ответ не кэшируется
+    assert store.get_or_load("n", lambda: 42) == 42
+    assert store.get_or_load("n", loader) == 42
+
+
+def test_invalidate_and_stats():
+    store = TTLCache()
+    store.set("a", 1)
+    store.set("b", 2)
+    store.invalidate("a")
+    assert store.get("a") is None
+    store.invalidate()
+    assert store.stats() == {"size": 0, "maxsize": 128, "hits": 0, "misses": 1, "evictions": 0, "hit_rate": 0.0}
@@ -0,0 +1,76 @@
+# Тесты локального снимка каталога (catalog_snapshot.py) на синтетическом каталоге вместо MySQL.
+
+import sqlite3
+import threading
+
+import pytest
+
+import catalog_snapshot
+import settings
+from catalog_snapshot import export_snapshot, to_sqlite
+
+
+def test_to_sqlite():
+    sql = "SELECT * FROM film WHERE title LIKE CONCAT('%%', %s, '%%') AND film_id > %s"
+    assert to_sqlite(sql) == "SELECT * FROM film WHERE title LIKE ('%' || ? || '%') AND film_id > ?"
+
+
+def test_export_and_query(mysql_catalog, tmp_path):
+    snapshot = export_snapshot(str(tmp_path / "snapshot.sqlite"))
+    source = sqlite3.connect(mysql_catalog)
+    assert snapshot.films == source.execute("SELECT COUNT(*) FROM film").fetchone()[0]
+
+    sql = "SELECT COUNT(*) AS n FROM film WHERE title LIKE CONCAT('%%', %s, '%%')"
+    expected = source.execute("SELECT COUNT(*) FROM film WHERE title LIKE '%' || ? || '%'", ("an",)).fetchone()[0]
+    assert snapshot.query(sql, ("an",), one=True) == {"n": expected}
+    assert list(snapshot.stream("SELECT film_id FROM film ORDER BY film_id LIMIT 3", fetch_size=2)) == \
+        [{"film_id": 1}, {"film_id": 2}, {"film_id": 3}]
+    assert snapshot.query("SELECT * FROM missing_table") is None
+    snapshot.close()
+
+
+@pytest.fixture
+def loaded_snapshot(mysql_catalog, tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.sqlite")
+    snapshot = export_snapshot(path)
+    monkeypatch.setitem(settings.CATALOG_SNAPSHOT_SETTINGS, "path", path)
+    monkeypatch.setitem(settings.CATALOG_SNAPSHOT_SETTINGS, "check_interval", 0)
+    monkeypatch.setitem(settings.CATALOG_SNAPSHOT_SETTINGS, "max_age", 0)
+    monkeypatch.setitem(settings.CATALOG_SNAPSHOT_SETTINGS, "auto_refresh", False)
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", snapshot)
+    monkeypatch.setattr(catalog_snapshot, "_stale", False)
+    monkeypatch.setattr(catalog_snapshot, "_checked_at", 0.0)
+    yield snapshot
+    snapshot.close()
+
+
+def test_version_check_does_not_block_search(loaded_snapshot, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_version(connection):
+        started.set()
+        release.wait(5)
+        return "changed"
+
+    monkeypatch.setattr(catalog_snapshot, "read_catalog_version", slow_version)
+    assert catalog_snapshot.get_snapshot() is loaded_snapshot   # MySQL ещё не ответил — работает снимок
+    assert started.wait(5)
+    assert catalog_snapshot.get_snapshot() is loaded_snapshot   # вторая сверка не запускается
+    release.set()
+    with catalog_snapshot._check_lock:
+        pass
+    assert catalog_snapshot._stale
+    assert catalog_snapshot.get_snapshot() is None
+
+
+def test_failed_version_check_keeps_snapshot(loaded_snapshot, monkeypatch):
+    def broken_version(connection):
+        raise RuntimeError("MySQL недоступен")
+
+    monkeypatch.setattr(catalog_snapshot, "read_catalog_version", broken_version)
+    assert catalog_snapshot.get_snapshot() is loaded_snapshot
+    for thread in threading.enumerate():
+        if thread.name == "catalog-snapshot-check":
+            thread.join(5)
+    assert not catalog_snapshot._stale
+    assert catalog_snapshot.get_snapshot() is loaded_snapshot
@@ -0,0 +1,38 @@
+# Тесты компактного представления строки фильма (film_row.py).
+
+import json
+
+import pytest
+
+from film_row import FilmRow, compact_rows, row_to_json
+
+ROW = {"film_id": 1, "title": "ACADEMY DINOSAUR", "description": "A Epic Drama", "release_year": 2006}
+
+
+def test_mapping_access():
+    film = FilmRow.from_mapping(dict(ROW, rating="PG"))
+    assert film['title'] == "ACADEMY DINOSAUR" and film.release_year == 2006
+    assert film.get('rating') is None and film.get('rating', "-") == "-"
+    with pytest.raises(KeyError):
+        film['rating']
+    with pytest.raises(KeyError):
+        film[0]
+    assert dict(zip(film.keys(), (film[key] for key in film.keys()))) == ROW
+
+
+def test_equality_with_dict_and_row():
+    film = FilmRow.from_mapping(ROW)
+    assert film == ROW and film == FilmRow(**ROW)
+    assert film != dict(ROW, title="OTHER")
+    assert film.__eq__(42) is NotImplemented
+    with pytest.raises(TypeError):
+        hash(film)
+    assert not hasattr(film, "__dict__")
+
+
+def test_compact_rows_and_json():
+    rows = compact_rows([ROW, dict(ROW, film_id=2)])
+    assert all(isinstance(row, FilmRow) for row in rows)
+    assert compact_rows(rows) is rows and compact_rows([]) == []
+    assert json.loads(json.dumps(rows, default=row_to_json)) == [ROW, dict(ROW, film_id=2)]
+    assert row_to_json(object()).startswith("<object")
@@ -0,0 +1,82 @@
+# Тесты разбора курсоров страниц HTTP-сервиса (http_service.py).
+
+import pytest
+
+import mysql_connector
+from http_service import RequestError, decode_cursor, encode_cursor
+
+
+def test_keyset_cursor_round_trip():
+    assert decode_cursor(encode_cursor(("ACE GOLDFINGER", 2))) == ("ACE GOLDFINGER", 2)
+    assert decode_cursor(None) is None
+
+
+def test_offset_cursor_round_trip():
+    assert decode_cursor(encode_cursor(40), offset=True) == 40
+    assert decode_cursor(encode_cursor(0), offset=True) == 0
+
+
+@pytest.mark.parametrize("cursor", [40, "x", ["x"], ["x", 1, 2], [1, "x"], ["x", True], {"title": "x"}])
+def test_keyset_cursor_rejects_other_shapes(cursor):
+    with pytest.raises(RequestError):
+        decode_cursor(encode_cursor(cursor))
+
+
+@pytest.mark.parametrize("cursor", [-1, 1.5, True, "40", ["x", 1]])
+def test_offset_cursor_rejects_other_shapes(cursor):
+    with pytest.raises(RequestError):
+        decode_cursor(encode_cursor(cursor), offset=True)
+
+
+def test_cursor_that_is_not_base64_json():
+    with pytest.raises(RequestError):
+        decode_cursor("not a cursor!")
+
+
+def test_keyword_page_cursor_kind_follows_mode():
+    assert not mysql_connector.keyword_page_uses_offset("ace", "like")
+    assert mysql_connector.keyword_page_uses_offset("ace", "trigram")
+    assert mysql_connector.keyword_page_uses_offset("ace", "fulltext")
+    assert not mysql_connector.keyword_page_uses_offset("", "fulltext")
+
+
+@pytest.fixture
+def server():
+    from http_service import SearchHTTPServer
+
+    server = SearchHTTPServer(("127.0.0.1", 0), workers=2, request_timeout=5)
+    yield server
+    server.server_close()
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    import mongodb_connector
+
+    entries = []
+    monkeypatch.setattr(mongodb_connector, "log_search_to_mongo",
+                        lambda search_type, params, results_count: entries.append((search_type, results_count)))
+    return entries
+
+
+def test_search_logged_once(mysql_catalog, server, logged):
+    from http_service import genre_search, keyword_search
+
+    status, body = server.call(keyword_search, {"keyword": ["a"]})
+    assert status == 200 and body["total"] > 0
+    status, _ = server.call(keyword_search, {"keyword": ["a"], "after": [body["next_cursor"]]})
+    assert status == 200
+    status, body = server.call(genre_search, {"genre_id": ["1", "2"], "year_from": ["1990"], "year_to": ["2030"]})
+    assert status == 200
+    assert logged == [("keyword", logged[0][1]), ("genre_year", body["total"])]
+
+
+def test_database_failure_answers_503_and_is_not_logged(mysql_down, server, logged, capsys):
+    from http_service import genre_search, genres, keyword_search
+
+    for func, query in ((keyword_search, {"keyword": ["a"]}), (genres, {}),
+                        (genre_search, {"genre_id": ["1"], "year_from": ["2000"]})):
+        status, body = server.call(func, query)
+        assert status == 503, body
+    assert logged == []
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,129 @@
+# Тесты архива и дневных сводок журнала запросов (log_retention.py).
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from log_retention import ArchiveWriter, DailyRollup, read_archive
+
+
+def _entries():
+    return [
+        {"_id": "a1", "timestamp": datetime(2024, 5, 1, 10, 0), "search_type": "keyword",
+         "params": {"keyword": "Ace"}, "results_count": 3},
+        {"_id": "a2", "timestamp": datetime(2024, 5, 1, 11, 30), "search_type": "genre_year",
+         "params": {"genre_id": 1, "genre_name": "Action", "year_from": 2000, "year_to": 2005}, "results_count": 0},
+        {"_id": "a3", "timestamp": datetime(2024, 5, 1, 12, 0), "search_type": "keyword",
+         "params": {"keyword": "dinosaur", "extra": True}, "results_count": 1},
+    ]
+
+
+@pytest.mark.parametrize("archive_format", ["jsonl", "columns"])
+def test_archive_round_trip(tmp_path, archive_format):
+    path = str(tmp_path / "2024" / f"2024-05-01.{archive_format}.gz")
+    writer = ArchiveWriter(path, archive_format, group_size=2)
+    for entry in _entries():
+        writer.write(entry)
+    writer.close()
+
+    assert writer.count == 3
+    assert not os.path.exists(path + ".tmp")
+    restored = list(read_archive(path))
+    assert [entry["_id"] for entry in restored] == ["a1", "a2", "a3"]
+    assert restored[0]["timestamp"] == datetime(2024, 5, 1, 10, 0)
+    assert restored[1]["params"]["genre_name"] == "Action"
+    assert restored[2]["params"]["extra"] is True
+
+
+def test_columns_missing_fields_read_as_null(tmp_path):
+    path = str(tmp_path / "day.columns.gz")
+    writer = ArchiveWriter(path, "columns")
+    for entry in _entries():
+        writer.write(entry)
+    writer.close()
+
+    restored = list(read_archive(path))
+    assert restored[0]["params"]["extra"] is None
+    assert restored[0]["params"]["year_from"] is None
+
+
+def test_abort_keeps_previous_archive(tmp_path):
+    path = str(tmp_path / "day.jsonl.gz")
+    writer = ArchiveWriter(path)
+    writer.write(_entries()[0])
+    writer.close()
+
+    writer = ArchiveWriter(path)
+    writer.write(_entries()[1])
+    writer.abort()
+
+    assert not os.path.exists(path + ".tmp")
+    assert [entry["_id"] for entry in read_archive(path)] == ["a1"]
+
+
+def test_unknown_archive_format(tmp_path):
+    with pytest.raises(ValueError):
+        ArchiveWriter(str(tmp_path / "day.csv.gz"), "csv")
+
+
+def test_daily_rollup():
+    rollup = DailyRollup("2024-05-01")
+    for entry in _entries():
+        rollup.add(entry)
+    document = rollup.to_document()
+
+    assert document["_id"] == "2024-05-01"
+    assert document["total"] == 3
+    assert document["search_types"] == {"keyword": 2, "genre_year": 1}
+    assert document["zero_results"] == 1
+    assert document["avg_results"] == round(4 / 3, 2)
+    assert document["top_keywords"][0] == {"keyword": "ace", "count": 1}
+    assert document["top_genres"] == [{"genre_id": 1, "genre_name": "Action", "count": 1}]
+    assert document["hours"] == {"10": 1, "11": 1, "12": 1}
+
+
+def test_daily_rollup_counts_each_genre_of_multi_genre_search():
+    rollup = DailyRollup("2024-05-01")
+    rollup.add({"search_type": "genre_year", "params": {"genre_id": 1, "genre_name": "Action"}, "results_count": 2})
+    rollup.add({"search_type": "genre_year", "params": {"genre_id": [1, 7], "genre_name": ["Action", "Drama"]},
+                "results_count": 5})
+    rollup.add({"search_type": "genre_year", "params": {"genre_id": [7, 9], "genre_name": None}, "results_count": 1})
+
+    genres = {item["genre_id"]: item for item in rollup.to_document()["top_genres"]}
+    assert genres[1] == {"genre_id": 1, "genre_name": "Action", "count": 2}
+    assert genres[7] == {"genre_id": 7, "genre_name": "Drama", "count": 2}
+    assert genres[9] == {"genre_id": 9, "genre_name": None, "count": 1}
+
+
+def test_archived_day_keeps_late_entries(tmp_path):
+    import mongomock
+    from bson import ObjectId
+
+    from log_retention import archive_day, daily_collection_name
+
+    db = mongomock.MongoClient()["test_db"]
+    log = db["search_log"]
+    day = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    originals = [{"_id": ObjectId(), "timestamp": day.replace(hour=hour), "search_type": "keyword",
+                  "params": {"keyword": f"k{hour}"}, "results_count": 1} for hour in (1, 2, 3)]
+    log.insert_many([dict(entry) for entry in originals])
+
+    first = archive_day(db, log, day, "jsonl", batch_size=2, archive_dir=str(tmp_path))
+    assert (first["entries"], first["deleted"]) == (3, 3)
+
+    # прерванная очистка оставила одну выгруженную запись, а преобразование строк времени добавило новую
+    log.insert_one(dict(originals[0]))
+    log.insert_one({"_id": ObjectId(), "timestamp": day.replace(hour=5), "search_type": "keyword",
+                    "params": {"keyword": "late"}, "results_count": 0})
+    assert archive_day(db, log, day, "jsonl", batch_size=2, archive_dir=str(tmp_path), dry_run=True)["entries"] == 1
+
+    second = archive_day(db, log, day, "columns", batch_size=2, archive_dir=str(tmp_path))
+    assert (second["entries"], second["deleted"]) == (1, 2)
+    assert second["file"].endswith("2024-05-01.part2.jsonl.gz")
+    assert [entry["params"]["keyword"] for entry in read_archive(second["file"])] == ["late"]
+    assert log.count_documents({}) == 0
+
+    rollup = db[daily_collection_name()].find_one({"_id": "2024-05-01"})
+    assert rollup["files"] == [first["file"], second["file"]]
+    assert (rollup["total"], rollup["zero_results"], rollup["distinct_keywords"]) == (4, 1, 4)
@@ -0,0 +1,43 @@
+# Тесты приёмников журнала ошибок (logger.py).
+
+import glob
+import logging
+import os
+
+from logger import CsvFormatter, CsvRotatingFileHandler
+
+
+def _record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("films.errors", logging.ERROR, __file__, 1, message, None, None)
+
+
+def test_csv_rotation_writes_header_to_every_file(tmp_path):
+    path = str(tmp_path / "error_log.csv")
+    handler = CsvRotatingFileHandler(path, maxBytes=200, backupCount=3, encoding="utf-8", delay=True)
+    handler.setFormatter(CsvFormatter())
+    for number in range(30):
+        handler.handle(_record(f"ошибка номер {number}"))
+    handler.close()
+
+    files = sorted(glob.glob(path + "*"))
+    assert len(files) == 4
+    for name in files:
+        with open(name, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        assert lines[0] == "timestamp,error_message", name
+        assert lines[1:] and all(line.count(",") >= 1 for line in lines[1:])
+    with open(path, encoding="utf-8") as file:
+        assert file.read().splitlines()[-1].endswith("ошибка номер 29")
+
+
+def test_existing_file_gets_no_second_header(tmp_path):
+    path = str(tmp_path / "error_log.csv")
+    for number in range(2):
+        handler = CsvRotatingFileHandler(path, maxBytes=0, encoding="utf-8", delay=True)
+        handler.setFormatter(CsvFormatter())
+        handler.handle(_record(f"ошибка {number}"))
+        handler.close()
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 3 and lines.count("timestamp,error_message") == 1
+    assert os.path.getsize(path) > 0
@@ -0,0 +1,68 @@
+# Тесты метрик производительности (metrics.py).
+
+import json
+
+from metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_percentiles_nearest_rank():
+    histogram = Histogram()
+    assert histogram.percentiles(0.5, 0.99) == [0.0, 0.0]
+    for value in range(1, 101):
+        histogram.observe(float(value))
+    assert histogram.percentiles(0.0, 0.5, 0.95, 1.0) == [1.0, 51.0, 95.0, 100.0]
+    assert (histogram.count, histogram.total) == (100, 5050.0)
+
+
+def test_histogram_window_limits_samples():
+    histogram = Histogram(max_samples=10)
+    for value in range(100):
+        histogram.observe(float(value))
+    assert histogram.percentiles(0.0, 1.0) == [90.0, 99.0]
+    assert histogram.count == 100
+
+
+def test_snapshot_and_gauges():
+    registry = MetricsRegistry()
+    registry.observe("mysql.query", 0.5)
+    with registry.timer("mysql.query"):
+        pass
+    registry.inc("rows", 3)
+    registry.inc("rows")
+    registry.register_gauge("pool", lambda: {"size": 2, "ok": True, "name": "x"})
+    registry.register_gauge("broken", lambda: 1 / 0)
+    registry.register_gauge("queue", lambda: 7)
+
+    snapshot = registry.snapshot()
+    assert snapshot["stages"]["mysql.query"]["count"] == 2
+    assert snapshot["stages"]["mysql.query"]["p99"] == 0.5
+    assert snapshot["counters"] == {"rows": 4}
+    assert snapshot["gauges"] == {"pool_size": 2, "queue": 7}
+    assert json.loads(registry.to_json()) == json.loads(json.dumps(snapshot))
+
+
+def test_timed_records_failed_calls():
+    registry = MetricsRegistry()
+
+    @registry.timed("stage")
+    def fail():
+        raise ValueError
+
+    try:
+        fail()
+    except ValueError:
+        pass
+    assert registry.snapshot()["stages"]["stage"]["count"] == 1
+
+
+def test_prometheus_export():
+    registry = MetricsRegistry()
+    registry.observe("mongo.log_write", 0.25)
+    registry.inc("sql.films.rows", 5)
+    registry.register_gauge("pool", lambda: {"in_use": 1})
+    text = registry.to_prometheus()
+    assert 'films_stage_seconds{stage="mongo.log_write",quantile="0.95"} 0.250000' in text
+    assert 'films_stage_seconds_count{stage="mongo.log_write"} 1' in text
+    assert "films_sql_films_rows_total 5" in text
+    assert "films_pool_in_use 1" in text
+    assert text.endswith("\n")
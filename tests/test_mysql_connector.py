@@ -0,0 +1,31 @@
+# Тесты потокового чтения результатов (mysql_connector.py) на синтетическом каталоге вместо MySQL.
+
+import pytest
+
+import mysql_connector
+from mysql_connector import StreamError, search_by_genres, search_by_keyword_page, stream_by_genre_and_years, \
+    stream_by_keyword
+
+
+def _ids(rows):
+    return [row['film_id'] for row in rows]
+
+
+def test_stream_continues_after_first_page(mysql_catalog):
+    everything = _ids(stream_by_keyword("a"))
+    page, cursor = search_by_keyword_page("a")
+    assert cursor is not None
+    assert _ids(page) + _ids(stream_by_keyword("a", after=cursor)) == everything
+
+
+def test_genre_stream_continues_after_summary_page(mysql_catalog):
+    result = search_by_genres(1, 1990, 2030, page_size=5)
+    rest = _ids(stream_by_genre_and_years(1, 1990, 2030, after=result["next_cursor"]))
+    assert len(result["rows"]) + len(rest) == result["total"]
+    assert _ids(result["rows"]) + rest == _ids(stream_by_genre_and_years(1, 1990, 2030))
+
+
+def test_stream_failure_raises(mysql_catalog, monkeypatch):
+    monkeypatch.setattr(mysql_connector, "connect_to_db", lambda: None)
+    with pytest.raises(StreamError):
+        list(stream_by_genre_and_years(1, 1990, 2030))
@@ -0,0 +1,90 @@
+# Тесты реестра SQL-запросов (query_registry.py).
+
+import pytest
+
+from query_registry import QueryRegistry, compact_sql
+
+
+class FakeCursor:
+    def __init__(self, rows=(), error=None):
+        self.rows = list(rows)
+        self.error = error
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+        if self.error is not None:
+            raise self.error
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+def _stats(registry, name):
+    return next(item for item in registry.stats() if item["name"] == name)
+
+
+def test_compact_sql():
+    assert compact_sql("""
+        SELECT title
+          FROM film
+         WHERE film_id = %s
+    """) == "SELECT title FROM film WHERE film_id = %s"
+
+
+def test_register_returns_same_query_and_rejects_conflicts():
+    registry = QueryRegistry()
+    query = registry.register("test_qr.film", "SELECT title\n  FROM film")
+    assert registry.register("test_qr.film", "SELECT  title FROM film") is query
+    assert registry.get("test_qr.film").sql == "SELECT title FROM film"
+    assert registry.names() == ["test_qr.film"]
+    with pytest.raises(ValueError):
+        registry.register("test_qr.film", "SELECT film_id FROM film")
+    with pytest.raises(KeyError):
+        registry.get("test_qr.missing")
+
+
+def test_variant_is_built_once_per_shape():
+    registry = QueryRegistry()
+    calls = []
+
+    def build(genres):
+        calls.append(genres)
+        return "SELECT film_id FROM film_category WHERE category_id IN (" + ", ".join(["%s"] * genres) + ")"
+
+    first = registry.variant("test_qr.genres", (2,), lambda: build(2))
+    assert registry.variant("test_qr.genres", (2,), lambda: build(2)) is first
+    other = registry.variant("test_qr.genres", (3,), lambda: build(3))
+    assert calls == [2, 3]
+    assert other.sql.endswith("(%s, %s, %s)")
+    assert first.stage == other.stage == "sql.test_qr.genres"
+    assert registry.names() == []
+
+
+def test_run_records_rows_and_errors():
+    registry = QueryRegistry()
+    query = registry.register("test_qr.run", "SELECT film_id FROM film WHERE film_id > %s")
+
+    cursor = FakeCursor([{"film_id": 1}, {"film_id": 2}])
+    assert query.run(cursor, (0,)) == [{"film_id": 1}, {"film_id": 2}]
+    assert cursor.executed == [(query.sql, (0,))]
+    assert query.run(cursor, (0,), one=True) == {"film_id": 1}
+    with pytest.raises(RuntimeError):
+        query.run(FakeCursor(error=RuntimeError("lost connection")), (0,))
+
+    stats = _stats(registry, "test_qr.run")
+    assert (stats["calls"], stats["rows"], stats["errors"]) == (3, 3, 1)
+
+
+def test_stats_sorted_by_total_time():
+    registry = QueryRegistry()
+    registry.register("test_qr.fast", "SELECT 1").record(0.001)
+    registry.register("test_qr.slow", "SELECT 2").record(5.0, rows=10)
+
+    names = [item["name"] for item in registry.stats()]
+    assert names.index("test_qr.slow") < names.index("test_qr.fast")
+    slow = _stats(registry, "test_qr.slow")
+    assert (slow["calls"], slow["total_ms"], slow["avg_ms"], slow["rows"]) == (1, 5000.0, 5000.0, 10)
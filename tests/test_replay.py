@@ -0,0 +1,51 @@
+# Тесты воспроизведения журнала запросов (replay.py): запросы выполняются по синтетическому каталогу,
+# число найденных фильмов сравнивается с results_count из записей журнала.
+
+from datetime import datetime, timedelta, timezone
+
+import mysql_connector
+from replay import replay_call, run_replay
+
+START = datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def _entry(seconds, search_type, results_count=None, **params):
+    return {"timestamp": START + timedelta(seconds=seconds), "search_type": search_type,
+            "params": params, "results_count": results_count}
+
+
+def test_replay_counts_matches_mismatches_and_skipped(mysql_catalog):
+    keyword_count = len(mysql_connector.search_by_keyword("ACE", strict=True))
+    genre_count = len(mysql_connector.search_by_genre_and_years(1, 2000, 2010, strict=True))
+    genres_total = mysql_connector.search_by_genres([1, 2], None, None, page_size=1, strict=True)["total"]
+    entries = [
+        _entry(0, "keyword", keyword_count, keyword="ACE"),
+        _entry(1, "genre_year", genre_count, genre_id=1, year_from=2000, year_to=2010),
+        _entry(2, "genre_year", genres_total, genre_id=[1, 2], year_from=None, year_to=None),
+        _entry(3, "keyword", keyword_count + 1, keyword="ACE"),
+        _entry(4, "keyword", None, keyword="ACE"),   # без results_count не проверяется
+        _entry(5, "suggest", 3, prefix="AC"),        # не воспроизводится
+    ]
+    report = run_replay(entries, speed=0, concurrency=2).to_dict()
+    assert (report["total"], report["replayed"], report["skipped"]) == (6, 5, 1)
+    assert (report["checked"], report["mismatches"], report["errors"]) == (4, 1, 0)
+    assert report["examples"][0]["expected"] == keyword_count + 1
+    assert report["examples"][0]["actual"] == keyword_count
+    assert set(report["latency"]) == {"keyword", "genre_year"}
+
+
+def test_replay_counts_database_failure_as_error(mysql_down):
+    entries = [
+        _entry(0, "keyword", 0, keyword="ACE"),
+        _entry(1, "genre_year", 0, genre_id=1, year_from=2000, year_to=2010),
+        _entry(2, "genre_year", 0, genre_id=[1, 2], year_from=None, year_to=None),
+    ]
+    report = run_replay(entries, speed=0, concurrency=1).to_dict()
+    assert (report["replayed"], report["errors"]) == (3, 3)
+    assert (report["checked"], report["mismatches"]) == (0, 0)
+    assert all(example["error"] for example in report["examples"])
+
+
+def test_replay_call_requires_search_params():
+    assert replay_call({"search_type": "keyword", "params": {}}) is None
+    assert replay_call({"search_type": "genre_year", "params": {"year_from": 2000}}) is None
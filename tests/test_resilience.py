@@ -0,0 +1,88 @@
+# Тесты автоматического выключателя и повторов (resilience.py).
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, backoff_delay, guarded_call
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_threshold_and_rejects(clock):
+    breaker = CircuitBreaker("db", failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.retry_in() == 10
+    assert breaker.stats() == {"state": 1, "failures": 2, "opened": 1, "rejected": 2}
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("db", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_single_trial(clock):
+    breaker = CircuitBreaker("db", failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.check()                      # время ожидания истекло — check не отклоняет
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()           # второй вызов ждёт результата пробного
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 2
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_backoff_delay_bounds(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt, 0.1, 0.5) for attempt in range(4)] == [0.1, 0.2, 0.4, 0.5]
+
+
+def test_guarded_call_retries_then_records_failure(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    breaker = CircuitBreaker("db", failure_threshold=1)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise ConnectionError("нет соединения")
+
+    with pytest.raises(ConnectionError):
+        guarded_call(breaker, flaky, is_failure=lambda e: True, retry_if=lambda e: True, retries=2)
+    assert len(calls) == 3
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        guarded_call(breaker, lambda: 1, is_failure=lambda e: True)
+
+
+def test_guarded_call_query_error_is_not_outage():
+    breaker = CircuitBreaker("db", failure_threshold=1)
+    with pytest.raises(ValueError):
+        guarded_call(breaker, lambda: int("x"), is_failure=lambda e: isinstance(e, ConnectionError), retries=0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert guarded_call(breaker, lambda: 42, is_failure=lambda e: True) == 42
@@ -0,0 +1,62 @@
+# Тесты кэша результатов поиска (result_cache.py).
+
+import time
+
+from result_cache import ResultCache, SQLiteResultStore, _encode
+
+
+def test_make_key_normalized_parts():
+    assert ResultCache.make_key("genre", 3, 2005) == ResultCache.make_key("genre", 3, 2005)
+    assert ResultCache.make_key("genre", 3, 2005) != ResultCache.make_key("genre", 3, "2005")
+
+
+def test_hit_after_load_and_none_not_cached():
+    store = ResultCache()
+    calls = []
+    assert store.get_or_load("k", lambda: calls.append(1) or [1, 2]) == [1, 2]
+    assert store.get_or_load("k", lambda: calls.append(1) or [3]) == [1, 2]
+    assert store.get_or_load("none", lambda: None) is None
+    assert store.get_or_load("none", lambda: "loaded") == "loaded"
+    assert len(calls) == 1
+    assert store.stats()["hits"] == 1
+
+
+def test_byte_bound_evicts_least_recently_used():
+    value = ["x" * 90]
+    size = len(_encode(value))
+    store = ResultCache(max_bytes=size * 2)
+    store.get_or_load("a", lambda: value)
+    store.get_or_load("b", lambda: value)
+    store.get_or_load("a", lambda: None)     # «a» используется — вытесняется «b»
+    store.get_or_load("c", lambda: value)
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == size * 2 and stats["evictions"] == 1
+    assert store.get_or_load("b", lambda: "reloaded") == "reloaded"
+
+
+def test_large_entry_not_cached():
+    store = ResultCache(max_entry_bytes=10)
+    store.get_or_load("big", lambda: ["y" * 100])
+    assert store.stats()["entries"] == 0
+
+
+def test_shared_store_between_caches(tmp_path):
+    path = str(tmp_path / "cache" / "results.sqlite")
+    first = ResultCache(shared_store=SQLiteResultStore(path, 1024 * 1024))
+    second = ResultCache(shared_store=SQLiteResultStore(path, 1024 * 1024))
+    first.get_or_load("k", lambda: [{"film_id": 1}])
+    assert second.get_or_load("k", lambda: None) == [{"film_id": 1}]
+    assert second.stats()["shared_hits"] == 1
+    first.invalidate()
+    assert second.shared_store.get("k") is None
+
+
+def test_sqlite_store_byte_bound_and_ttl(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / "results.sqlite"), max_bytes=10)
+    store.set("a", b"123456", ttl=60)
+    time.sleep(0.01)
+    store.set("b", b"123456", ttl=60)   # вместе больше 10 байт — удаляется «a»
+    assert store.get("a") is None
+    assert store.get("b") == b"123456"
+    store.set("c", b"1", ttl=-1)
+    assert store.get("c") is None
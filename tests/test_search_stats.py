@@ -0,0 +1,117 @@
+# Тесты сводной статистики поисковых запросов (search_stats.py).
+
+from datetime import datetime, timezone
+
+import mongomock
+import pytest
+
+import search_stats
+from search_stats import _count_entries, hour_key, mark_stats_built, stats_built, stats_collection_name
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["test_db"]
+
+
+def _entry(search_type, hour, **params):
+    return {"timestamp": datetime(2024, 5, 1, hour, 15, tzinfo=timezone.utc),
+            "search_type": search_type, "params": params}
+
+
+def test_hour_key():
+    assert hour_key(datetime(2024, 5, 1, 7, 59)) == "2024-05-01T07"
+    assert hour_key("2024-05-01T07:59:00") == "2024-05-01T07"
+
+
+def test_count_entries():
+    entries = [
+        _entry("keyword", 10, keyword="ace"),
+        _entry("keyword", 11, keyword="ace"),
+        _entry("genre_year", 10, genre_id=3, genre_name="Comedy", year_from=2000, year_to=2010),
+        _entry("keyword", 10),                 # без ключевого слова не учитывается
+        {"search_type": "other", "params": {}},
+    ]
+    totals, hourly, labels, last_seen = _count_entries(entries)
+    assert totals == {("keyword", "ace"): 2, ("genre", 3): 1}
+    assert hourly == {("keyword", "ace", "2024-05-01T10"): 1, ("keyword", "ace", "2024-05-01T11"): 1,
+                      ("genre", 3, "2024-05-01T10"): 1}
+    assert labels[("genre", 3)] == "Comedy"
+    assert last_seen[("keyword", "ace")] == datetime(2024, 5, 1, 11, 15, tzinfo=timezone.utc)
+
+
+def test_stats_built_only_after_marker(db):
+    db[stats_collection_name()].insert_one({"_id": "keyword:ace", "kind": "keyword", "value": "ace", "count": 1})
+    assert not stats_built(db)  # счётчики новых запросов ещё не означают пересчитанный журнал
+    mark_stats_built(db)
+    assert stats_built(db)
+
+
+def test_marker_not_listed_as_query(db, monkeypatch):
+    monkeypatch.setattr(search_stats, "_indexes_ready", True)
+    mark_stats_built(db)
+    db[stats_collection_name()].insert_one({"_id": "keyword:ace", "kind": "keyword", "value": "ace", "count": 3})
+    assert [item["value"] for item in search_stats.keyword_counts(db)] == ["ace"]
+    assert [item["value"] for item in search_stats.top_queries(db, "keyword")] == ["ace"]
+
+
+def test_top_queries_keep_history_until_rebuild(monkeypatch):
+    import mongodb_connector
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_connector, "_client", client)
+    db = client["test_db"]
+    db["search_log"].insert_many([_entry("keyword", 10, keyword="old") for _ in range(3)])
+    db[stats_collection_name()].insert_one({"_id": "keyword:new", "kind": "keyword", "value": "new", "count": 1})
+    assert mongodb_connector.most_frequent_queries() == [{"keyword": "old", "count": 3}]
+
+    db["search_log"].delete_many({})
+    assert mongodb_connector.most_frequent_queries() == [{"keyword": "new", "count": 1}]
+    assert stats_built(db)
+
+
+def test_count_entries_multi_genre_search():
+    entries = [
+        _entry("genre_year", 10, genre_id=[3, 4], genre_name=["Comedy", "Documentary"], year_from=None, year_to=None),
+        _entry("genre_year", 10, genre_id=3, genre_name="Comedy", year_from=2000, year_to=2010),
+    ]
+    totals, hourly, labels, _ = _count_entries(entries)
+    assert totals == {("genre", 3): 2, ("genre", 4): 1}
+    assert hourly[("genre", 4, "2024-05-01T10")] == 1
+    assert labels == {("genre", 3): "Comedy", ("genre", 4): "Documentary"}
+
+
+def test_clear_log_collection_clears_stats(monkeypatch):
+    import mongodb_connector
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_connector, "_client", client)
+    monkeypatch.setattr(mongodb_connector, "_log_writer", None)
+    db = client["test_db"]
+    db["search_log"].insert_many([_entry("keyword", 10, keyword="old") for _ in range(3)])
+    db[stats_collection_name()].insert_one({"_id": "keyword:old", "kind": "keyword", "value": "old", "count": 3})
+    db[search_stats.hourly_collection_name()].insert_one(
+        {"_id": "keyword:old:2024-05-01T10", "kind": "keyword", "value": "old", "hour": "2024-05-01T10", "count": 3})
+    mark_stats_built(db)
+
+    mongodb_connector.clear_log_collection()
+    mongodb_connector.get_log_writer().stop()
+    assert db["search_log"].count_documents({}) == 0
+    assert db[search_stats.hourly_collection_name()].count_documents({}) == 0
+    assert stats_built(db)
+    assert mongodb_connector.most_frequent_queries() == []
+
+
+def test_count_entries_mixed_timestamp_formats():
+    entries = [
+        _entry("keyword", 10, keyword="ace"),
+        {"timestamp": "2024-05-01T12:30:00+00:00", "search_type": "keyword", "params": {"keyword": "ace"}},
+        {"timestamp": "2024-04-30T09:00:00", "search_type": "keyword", "params": {"keyword": "ace"}},
+        {"timestamp": "вчера", "search_type": "keyword", "params": {"keyword": "ace"}},
+        {"timestamp": datetime(2024, 5, 1, 11, 0), "search_type": "keyword", "params": {"keyword": "ace"}},
+    ]
+    totals, hourly, _, last_seen = _count_entries(entries)
+    assert totals == {("keyword", "ace"): 5}
+    assert hourly[("keyword", "ace", "2024-05-01T12")] == 1
+    assert hourly[("keyword", "ace", "2024-05-01T11")] == 1  # дата BSON без часового пояса — UTC
+    assert last_seen[("keyword", "ace")] == datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
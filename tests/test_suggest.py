@@ -0,0 +1,77 @@
+# Тесты индекса подсказок названий фильмов (suggest.py).
+
+import suggest
+from suggest import SuggestionIndex, normalize_prefix, title_keys
+
+
+def _titles(items):
+    return [item["title"] for item in items]
+
+
+def _index(*titles, **kwargs):
+    index = SuggestionIndex(**kwargs)
+    index.add_films({"film_id": film_id, "title": title} for film_id, title in enumerate(titles, start=1))
+    return index
+
+
+def test_title_keys_and_normalize_prefix():
+    assert title_keys("ACE Casablanca") == ["ace casablanca", "casablanca"]
+    assert title_keys("Alien-Center 2") == ["alien-center 2", "center 2", "2"]
+    assert title_keys(None) == []
+    assert normalize_prefix("  Ace   CASA ") == "ace casa"
+
+
+def test_lookup_by_start_of_any_word():
+    index = _index("ACE GOLDFINGER", "ACADEMY DINOSAUR", "AFFAIR PREJUDICE", "GOLDFINGER ACE")
+    assert len(index) == 4 and index.max_film_id == 4
+    assert _titles(index.lookup("ac")) == ["ACADEMY DINOSAUR", "ACE GOLDFINGER", "GOLDFINGER ACE"]
+    assert _titles(index.lookup("gold")) == ["ACE GOLDFINGER", "GOLDFINGER ACE"]
+    assert _titles(index.lookup("ace gold")) == ["ACE GOLDFINGER"]
+    assert _titles(index.lookup("ac", limit=1)) == ["ACADEMY DINOSAUR"]
+    assert index.lookup("zzz") == []
+
+
+def test_lookup_shorten_drops_trailing_characters():
+    index = _index("ACADEMY DINOSAUR", "ACE GOLDFINGER")
+    assert index.lookup("dinosaurx") == []
+    assert _titles(index.lookup("dinosaurx", shorten=True)) == ["ACADEMY DINOSAUR"]
+    assert index.lookup("qx", shorten=True) == []
+
+
+def test_long_prefix_with_many_keys_is_cached_until_change():
+    index = _index(*[f"ZEBRA {number:03d}" for number in range(100)])
+    first = index.lookup("zebr")
+    assert ("zebr", index.limit) in index._cached
+    assert index.lookup("zebr") == first
+    index.add_films([{"film_id": 500, "title": "ZEBRA 0"}])
+    assert not index._cached
+    assert _titles(index.lookup("zebr"))[0] == "ZEBRA 0"
+
+
+def test_keyword_counts_rank_by_popularity_and_apply_only_delta():
+    index = _index("ACADEMY DINOSAUR", "ACE GOLDFINGER", "DINOSAUR ACE")
+    assert _titles(index.lookup("a")) == ["ACADEMY DINOSAUR", "ACE GOLDFINGER", "DINOSAUR ACE"]
+
+    assert index.apply_keyword_counts({"goldfinger": 4, "nothing matches": 2}) == 1
+    assert _titles(index.lookup("a"))[0] == "ACE GOLDFINGER"
+    assert index.apply_keyword_counts({"goldfinger": 4}) == 0  # тот же счётчик уже учтён
+
+    assert index.apply_keyword_counts({"dinosaur": 12}) == 1  # прирост делится между двумя названиями
+    assert index._weights == {2: 4.0, 1: 6.0, 3: 6.0}
+    assert _titles(index.lookup("a")) == ["ACADEMY DINOSAUR", "DINOSAUR ACE", "ACE GOLDFINGER"]
+    assert index.stats()["keywords"] == 3
+
+
+def test_add_films_replaces_renamed_title():
+    index = _index("ACE GOLDFINGER", "ACADEMY DINOSAUR")
+    assert index.add_films([{"film_id": 1, "title": "ACE GOLDFINGER"}]) == 0
+    assert index.add_films([{"film_id": 1, "title": "BRAVE GOLDFINGER"}]) == 1
+    assert _titles(index.lookup("ace")) == []
+    assert _titles(index.lookup("br")) == ["BRAVE GOLDFINGER"]
+    assert _titles(index.lookup("gold")) == ["BRAVE GOLDFINGER"]
+    assert index.stats()["keys"] == 4
+
+
+def test_suggest_disabled(monkeypatch):
+    monkeypatch.setitem(suggest.settings.SUGGEST_SETTINGS, "enabled", False)
+    assert suggest.suggest("ace") == []
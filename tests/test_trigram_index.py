@@ -0,0 +1,41 @@
+# Тесты локального триграммного индекса (trigram_index.py).
+
+from trigram_index import TrigramIndex, trigrams
+
+FILMS = [
+    {"film_id": 1, "title": "ACADEMY DINOSAUR", "description": "A Epic Drama of a Feminist", "release_year": 2006},
+    {"film_id": 2, "title": "ACE GOLDFINGER", "description": "A Astounding Epistle of a Database", "release_year": 2006},
+    {"film_id": 3, "title": "GOLDEN ACADEMY", "description": "A Boring Story", "release_year": 2006},
+    {"film_id": 4, "title": "DRAGON SQUAD", "description": "A Taut Tale of a Dinosaur", "release_year": 2006},
+    {"film_id": 5, "title": "BLACKACADEMY", "description": None, "release_year": 2006},
+]
+
+
+def test_trigrams():
+    assert trigrams("Abcd") == {"abc", "bcd"}
+    assert trigrams("ab") == set()
+
+
+def test_search_matches_like_and_ranks_by_position():
+    index = TrigramIndex(FILMS)
+    assert len(index) == 5
+    ids = [row["film_id"] for row in index.search("academy")]
+    # начало названия, начало слова, середина слова
+    assert ids == [1, 3, 5]
+
+
+def test_search_in_description():
+    index = TrigramIndex(FILMS)
+    assert [row["film_id"] for row in index.search("dinosaur")] == [1, 4]
+    assert [row["film_id"] for row in index.search("dinosaur", include_description=False)] == [1]
+
+
+def test_short_keyword_checks_all_documents():
+    index = TrigramIndex(FILMS)
+    assert [row["film_id"] for row in index.search("sq")] == [4]
+
+
+def test_missing_trigram_returns_nothing():
+    index = TrigramIndex(FILMS)
+    assert index.search("zzzz") == []
+    assert TrigramIndex().search("academy") == []
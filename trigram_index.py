@@ -0,0 +1,108 @@
+# Модуль локального триграммного индекса для поиска фильмов по ключевому слову без полного просмотра таблицы
+
+import threading
+
+
+def trigrams(text: str) -> set:
+    """
+    Разбивает строку на множество триграмм (подстрок из 3 символов) в нижнем регистре.
+
+    :param text: Исходная строка.
+    :return: Множество триграмм; пустое, если строка короче 3 символов.
+    """
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Инвертированный триграммный индекс по названию и описанию фильмов.
+
+    Для ключевого слова из 3 и более символов кандидаты находятся
+    пересечением списков фильмов по каждой триграмме, после чего
+    совпадение подстроки проверяется точно — результат тот же,
+    что у LIKE '%слово%', но без перебора всего каталога.
+    Результаты ранжируются по релевантности:
+    совпадение в начале названия, в начале слова названия, в любом месте названия,
+    затем совпадения только в описании.
+    """
+
+    def __init__(self, rows=None):
+        """
+        :param rows: Итерируемый набор строк фильмов (словарей с ключами
+                     film_id, title, description, release_year).
+        """
+        self._lock = threading.Lock()
+        self._docs = []      # элементы: (title в нижнем регистре, description в нижнем регистре, строка)
+        self._postings = {}  # триграмма -> множество номеров документов
+        if rows is not None:
+            self.build(rows)
+
+    def build(self, rows) -> None:
+        """
+        Строит индекс заново по переданным строкам фильмов.
+
+        :param rows: Итерируемый набор словарей с полями film_id, title, description, release_year.
+        """
+        docs = []
+        postings = {}
+        for row in rows:
+            title = (row['title'] or '').lower()
+            description = (row['description'] or '').lower()
+            doc_id = len(docs)
+            docs.append((title, description, row))
+            for gram in trigrams(title) | trigrams(description):
+                postings.setdefault(gram, set()).add(doc_id)
+        with self._lock:
+            self._docs = docs
+            self._postings = postings
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _candidates(self, keyword: str):
+        grams = trigrams(keyword)
+        if not grams:
+            return range(len(self._docs))  # слишком короткое слово — проверяем все документы
+        lists = sorted((self._postings.get(g, ()) for g in grams), key=len)
+        if not lists[0]:
+            return ()
+        result = set(lists[0])
+        for ids in lists[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def _rank(title: str, description: str, keyword: str):
+        position = title.find(keyword)
+        if position == 0:
+            return 0, position
+        if position > 0:
+            return (1 if title[position - 1] == ' ' else 2), position
+        if keyword in description:
+            return 3, 0
+        return None
+
+    def search(self, keyword: str, include_description: bool = True) -> list:
+        """
+        Ищет фильмы, в названии (и, опционально, описании) которых встречается ключевое слово.
+
+        :param keyword: Ключевое слово (регистр не важен).
+        :param include_description: Искать ли также в описании фильма.
+        :return: Список строк фильмов, отсортированный по релевантности, затем по названию.
+        """
+        keyword = keyword.lower()
+        with self._lock:
+            docs = self._docs
+            candidates = self._candidates(keyword)
+
+        ranked = []
+        for doc_id in candidates:
+            title, description, row = docs[doc_id]
+            rank = self._rank(title, description if include_description else '', keyword)
+            if rank is not None:
+                ranked.append((rank, title, row['film_id'], row))
+        ranked.sort(key=lambda item: item[:3])
+        return [item[3] for item in ranked]
@@ -49,6 +49,10 @@ def show_statistics_menu():
     - посмотреть 5 наиболее частых поисков по ключевому слову,
     - посмотреть последние 5 поисков по ключевому слову,
     - просмотреть список всех последних запросов,
+    - посмотреть эффективность кэшей поиска,
+    - посмотреть планы выполнения запросов статистики,
+    - посмотреть количество поисков по часам или дням,
+    - посмотреть метрики производительности,
     - вернуться в главное меню.
     """
     while True:
@@ -57,6 +61,10 @@ def show_statistics_menu():
         print("1. 5 наиболее частых поисков по ключевому слову")
         print("2. Последние 5 поисков по ключевому слову")
         print("3. Список всех последних запросов")
+        print("4. Эффективность кэшей")
+        print("5. Диагностика запросов статистики")
+        print("6. Количество поисков по времени")
+        print("7. Производительность")
         print("-------------------------------")
         print("0. Возврат в главное меню")
         print("===============================\n")
@@ -69,6 +77,14 @@ def show_statistics_menu():
             show_last_5_keyword_queries()
         elif sub_choice == "3":
             show_recent_query_logs()
+        elif sub_choice == "4":
+            show_cache_stats()
+        elif sub_choice == "5":
+            show_mongo_diagnostics()
+        elif sub_choice == "6":
+            show_searches_per_period()
+        elif sub_choice == "7":
+            show_performance()
         elif sub_choice == "0":
             break
         else: